@@ -0,0 +1,233 @@
+import asyncio
+import contextlib
+import logging
+import threading
+from typing import Any, Awaitable, Callable, Iterable, List, Optional
+
+from playwright.async_api import Browser, BrowserContext, Error as PlaywrightError, Playwright, async_playwright
+
+from dspider.common.load_config import config
+
+logger = logging.getLogger(__name__)
+
+# 默认参数，可被配置文件中的browser_pool覆盖
+DEFAULT_BROWSER_POOL = {
+    'size': 1, # 每个Worker进程的浏览器数，prefork池中一个进程同时只执行一个任务
+    'max_pages': 100, # 单个浏览器处理多少个页面后重启，避免内存泄漏
+    'headless': True,
+    'task_timeout': 120, # 单个任务的超时（秒）
+    'max_contexts': 4, # 批量任务在同一浏览器中同时打开的上下文数
+}
+
+
+class PooledBrowser:
+    """池中的单个浏览器及其已处理的页面数"""
+
+    def __init__(self, index: int):
+        self.index = index
+        self.browser: Optional[Browser] = None
+        self.pages = 0
+
+    @property
+    def alive(self) -> bool:
+        return self.browser is not None and self.browser.is_connected()
+
+
+class BrowserPool:
+    """Worker进程内复用的Playwright浏览器池
+
+    进程内只有一个常驻事件循环（后台线程），Playwright与浏览器只启动一次；
+    每个任务获得一个独立的BrowserContext（cookie、缓存互不影响），用完即关闭。
+    浏览器处理max_pages个页面后或崩溃断开后重启。
+    同步代码（Celery任务）通过run提交协程到事件循环并等待结果。
+    """
+
+    def __init__(self, size: int = 1, max_pages: int = 100, headless: bool = True, task_timeout: float = 120,
+                 max_contexts: int = 4):
+        """初始化浏览器池
+
+        Args:
+            size: 浏览器数量
+            max_pages: 单个浏览器处理多少个页面后重启
+            headless: 是否无头模式
+            task_timeout: run等待单个任务的超时（秒）
+            max_contexts: map_contexts默认的并发上下文数
+        """
+        self.size = size
+        self.max_pages = max_pages
+        self.headless = headless
+        self.task_timeout = task_timeout
+        self.max_contexts = max_contexts
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.thread: Optional[threading.Thread] = None
+        self.playwright: Optional[Playwright] = None
+        self.browsers: List[PooledBrowser] = []
+        self.idle: Optional[asyncio.Queue] = None
+        self.launches = 0
+
+    def start(self):
+        """启动事件循环线程与Playwright，浏览器在首次使用时启动"""
+        if self.loop is not None:
+            return
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name='browser-pool', daemon=True)
+        self.thread.start()
+        asyncio.run_coroutine_threadsafe(self._start(), self.loop).result()
+        logger.info(f"浏览器池已启动，浏览器数 {self.size}，每个浏览器最多处理 {self.max_pages} 个页面")
+
+    async def _start(self):
+        self.playwright = await async_playwright().start()
+        self.idle = asyncio.Queue()
+        self.browsers = [PooledBrowser(i) for i in range(self.size)]
+        for pooled in self.browsers:
+            self.idle.put_nowait(pooled)
+
+    async def _launch(self, pooled: PooledBrowser):
+        await self._close_browser(pooled)
+        pooled.browser = await self.playwright.chromium.launch(headless=self.headless)
+        pooled.pages = 0
+        self.launches += 1
+        logger.info(f"启动浏览器 #{pooled.index}（累计启动 {self.launches} 次）")
+
+    async def _close_browser(self, pooled: PooledBrowser):
+        if pooled.browser is not None:
+            with contextlib.suppress(Exception):
+                await pooled.browser.close()
+            pooled.browser = None
+
+    @contextlib.asynccontextmanager
+    async def borrow(self):
+        """借用一个浏览器，未启动或已断开时启动，退出时按需重启并归还
+
+        Yields:
+            PooledBrowser: 池中的浏览器
+        """
+        pooled = await self.idle.get()
+        try:
+            if not pooled.alive:
+                await self._launch(pooled)
+            yield pooled
+        except PlaywrightError:
+            if not pooled.alive:
+                logger.warning(f"浏览器 #{pooled.index} 已断开，下次使用时重启")
+            raise
+        finally:
+            if pooled.pages >= self.max_pages or not pooled.alive:
+                await self._close_browser(pooled)
+            self.idle.put_nowait(pooled)
+
+    @contextlib.asynccontextmanager
+    async def _new_context(self, pooled: PooledBrowser, **context_options):
+        context: Optional[BrowserContext] = None
+        try:
+            context = await pooled.browser.new_context(**context_options)
+            yield context
+        finally:
+            if context is not None:
+                with contextlib.suppress(Exception):
+                    await context.close()
+            pooled.pages += 1
+
+    @contextlib.asynccontextmanager
+    async def context(self, **context_options):
+        """借用一个浏览器并创建独立的BrowserContext，退出时关闭上下文并归还浏览器
+
+        Args:
+            context_options: 传给browser.new_context的参数
+
+        Yields:
+            BrowserContext: 浏览器上下文
+        """
+        async with self.borrow() as pooled:
+            async with self._new_context(pooled, **context_options) as context:
+                yield context
+
+    async def map_contexts(self, func: Callable[[BrowserContext, Any], Awaitable[Any]], items: Iterable[Any],
+                           concurrency: Optional[int] = None, **context_options) -> List[Any]:
+        """在同一个浏览器中为每个元素创建独立的上下文并发执行func
+
+        浏览器只借用一次，同时打开的上下文数不超过concurrency。
+        单个元素出错不影响其他元素，异常作为该元素的结果返回。
+
+        Args:
+            func: 接收(BrowserContext, 元素)的协程函数
+            items: 元素列表
+            concurrency: 并发上下文数，默认max_contexts
+            context_options: 传给browser.new_context的参数
+
+        Returns:
+            List[Any]: 与items一一对应的结果或异常
+        """
+        semaphore = asyncio.Semaphore(concurrency or self.max_contexts)
+        async with self.borrow() as pooled:
+            async def run_one(item):
+                async with semaphore:
+                    async with self._new_context(pooled, **context_options) as context:
+                        return await func(context, item)
+
+            return await asyncio.gather(*[run_one(item) for item in items], return_exceptions=True)
+
+    def run(self, coro_factory: Callable[['BrowserPool'], Awaitable[Any]], timeout: Optional[float] = None) -> Any:
+        """在池的事件循环中执行协程并等待结果，供同步代码调用
+
+        Args:
+            coro_factory: 接收BrowserPool、返回协程的函数
+            timeout: 超时（秒），默认task_timeout
+
+        Returns:
+            Any: 协程的返回值
+        """
+        self.start()
+        future = asyncio.run_coroutine_threadsafe(coro_factory(self), self.loop)
+        try:
+            return future.result(timeout or self.task_timeout)
+        except BaseException:
+            future.cancel()
+            raise
+
+    async def _close(self):
+        for pooled in self.browsers:
+            await self._close_browser(pooled)
+        if self.playwright is not None:
+            await self.playwright.stop()
+            self.playwright = None
+
+    def close(self):
+        """关闭所有浏览器与事件循环"""
+        if self.loop is None:
+            return
+        with contextlib.suppress(Exception):
+            asyncio.run_coroutine_threadsafe(self._close(), self.loop).result(30)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(5)
+        self.loop.close()
+        self.loop = None
+        logger.info(f"浏览器池已关闭，累计启动浏览器 {self.launches} 次")
+
+
+_browser_pool: Optional[BrowserPool] = None
+_browser_pool_lock = threading.Lock()
+
+
+def get_browser_pool() -> BrowserPool:
+    """获取本进程的浏览器池，不存在时按配置创建（solo池等没有worker_process_init信号的场景）"""
+    global _browser_pool
+    if _browser_pool is None:
+        with _browser_pool_lock:
+            if _browser_pool is None:
+                _browser_pool = BrowserPool(**{**DEFAULT_BROWSER_POOL, **(config.get('browser_pool') or {})})
+    return _browser_pool
+
+
+def init_browser_pool(**kwargs):
+    """Worker子进程启动时创建并启动浏览器池（worker_process_init信号）"""
+    get_browser_pool().start()
+
+
+def shutdown_browser_pool(**kwargs):
+    """Worker子进程退出时关闭浏览器池（worker_process_shutdown信号）"""
+    global _browser_pool
+    with _browser_pool_lock:
+        pool, _browser_pool = _browser_pool, None
+    if pool is not None:
+        pool.close()
@@ -0,0 +1,166 @@
+import asyncio
+import logging
+from typing import Iterable, Optional
+from urllib.parse import urlsplit
+
+from playwright.async_api import Page, Route
+
+from dspider.common.load_config import config
+
+logger = logging.getLogger(__name__)
+
+# 默认参数，可被配置文件中的header_capture覆盖
+DEFAULT_HEADER_CAPTURE = {
+    'block_resource_types': ['image', 'media', 'font', 'stylesheet'], # 捕获请求头用不到的资源类型
+    'block_third_party': True, # 拦截第三方域名的请求（third_party_allowed_types中的类型除外）
+    'third_party_allowed_types': ['document', 'script', 'xhr', 'fetch'], # 页面脚本可能依赖第三方CDN，生成签名或发起接口请求
+    'block_domains': [ # 统计、埋点等域名，任何类型都拦截
+        'google-analytics.com', 'googletagmanager.com', 'doubleclick.net', 'hm.baidu.com', 'cnzz.com',
+        'growingio.com', 'sensorsdata.cn', 'zhugeio.com', 'mmstat.com',
+    ],
+    'wait_until': 'commit', # 收到响应即视为导航完成，不等待load事件
+    'page_timeout': 30, # 单个页面从打开到捕获接口请求的超时（秒）
+}
+
+# 需要取三段作为站点域名的公共后缀
+TWO_LEVEL_SUFFIXES = {'com.cn', 'net.cn', 'org.cn', 'gov.cn', 'edu.cn', 'com.hk', 'com.tw', 'co.uk', 'co.jp'}
+
+
+def site_of(host: str) -> str:
+    """取主机名的站点域名（可注册域名），如zhaopin.jd.com -> jd.com，a.b.com.cn -> b.com.cn"""
+    labels = host.lower().rstrip('.').split('.')
+    if len(labels) >= 3 and '.'.join(labels[-2:]) in TWO_LEVEL_SUFFIXES:
+        return '.'.join(labels[-3:])
+    return '.'.join(labels[-2:])
+
+
+def host_matches(host: str, domains: Iterable[str]) -> bool:
+    """主机名是否为domains中某个域名或其子域名"""
+    host = host.lower()
+    return any(host == domain or host.endswith('.' + domain) for domain in domains)
+
+
+def get_capture_config() -> dict:
+    """读取请求头捕获参数"""
+    return {**DEFAULT_HEADER_CAPTURE, **(config.get('header_capture') or {})}
+
+
+class ResourceBlocker:
+    """捕获请求头时拦截无关资源
+
+    捕获只需要目标接口请求的请求头，图片、字体、样式表以及统计埋点、第三方iframe等请求都可以直接中止，
+    减少页面耗时与浏览器内存。页面本站（含同站子域名）与接口所在站点视为第一方；
+    目标接口请求本身永远放行。
+    """
+
+    def __init__(self, url: str, api_url: str, block_resource_types: Iterable[str] = (),
+                 block_third_party: bool = True, third_party_allowed_types: Iterable[str] = (),
+                 block_domains: Iterable[str] = (), allowed_domains: Iterable[str] = ()):
+        """初始化拦截器
+
+        Args:
+            url: 页面URL
+            api_url: 目标接口URL
+            block_resource_types: 拦截的资源类型（Playwright的resource_type）
+            block_third_party: 是否拦截第三方域名
+            third_party_allowed_types: 第三方域名下放行的资源类型
+            block_domains: 总是拦截的域名
+            allowed_domains: 额外视为第一方的域名（数据源依赖的其他站点）
+        """
+        self.api_url = api_url
+        self.block_resource_types = set(block_resource_types)
+        self.block_third_party = block_third_party
+        self.third_party_allowed_types = set(third_party_allowed_types)
+        self.block_domains = list(block_domains)
+        self.first_party = {site_of(urlsplit(url).hostname or ''), site_of(urlsplit(api_url).hostname or '')}
+        self.first_party.update(allowed_domains)
+        self.blocked = 0
+        self.allowed = 0
+
+    @classmethod
+    def from_config(cls, datasource_config: dict, capture_config: Optional[dict] = None) -> 'ResourceBlocker':
+        """按捕获参数与数据源配置创建拦截器，数据源可通过request_params.allowed_domains放行其他站点"""
+        capture_config = capture_config or get_capture_config()
+        return cls(
+            datasource_config['url'],
+            datasource_config['request_params']['api_url'],
+            block_resource_types=capture_config['block_resource_types'],
+            block_third_party=capture_config['block_third_party'],
+            third_party_allowed_types=capture_config['third_party_allowed_types'],
+            block_domains=capture_config['block_domains'],
+            allowed_domains=datasource_config['request_params'].get('allowed_domains') or (),
+        )
+
+    def should_block(self, resource_type: str, url: str) -> bool:
+        """判断请求是否拦截
+
+        Args:
+            resource_type: 资源类型
+            url: 请求URL
+
+        Returns:
+            bool: 是否拦截
+        """
+        if url == self.api_url:
+            return False
+        if resource_type in self.block_resource_types:
+            return True
+        host = urlsplit(url).hostname
+        if not host:
+            return False # data:、blob:等
+        if host_matches(host, self.block_domains):
+            return True
+        if self.block_third_party and resource_type not in self.third_party_allowed_types:
+            return not host_matches(host, self.first_party)
+        return False
+
+    async def handle(self, route: Route):
+        """page.route的处理函数"""
+        request = route.request
+        if self.should_block(request.resource_type, request.url):
+            self.blocked += 1
+            await route.abort('blockedbyclient')
+        else:
+            self.allowed += 1
+            await route.continue_()
+
+    async def install(self, page: Page):
+        """在页面上拦截所有请求"""
+        await page.route('**/*', self.handle)
+
+
+async def open_for_capture(page: Page, datasource_config: dict, capture_config: Optional[dict] = None):
+    """以轻量模式打开页面并等待目标接口请求
+
+    拦截无关资源，导航在wait_until（默认commit）时即返回，整个过程受page_timeout硬超时约束。
+    数据源配置capture_mode为full时不拦截资源、按load事件导航，用于轻量模式捕获不到接口请求的站点。
+
+    Args:
+        page: 新打开的页面
+        datasource_config: 数据源配置字典
+        capture_config: 捕获参数，默认读取配置文件
+
+    Returns:
+        Request: 目标接口请求
+    """
+    capture_config = capture_config or get_capture_config()
+    url = datasource_config['url']
+    api_url = datasource_config['request_params']['api_url']
+    timeout = capture_config['page_timeout']
+    full = datasource_config.get('capture_mode') == 'full'
+
+    blocker = None
+    if not full:
+        blocker = ResourceBlocker.from_config(datasource_config, capture_config)
+        await blocker.install(page)
+
+    async def navigate():
+        async with page.expect_request(lambda req: req.url == api_url, timeout=timeout * 1000) as request_info:
+            await page.goto(url, wait_until='load' if full else capture_config['wait_until'], timeout=timeout * 1000)
+        return await request_info.value
+
+    try:
+        return await asyncio.wait_for(navigate(), timeout)
+    finally:
+        if blocker is not None:
+            logger.debug(f"{url} 拦截请求 {blocker.blocked} 个，放行 {blocker.allowed} 个")
@@ -3,20 +3,39 @@ import logging
 
 from dspider.common.mongodb_service import mongodb_conn
 from dspider.celery_worker.celery_app import celery_app
-from playwright.async_api import async_playwright
-import platform
+from dspider.celery_worker.browser_pool import BrowserPool, get_browser_pool, init_browser_pool, shutdown_browser_pool
+from dspider.celery_worker.resource_blocker import open_for_capture
+from dspider.common.cookie_state import captured_update, cookie_expiry
+from celery.signals import worker_process_init, worker_process_shutdown
+from playwright.async_api import BrowserContext, async_playwright
+from pymongo import UpdateOne
+import time
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
+
+# 请求头中由HTTP/2伪首部转换来的键，重放请求时不需要
+NEEDNOT_HEADER_KEYS = (':authority', ':method', ':path', ':scheme')
+
+
+def filter_headers(headers: dict) -> dict:
+    """去掉请求头中的HTTP/2伪首部"""
+    return {k: v for k, v in headers.items() if k not in NEEDNOT_HEADER_KEYS}
+
         
 class CookieBrowser:
     """
     使用 Celery 和 Playwright 异步打开网页的浏览器类
     """
-    def __init__(self):
-        """初始化 CookieBrowser"""
+    def __init__(self, browser_pool: BrowserPool = None):
+        """初始化 CookieBrowser
+        
+        Args:
+            browser_pool: 进程内复用的浏览器池，为None时自行启动浏览器
+        """
         self.playwright = None
         self.browser = None
+        self.browser_pool = browser_pool
         self.mongodb_conn = mongodb_conn
     
     async def initialize(self):
@@ -57,20 +76,29 @@ class CookieBrowser:
         
         async def request_handler(request):
             if request.url == api_url:
-                headers = await request.all_headers()
-                neednot_header_keys = [':authority', ':method', ':path', ':scheme']
-                headers = {k: v for k, v in headers.items() if k not in neednot_header_keys}                
+                headers = filter_headers(await request.all_headers())
                 logger.info(f"Request headers: {headers}")
-                self.mongodb_conn.update_one('recruitment_datasource_config', {'url': url}, {'$set': {'request_params.headers': headers}})
+                expires_at = cookie_expiry(await request.frame.page.context.cookies(api_url))
+                self.mongodb_conn.update_one('recruitment_datasource_config', {'url': url}, captured_update(headers, expires_at))
+        
+        if self.browser_pool is not None:
+            # 从浏览器池借用浏览器，每个任务使用独立的上下文
+            async with self.browser_pool.context() as context:
+                page = await context.new_page()
+                return await self._open_page(page, url, api_url, request_handler)
         
         if not self.browser:
             await self.initialize()
         
         page = await self.browser.new_page()
-        page.on('request', request_handler)
+        return await self._open_page(page, url, api_url, request_handler)
+    
+    async def _open_page(self, page, url: str, api_url: str, request_handler):
+        """打开页面并等待目标接口请求"""
         try:
-            await page.goto(url)
-            await page.wait_for_event('request', lambda req: req.url == api_url)
+            # 轻量模式打开页面：拦截无关资源，导航不等待load事件，整个过程有硬超时
+            request = await open_for_capture(page, self.datasource_config)
+            await request_handler(request)
             # await page.wait_for_timeout(5000)  # 等待页面加载
             
             # 获取 cookie
@@ -92,10 +120,66 @@ class CookieBrowser:
         finally:
             await page.close()
 
+    async def capture_headers(self, context: BrowserContext, datasource_config: dict) -> dict:
+        """在给定的浏览器上下文中打开页面，捕获目标接口请求的请求头（不写库）
+
+        Args:
+            context: 浏览器上下文
+            datasource_config: 数据源配置字典
+
+        Returns:
+            Dict: 包含 URL、请求头和cookie过期时间的字典
+        """
+        url = datasource_config['url']
+        page = await context.new_page()
+        try:
+            request = await open_for_capture(page, datasource_config)
+            headers = filter_headers(await request.all_headers())
+            # 记录接口cookie的过期时间，CookieManager据此安排下次刷新
+            expires_at = cookie_expiry(await context.cookies(datasource_config['request_params']['api_url']))
+        finally:
+            await page.close()
+        logger.info(f"Captured request headers for {url}")
+        return {'url': url, 'headers': headers, 'expires_at': expires_at}
+
+    async def process_urls(self, datasource_configs: list, concurrency: int = None) -> dict:
+        """
+        批量处理多个数据源：在浏览器池的同一个浏览器中为每个数据源打开独立的上下文并发捕获请求头，
+        全部完成后以一次 bulk_write 写回 request_params.headers
+        
+        Args:
+            datasource_configs: 数据源配置列表
+            concurrency: 同时打开的上下文数，默认取浏览器池的max_contexts
+            
+        Returns:
+            Dict: 成功数、失败的 URL 及原因
+        """
+        results = await self.browser_pool.map_contexts(self.capture_headers, datasource_configs, concurrency)
+        operations = []
+        urls = []
+        failed = []
+        for datasource_config, result in zip(datasource_configs, results):
+            if isinstance(result, BaseException):
+                error = str(result) or type(result).__name__
+                logger.error(f"Failed to capture headers for {datasource_config['url']}: {error}")
+                failed.append({'url': datasource_config['url'], 'error': error})
+                continue
+            operations.append(UpdateOne({'url': result['url']}, captured_update(result['headers'], result['expires_at'])))
+            urls.append(result['url'])
+        if operations and self.mongodb_conn.bulk_write('recruitment_datasource_config', operations) < 0:
+            failed.extend({'url': url, 'error': 'bulk_write failed'} for url in urls)
+            urls = []
+        return {
+            'succeeded': len(urls),
+            'failed': failed,
+            'timestamp': time.time()
+        }
+
 # Celery 默认使用 prefork 池（基于 billiard，即 multiprocessing 的增强版） 来实现并发。其核心机制就是 主进程 fork 多个子工作进程。
-# 主进程创建 CookieBrowser， fork 后，每个子进程拥有该连接的副本
-# 多进程公用一个 CookieBrowser 实例
-# cookie_browser = CookieBrowser()
+# Playwright 与事件循环不能跨 fork 使用，因此每个子进程在 worker_process_init 时创建自己的浏览器池，
+# 子进程内的所有任务共用一个常驻事件循环和浏览器，退出时关闭。
+worker_process_init.connect(init_browser_pool, weak=False)
+worker_process_shutdown.connect(shutdown_browser_pool, weak=False)
 
 # 定义 Celery 任务
 @celery_app.task
@@ -110,47 +194,46 @@ def process_url_task(data: dict):
         Dict: 包含 URL 和 cookie 的字典
     """
     logger.info(f"Celery task processing URL: {data['url']}")
-    cookie_browser = CookieBrowser()
-    cookie_browser.set_datasource_config(data)
     
-    # Windows兼容的事件循环处理
-    if platform.system() == 'Windows':
-        # Windows下使用新的事件循环
-        try:
-            # 尝试关闭现有的事件循环（如果存在）
-            old_loop = asyncio.get_event_loop()
-            if not old_loop.is_closed():
-                old_loop.close()
-        except RuntimeError:
-            pass
-        
-        # 创建新的事件循环
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-    else:
-        # Unix系统使用标准方式
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
+    def process(browser_pool: BrowserPool):
+        cookie_browser = CookieBrowser(browser_pool)
+        cookie_browser.set_datasource_config(data)
+        return cookie_browser.process_url()
     
     try:
-        result = loop.run_until_complete(cookie_browser.process_url())
-        return result
+        return get_browser_pool().run(process)
     except Exception as e:
-        # Windows兼容的时间戳获取方式
-        try:
-            timestamp = loop.time()
-        except Exception:
-            import time
-            timestamp = time.time()
+        return {
+            'error': str(e) or type(e).__name__,
+            'timestamp': time.time()
+        }
+
+
+@celery_app.task
+def process_urls_task(data_list: list, concurrency: int = None):
+    """
+    Celery 任务，批量处理多个 URL，共用一个浏览器并以一次 bulk_write 写回请求头
+    
+    Args:
+        data_list: 数据源配置列表
+        concurrency: 同时打开的上下文数
         
+    Returns:
+        Dict: 成功数、失败的 URL 及原因
+    """
+    logger.info(f"Celery task processing {len(data_list)} URLs")
+    
+    def process(browser_pool: BrowserPool):
+        cookie_browser = CookieBrowser(browser_pool)
+        return cookie_browser.process_urls(data_list, concurrency)
+    
+    browser_pool = get_browser_pool()
+    # 超时按批次轮数放宽：每轮最多并发 concurrency 个上下文
+    rounds = max(1, -(-len(data_list) // (concurrency or browser_pool.max_contexts)))
+    try:
+        return browser_pool.run(process, browser_pool.task_timeout * rounds)
+    except Exception as e:
         return {
-            'error': str(e),
-            'timestamp': timestamp
+            'error': str(e) or type(e).__name__,
+            'timestamp': time.time()
         }
-    finally:
-        # 确保关闭事件循环
-        try:
-            if not loop.is_closed():
-                loop.close()
-        except Exception:
-            pass
\ No newline at end of file
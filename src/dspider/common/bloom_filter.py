@@ -0,0 +1,252 @@
+import hashlib
+import json
+import math
+import mmap
+import os
+import struct
+from typing import Iterable, List, Optional
+
+SNAPSHOT_MAGIC = b'DSBF'
+SNAPSHOT_VERSION = 1
+
+
+def optimal_params(capacity: int, error_rate: float):
+    """计算容量与误判率对应的位数和哈希函数个数"""
+    num_bits = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+    num_hashes = max(1, round(num_bits / capacity * math.log(2)))
+    return num_bits, num_hashes
+
+
+class BloomFilter:
+    """定长布隆过滤器
+
+    用于在内存中紧凑地记录已见过的键，判定为不存在时一定不存在，判定为存在时有error_rate的误判率。
+    位数组可以是bytearray，也可以是内存映射文件的一段（见ScalableBloomFilter.load）。
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.001, bits=None, count: int = 0):
+        """初始化布隆过滤器
+
+        Args:
+            capacity: 预期容纳的键数量
+            error_rate: 达到容量时的误判率
+            bits: 已有的位数组，为None时新建
+            count: 已有位数组中的键数量
+        """
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits, self.num_hashes = optimal_params(capacity, error_rate)
+        size = (self.num_bits + 7) // 8
+        if bits is None:
+            bits = bytearray(size)
+        elif len(bits) != size:
+            raise ValueError(f"位数组长度不匹配: {len(bits)} != {size}")
+        self.bits = bits
+        self.count = count
+
+    def _positions(self, key: str) -> List[int]:
+        # 双重哈希：由一次blake2b得到两个64位哈希，组合出num_hashes个位置
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, key: str) -> bool:
+        """添加键
+
+        Args:
+            key: 键
+
+        Returns:
+            bool: 添加前是否已存在（可能误判）
+        """
+        exists = True
+        bits = self.bits
+        for position in self._positions(key):
+            byte, bit = divmod(position, 8)
+            if not bits[byte] & (1 << bit):
+                exists = False
+                bits[byte] |= 1 << bit
+        if not exists:
+            self.count += 1
+        return exists
+
+    def __contains__(self, key: str) -> bool:
+        bits = self.bits
+        for position in self._positions(key):
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def is_full(self) -> bool:
+        return self.count >= self.capacity
+
+    def add_many(self, keys: Iterable[str]) -> List[bool]:
+        """批量添加键，返回每个键添加前是否已存在"""
+        return [self.add(key) for key in keys]
+
+    def contains_many(self, keys: Iterable[str]) -> List[bool]:
+        """批量判断键是否存在"""
+        return [key in self for key in keys]
+
+    def estimate_count(self) -> int:
+        """根据置位比例估计键数量，用于合并后的计数"""
+        set_bits = int.from_bytes(self.bits, 'little').bit_count()
+        if set_bits >= self.num_bits:
+            return self.capacity
+        return int(-self.num_bits / self.num_hashes * math.log(1 - set_bits / self.num_bits))
+
+    def merge(self, other: 'BloomFilter'):
+        """按位或合并另一个同参数的过滤器
+
+        Args:
+            other: 容量与误判率相同的过滤器
+        """
+        if (self.num_bits, self.num_hashes) != (other.num_bits, other.num_hashes):
+            raise ValueError("布隆过滤器参数不一致，无法合并")
+        merged = int.from_bytes(self.bits, 'little') | int.from_bytes(other.bits, 'little')
+        self.bits[:] = merged.to_bytes(len(self.bits), 'little')
+        self.count = self.estimate_count()
+
+
+class ScalableBloomFilter:
+    """可扩容布隆过滤器
+
+    由一组容量按growth倍增长、误判率按ratio倍收紧的BloomFilter组成，写满一个就追加下一个，
+    总误判率收敛于error_rate / (1 - ratio)，无需预先知道键的总量。
+    同参数创建的两个过滤器可以合并，用于汇总多个Worker各自记录的指纹。
+    """
+
+    def __init__(self, initial_capacity: int = 1000000, error_rate: float = 0.001,
+                 growth: int = 2, ratio: float = 0.5):
+        """初始化可扩容布隆过滤器
+
+        Args:
+            initial_capacity: 第一个过滤器的容量
+            error_rate: 第一个过滤器的误判率
+            growth: 后续过滤器的容量增长倍数
+            ratio: 后续过滤器的误判率收紧倍数
+        """
+        self.initial_capacity = initial_capacity
+        self.error_rate = error_rate
+        self.growth = growth
+        self.ratio = ratio
+        self.filters: List[BloomFilter] = []
+        self._mmap: Optional[mmap.mmap] = None
+
+    def _stage_params(self, index: int):
+        return self.initial_capacity * self.growth ** index, self.error_rate * self.ratio ** index
+
+    def _append_filter(self) -> BloomFilter:
+        capacity, error_rate = self._stage_params(len(self.filters))
+        bloom = BloomFilter(capacity, error_rate)
+        self.filters.append(bloom)
+        return bloom
+
+    def __contains__(self, key: str) -> bool:
+        # 新键多落在最后一个过滤器，倒序查找
+        return any(key in bloom for bloom in reversed(self.filters))
+
+    def __len__(self) -> int:
+        return sum(len(bloom) for bloom in self.filters)
+
+    def add(self, key: str) -> bool:
+        """添加键
+
+        Args:
+            key: 键
+
+        Returns:
+            bool: 添加前是否已存在（可能误判）
+        """
+        if key in self:
+            return True
+        bloom = self.filters[-1] if self.filters and not self.filters[-1].is_full else self._append_filter()
+        bloom.add(key)
+        return False
+
+    def add_many(self, keys: Iterable[str]) -> List[bool]:
+        """批量添加键，返回每个键添加前是否已存在"""
+        return [self.add(key) for key in keys]
+
+    def contains_many(self, keys: Iterable[str]) -> List[bool]:
+        """批量判断键是否存在"""
+        return [key in self for key in keys]
+
+    @property
+    def nbytes(self) -> int:
+        return sum(len(bloom.bits) for bloom in self.filters)
+
+    def merge(self, other: 'ScalableBloomFilter'):
+        """合并另一个同参数的可扩容过滤器，对应位置的过滤器按位或，多出的过滤器直接追加
+
+        Args:
+            other: initial_capacity/error_rate/growth/ratio相同的过滤器
+        """
+        if (self.initial_capacity, self.error_rate, self.growth, self.ratio) != \
+                (other.initial_capacity, other.error_rate, other.growth, other.ratio):
+            raise ValueError("可扩容布隆过滤器参数不一致，无法合并")
+        for index, bloom in enumerate(other.filters):
+            if index < len(self.filters):
+                self.filters[index].merge(bloom)
+            else:
+                capacity, error_rate = self._stage_params(index)
+                self.filters.append(BloomFilter(capacity, error_rate, bytearray(bloom.bits), bloom.count))
+
+    def save(self, path: str):
+        """保存快照到本地文件，先写临时文件再替换，避免读到写了一半的快照
+
+        文件格式：魔数 + 版本 + 头部长度 + JSON头部 + 各过滤器位数组
+        """
+        header = json.dumps({
+            'initial_capacity': self.initial_capacity,
+            'error_rate': self.error_rate,
+            'growth': self.growth,
+            'ratio': self.ratio,
+            'counts': [bloom.count for bloom in self.filters],
+        }).encode('utf-8')
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(SNAPSHOT_MAGIC + struct.pack('<HI', SNAPSHOT_VERSION, len(header)) + header)
+            for bloom in self.filters:
+                f.write(bloom.bits)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, use_mmap: bool = True) -> 'ScalableBloomFilter':
+        """从本地快照加载
+
+        Args:
+            path: 快照文件路径
+            use_mmap: 是否以写时复制方式映射文件，按需分页加载，适合数百MB的快照
+
+        Returns:
+            ScalableBloomFilter: 过滤器
+        """
+        with open(path, 'rb') as f:
+            if use_mmap:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+            else:
+                data = bytearray(f.read())
+        if bytes(data[:4]) != SNAPSHOT_MAGIC:
+            raise ValueError(f"不是布隆过滤器快照: {path}")
+        version, header_length = struct.unpack('<HI', data[4:10])
+        if version != SNAPSHOT_VERSION:
+            raise ValueError(f"不支持的快照版本: {version}")
+        header = json.loads(bytes(data[10:10 + header_length]).decode('utf-8'))
+
+        scalable = cls(header['initial_capacity'], header['error_rate'], header['growth'], header['ratio'])
+        if use_mmap:
+            scalable._mmap = data
+        view = memoryview(data)
+        offset = 10 + header_length
+        for index, count in enumerate(header['counts']):
+            capacity, error_rate = scalable._stage_params(index)
+            size = (optimal_params(capacity, error_rate)[0] + 7) // 8
+            scalable.filters.append(BloomFilter(capacity, error_rate, view[offset:offset + size], count))
+            offset += size
+        return scalable
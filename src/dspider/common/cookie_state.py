@@ -0,0 +1,49 @@
+import time
+from typing import Any, Dict, Iterable, Optional
+
+# 数据源配置中记录请求头/cookie捕获状态的字段，时间均为Unix时间戳（秒）：
+#   captured_at: 最近一次捕获请求头的时间
+#   expires_at: 捕获时观察到的接口cookie最早过期时间，只有会话cookie时为None
+#   rejected_at: Worker最近一次请求被拒（401/403）的时间，捕获后清空
+#   rejected_status: 被拒时的状态码
+#   updated_at: 状态最近一次变化的时间，CookieManager据此增量同步
+COOKIE_STATE_FIELD = 'cookie_state'
+
+# 视为请求头/cookie失效的响应状态码
+AUTH_REJECTED_STATUS = (401, 403)
+
+
+def cookie_expiry(cookies: Iterable[Dict[str, Any]]) -> Optional[float]:
+    """取cookie中最早的过期时间
+
+    Args:
+        cookies: Playwright的BrowserContext.cookies返回的cookie列表，expires为-1表示会话cookie
+
+    Returns:
+        Optional[float]: 最早过期时间，没有带过期时间的cookie时返回None
+    """
+    expires = [cookie['expires'] for cookie in cookies if (cookie.get('expires') or -1) > 0]
+    return min(expires) if expires else None
+
+
+def captured_update(headers: dict, expires_at: Optional[float], now: Optional[float] = None) -> dict:
+    """捕获请求头后写回数据源配置的更新内容"""
+    now = now or time.time()
+    return {'$set': {
+        'request_params.headers': headers,
+        f'{COOKIE_STATE_FIELD}.captured_at': now,
+        f'{COOKIE_STATE_FIELD}.expires_at': expires_at,
+        f'{COOKIE_STATE_FIELD}.rejected_at': None,
+        f'{COOKIE_STATE_FIELD}.rejected_status': None,
+        f'{COOKIE_STATE_FIELD}.updated_at': now,
+    }}
+
+
+def rejected_update(status_code: int, now: Optional[float] = None) -> dict:
+    """Worker请求被拒后写回数据源配置的更新内容"""
+    now = now or time.time()
+    return {'$set': {
+        f'{COOKIE_STATE_FIELD}.rejected_at': now,
+        f'{COOKIE_STATE_FIELD}.rejected_status': status_code,
+        f'{COOKIE_STATE_FIELD}.updated_at': now,
+    }}
@@ -1,8 +1,9 @@
 import logging
 from enum import Enum
 
-from dspider.common.mongodb_service import MongoDBService
+from dspider.common.mongodb_service import MongoDBService, AsyncMongoDBService
 from dspider.common.minio_service import MinIOService
+from dspider.common.rabbitmq_service import RabbitMQService, AsyncRabbitMQClient
 from dspider.common.load_config import config
 
 logging.basicConfig(
@@ -19,6 +20,8 @@ class data_source_type(Enum):
     MONGODB = 'mongodb'
     MINIO = 'minio'
     RABBITMQ = 'rabbitmq'
+    ASYNC_MONGODB = 'async_mongodb'
+    ASYNC_RABBITMQ = 'async_rabbitmq'
 
 class DataSourceManager:
     """数据源管理类"""
@@ -27,6 +30,9 @@ class DataSourceManager:
         self.data_source_types = {}
         self.register_data_source_type('mongodb', MongoDBService)
         self.register_data_source_type('minio', MinIOService)
+        self.register_data_source_type('rabbitmq', RabbitMQService)
+        self.register_data_source_type('async_mongodb', AsyncMongoDBService)
+        self.register_data_source_type('async_rabbitmq', AsyncRabbitMQClient)
     
     def register_data_source_type(self, data_source_type: str, data_source_class: type):
         """注册数据源类型"""
@@ -39,10 +45,16 @@ class DataSourceManager:
             raise ValueError(f"未注册数据源类型: {data_source_type}")
         return data_source_class(**kwargs)
     
-    def get_data_source_with_config(self, data_source_type: str):
-        """根据配置获取数据源实例"""
-        data_source_config = config.get(data_source_type)
+    def get_data_source_with_config(self, data_source_type: str, config_key: str = None):
+        """根据配置获取数据源实例
+        
+        Args:
+            data_source_type: 数据源类型
+            config_key: 配置项名称，默认与数据源类型相同（异步数据源复用同步数据源的配置）
+        """
+        config_key = config_key or data_source_type
+        data_source_config = config.get(config_key)
         if not data_source_config:
-            raise ValueError(f"未配置数据源: {data_source_type}")
+            raise ValueError(f"未配置数据源: {config_key}")
         return self.create_data_source(data_source_type, **data_source_config)
         
\ No newline at end of file
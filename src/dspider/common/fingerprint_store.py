@@ -0,0 +1,185 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from dspider.common.bloom_filter import ScalableBloomFilter
+from dspider.common.minio_service import MinIOService
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+# 请求描述：URL，或(方法, URL, 请求体)
+Request = Union[str, Tuple[str, str, Optional[Union[Dict[str, Any], str]]]]
+
+
+def canonicalize_url(url: str) -> str:
+    """规范化URL：scheme与host小写、去掉默认端口与片段、查询参数排序
+
+    Args:
+        url: 原始URL
+
+    Returns:
+        str: 规范化后的URL
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, parts.path or '/', query, ''))
+
+
+def request_fingerprint(url: str, method: str = 'GET',
+                        postdata: Optional[Union[Dict[str, Any], str]] = None) -> str:
+    """计算请求指纹，相同语义的请求得到相同指纹
+
+    Args:
+        url: 请求地址
+        method: 请求方法
+        postdata: 请求体，字典按键排序后参与计算
+
+    Returns:
+        str: 40位十六进制sha1
+    """
+    if isinstance(postdata, dict):
+        body = json.dumps(postdata, sort_keys=True, ensure_ascii=False)
+    else:
+        body = postdata or ''
+    raw = f"{method.upper()} {canonicalize_url(url)} {body}"
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+class FingerprintStore:
+    """URL/请求体指纹集合
+
+    基于ScalableBloomFilter记录已抓取的请求，支持批量查询、本地快照（内存映射加载）
+    与MinIO快照，以及合并其他Worker的快照。判定为已抓取的请求有极小的误判率，
+    需要精确结果的场景应以数据库为准，本类只用于快速排除。
+    """
+
+    def __init__(self, initial_capacity: int = 1000000, error_rate: float = 0.005,
+                 growth: int = 4, ratio: float = 0.9, bloom: Optional[ScalableBloomFilter] = None):
+        """初始化指纹集合
+
+        默认参数下3.4亿指纹约占用480MB内存，总误判率约2%
+
+        Args:
+            initial_capacity: 布隆过滤器初始容量
+            error_rate: 第一个过滤器的误判率
+            growth: 过滤器容量增长倍数
+            ratio: 过滤器误判率收紧倍数
+            bloom: 已有的过滤器（从快照加载时使用）
+        """
+        self.bloom = bloom or ScalableBloomFilter(initial_capacity, error_rate, growth, ratio)
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def fingerprint(request: Request) -> str:
+        if isinstance(request, str):
+            return request_fingerprint(request)
+        method, url, postdata = request
+        return request_fingerprint(url, method, postdata)
+
+    def __len__(self) -> int:
+        return len(self.bloom)
+
+    def add_many(self, requests: Iterable[Request]) -> List[bool]:
+        """批量记录请求
+
+        Args:
+            requests: URL或(方法, URL, 请求体)
+
+        Returns:
+            List[bool]: 每个请求记录前是否已存在
+        """
+        return self.add_fingerprints([self.fingerprint(request) for request in requests])
+
+    def contains_many(self, requests: Iterable[Request]) -> List[bool]:
+        """批量判断请求是否已记录"""
+        return self.contains_fingerprints([self.fingerprint(request) for request in requests])
+
+    def add_fingerprints(self, fingerprints: Iterable[str]) -> List[bool]:
+        """批量记录调用方自行计算的指纹（如DetailUrlIndex的详情页指纹）
+
+        Returns:
+            List[bool]: 每个指纹记录前是否已存在
+        """
+        with self.lock:
+            return self.bloom.add_many(fingerprints)
+
+    def contains_fingerprints(self, fingerprints: Iterable[str]) -> List[bool]:
+        """批量判断指纹是否已记录"""
+        with self.lock:
+            return self.bloom.contains_many(fingerprints)
+
+    def merge(self, other: 'FingerprintStore'):
+        """合并其他Worker的指纹集合"""
+        with self.lock:
+            self.bloom.merge(other.bloom)
+
+    def save(self, path: str):
+        """保存快照到本地文件"""
+        with self.lock:
+            self.bloom.save(path)
+        logger.info(f"指纹快照已保存: {path}, 指纹数 {len(self.bloom)}, 大小 {self.bloom.nbytes} 字节")
+
+    @classmethod
+    def load(cls, path: str, use_mmap: bool = True) -> 'FingerprintStore':
+        """从本地快照加载
+
+        Args:
+            path: 快照文件路径
+            use_mmap: 是否内存映射加载
+
+        Returns:
+            FingerprintStore: 指纹集合
+        """
+        return cls(bloom=ScalableBloomFilter.load(path, use_mmap))
+
+    def save_to_minio(self, minio_client: MinIOService, bucket_name: str, object_name: str,
+                      local_path: str) -> bool:
+        """保存快照到本地后上传MinIO
+
+        Args:
+            minio_client: MinIO服务
+            bucket_name: 存储桶名称
+            object_name: 对象名称
+            local_path: 本地快照路径
+
+        Returns:
+            bool: 是否成功
+        """
+        self.save(local_path)
+        return minio_client.upload_file(bucket_name, object_name, local_path, 'application/octet-stream')
+
+    @classmethod
+    def load_from_minio(cls, minio_client: MinIOService, bucket_name: str, object_name: str,
+                        local_path: str) -> Optional['FingerprintStore']:
+        """从MinIO下载快照并内存映射加载
+
+        Returns:
+            Optional[FingerprintStore]: 指纹集合，下载失败返回None
+        """
+        if not minio_client.download_file(bucket_name, object_name, local_path):
+            return None
+        return cls.load(local_path)
+
+    def merge_from_minio(self, minio_client: MinIOService, bucket_name: str, object_name: str,
+                         local_path: str) -> bool:
+        """下载其他Worker上传的快照并合并
+
+        Returns:
+            bool: 是否成功合并
+        """
+        other = self.load_from_minio(minio_client, bucket_name, object_name, local_path)
+        if other is None:
+            return False
+        self.merge(other)
+        os.remove(local_path)
+        return True
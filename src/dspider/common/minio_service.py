@@ -1,14 +1,57 @@
 import logging
 from minio import Minio
 from minio.error import S3Error
-from typing import Optional, Dict, Any, Union, IO
+from typing import Optional, Dict, Any, Union, IO, Iterable, Iterator
 import io
+import os
+import json
+import mmap
+from collections import OrderedDict
+import threading
 import time
 
 from dspider.common.load_config import config
+from dspider.common.page_archive import DEFAULT_SEGMENT_SIZE, FOOTER, PageArchiveWriter, decompress, parse_footer
 
 logger = logging.getLogger(__name__)
 
+# 进程内已确认存在的存储桶，(endpoint, bucket_name)，避免每次上传都请求bucket_exists
+_known_buckets = set()
+_known_buckets_lock = threading.Lock()
+
+# 进程内已确认存在的内容寻址对象，(endpoint, bucket_name, object_name)，按LRU淘汰
+KNOWN_OBJECTS_MAXSIZE = 100000
+_known_objects = OrderedDict()
+_known_objects_lock = threading.Lock()
+
+DEFAULT_PART_SIZE = 16 * 1024 * 1024 # 分片上传的分片大小，MinIO要求不小于5MiB
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+
+
+class IteratorReader(io.RawIOBase):
+    """将bytes迭代器包装为可read的流，供put_object分片读取"""
+    
+    def __init__(self, chunks: Iterable[bytes]):
+        self.chunks = iter(chunks)
+        self.buffer = bytearray()
+    
+    def readable(self) -> bool:
+        return True
+    
+    def read(self, size: int = -1) -> bytes:
+        while size < 0 or len(self.buffer) < size:
+            chunk = next(self.chunks, None)
+            if chunk is None:
+                break
+            self.buffer += chunk
+        if size < 0 or size >= len(self.buffer):
+            data, self.buffer = bytes(self.buffer), bytearray()
+        else:
+            data = bytes(self.buffer[:size])
+            del self.buffer[:size]
+        return data
+
+
 class MinIOService:
     """MinIO客户端管理类"""
     
@@ -57,10 +100,15 @@ class MinIOService:
             logger.error("MinIO客户端未初始化")
             return False
         
+        key = (self.endpoint, bucket_name)
+        if key in _known_buckets:
+            return True
         try:
             if not self.client.bucket_exists(bucket_name):
                 self.client.make_bucket(bucket_name)
                 logger.info(f"成功创建存储桶: {bucket_name}")
+            with _known_buckets_lock:
+                _known_buckets.add(key)
             return True
         except S3Error as e:
             logger.error(f"操作存储桶失败: {str(e)}")
@@ -78,6 +126,20 @@ class MinIOService:
             text: 要上传的文本内容
             content_type: 内容类型
             
+        Returns:
+            bool: 是否成功
+        """
+        return self.upload_bytes(bucket_name, object_name, text.encode('utf-8'), content_type)
+    
+    def upload_bytes(self, bucket_name: str, object_name: str, data: bytes, content_type: str = "text/plain") -> bool:
+        """上传字节内容到MinIO
+        
+        Args:
+            bucket_name: 存储桶名称
+            object_name: 对象名称
+            data: 要上传的内容（已编码）
+            content_type: 内容类型
+            
         Returns:
             bool: 是否成功
         """
@@ -90,28 +152,90 @@ class MinIOService:
             if not self.ensure_bucket_exists(bucket_name):
                 return False
             
-            # 将文本转换为字节流
-            data = io.BytesIO(text.encode('utf-8'))
-            length = len(text.encode('utf-8'))
-            
             # 上传对象
             self.client.put_object(
                 bucket_name,
                 object_name,
-                data=data,
-                length=length,
+                data=io.BytesIO(data),
+                length=len(data),
                 content_type=content_type
             )
             
-            logger.info(f"成功上传文本到MinIO: {bucket_name}/{object_name}")
+            logger.info(f"成功上传到MinIO: {bucket_name}/{object_name}")
             return True
         except S3Error as e:
-            logger.error(f"上传文本到MinIO失败: {str(e)}")
+            logger.error(f"上传到MinIO失败: {str(e)}")
             return False
         except Exception as e:
-            logger.error(f"上传文本到MinIO时发生未知错误: {str(e)}")
+            logger.error(f"上传到MinIO时发生未知错误: {str(e)}")
             return False
     
+    def is_known_object(self, bucket_name: str, object_name: str) -> bool:
+        """本进程是否已确认对象存在（只查本地缓存，不请求MinIO）"""
+        key = (self.endpoint, bucket_name, object_name)
+        with _known_objects_lock:
+            if key in _known_objects:
+                _known_objects.move_to_end(key)
+                return True
+        return False
+    
+    def remember_object(self, bucket_name: str, object_name: str) -> None:
+        """记录对象已存在，只用于内容寻址（内容不可变）的对象"""
+        with _known_objects_lock:
+            _known_objects[(self.endpoint, bucket_name, object_name)] = True
+            _known_objects.move_to_end((self.endpoint, bucket_name, object_name))
+            while len(_known_objects) > KNOWN_OBJECTS_MAXSIZE:
+                _known_objects.popitem(last=False)
+    
+    def object_exists(self, bucket_name: str, object_name: str) -> bool:
+        """判断对象是否存在，先查本地缓存，再请求stat_object
+        
+        Args:
+            bucket_name: 存储桶名称
+            object_name: 对象名称
+            
+        Returns:
+            bool: 是否存在，请求出错时返回False
+        """
+        if self.is_known_object(bucket_name, object_name):
+            return True
+        if not self.client:
+            logger.error("MinIO客户端未初始化")
+            return False
+        
+        try:
+            self.client.stat_object(bucket_name, object_name)
+        except S3Error as e:
+            if e.code not in ('NoSuchKey', 'NoSuchObject', 'NoSuchBucket'):
+                logger.error(f"查询MinIO对象失败: {bucket_name}/{object_name} {str(e)}")
+            return False
+        except Exception as e:
+            logger.error(f"查询MinIO对象时发生未知错误: {str(e)}")
+            return False
+        self.remember_object(bucket_name, object_name)
+        return True
+    
+    def upload_bytes_if_absent(self, bucket_name: str, object_name: str, data: bytes,
+                               content_type: str = "text/plain") -> bool:
+        """对象不存在时才上传，用于对象名由内容哈希决定的内容寻址存储
+        
+        Args:
+            bucket_name: 存储桶名称
+            object_name: 对象名称（内容哈希）
+            data: 要上传的内容
+            content_type: 内容类型
+            
+        Returns:
+            bool: 对象是否已存在或上传成功
+        """
+        if self.object_exists(bucket_name, object_name):
+            logger.debug(f"对象已存在，跳过上传: {bucket_name}/{object_name}")
+            return True
+        if not self.upload_bytes(bucket_name, object_name, data, content_type):
+            return False
+        self.remember_object(bucket_name, object_name)
+        return True
+    
     def upload_file(self, bucket_name: str, object_name: str, file_path: str, content_type: Optional[str] = None) -> bool:
         """上传本地文件到MinIO
         
@@ -150,6 +274,254 @@ class MinIOService:
             logger.error(f"上传文件到MinIO时发生未知错误: {str(e)}")
             return False
     
+    def download_file(self, bucket_name: str, object_name: str, file_path: str) -> bool:
+        """下载MinIO对象到本地文件
+        
+        Args:
+            bucket_name: 存储桶名称
+            object_name: 对象名称
+            file_path: 本地文件路径
+            
+        Returns:
+            bool: 是否成功
+        """
+        if not self.client:
+            logger.error("MinIO客户端未初始化")
+            return False
+        
+        try:
+            self.client.fget_object(bucket_name, object_name, file_path)
+            logger.info(f"成功从MinIO下载文件: {bucket_name}/{object_name} -> {file_path}")
+            return True
+        except S3Error as e:
+            logger.error(f"从MinIO下载文件失败: {str(e)}")
+            return False
+        except Exception as e:
+            logger.error(f"从MinIO下载文件时发生未知错误: {str(e)}")
+            return False
+    
+    def upload_stream(self, bucket_name: str, object_name: str, source: Union[IO[bytes], Iterable[bytes]],
+                      length: int = -1, part_size: int = DEFAULT_PART_SIZE,
+                      content_type: str = "application/octet-stream") -> bool:
+        """流式分片上传，内存占用与分片大小相当，与内容总大小无关
+        
+        Args:
+            bucket_name: 存储桶名称
+            object_name: 对象名称
+            source: 文件对象或bytes迭代器
+            length: 内容长度，未知时为-1
+            part_size: 分片大小
+            content_type: 内容类型
+            
+        Returns:
+            bool: 是否成功
+        """
+        if not self.client:
+            logger.error("MinIO客户端未初始化")
+            return False
+        
+        try:
+            if not self.ensure_bucket_exists(bucket_name):
+                return False
+            data = source if hasattr(source, 'read') else IteratorReader(source)
+            self.client.put_object(
+                bucket_name,
+                object_name,
+                data=data,
+                length=length,
+                content_type=content_type,
+                part_size=part_size
+            )
+            logger.info(f"成功流式上传到MinIO: {bucket_name}/{object_name}")
+            return True
+        except S3Error as e:
+            logger.error(f"流式上传到MinIO失败: {str(e)}")
+            return False
+        except Exception as e:
+            logger.error(f"流式上传到MinIO时发生未知错误: {str(e)}")
+            return False
+    
+    def iter_object(self, bucket_name: str, object_name: str, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                    offset: int = 0, length: int = 0) -> Optional[Iterator[bytes]]:
+        """流式下载对象，逐块返回内容
+        
+        Args:
+            bucket_name: 存储桶名称
+            object_name: 对象名称
+            chunk_size: 每块字节数
+            offset: 起始字节
+            length: 读取长度，0表示读到结尾
+            
+        Returns:
+            Optional[Iterator[bytes]]: 内容块迭代器，迭代结束或提前关闭时释放连接；请求失败返回None
+        """
+        if not self.client:
+            logger.error("MinIO客户端未初始化")
+            return None
+        
+        try:
+            response = self.client.get_object(bucket_name, object_name, offset=offset, length=length)
+        except S3Error as e:
+            logger.error(f"从MinIO流式下载失败: {bucket_name}/{object_name} {str(e)}")
+            return None
+        except Exception as e:
+            logger.error(f"从MinIO流式下载时发生未知错误: {str(e)}")
+            return None
+        
+        def chunks():
+            try:
+                yield from response.stream(chunk_size)
+            finally:
+                response.close()
+                response.release_conn()
+        return chunks()
+    
+    def download_mmap(self, bucket_name: str, object_name: str, file_path: str) -> Optional[mmap.mmap]:
+        """流式下载对象到本地文件并只读映射，按需分页加载，适合扫描大对象
+        
+        Args:
+            bucket_name: 存储桶名称
+            object_name: 对象名称
+            file_path: 本地文件路径
+            
+        Returns:
+            Optional[mmap.mmap]: 文件映射，使用后需close；下载失败或对象为空返回None
+        """
+        if not self.download_file(bucket_name, object_name, file_path):
+            return None
+        with open(file_path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return None
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    
+    def iter_archived_pages(self, bucket_name: str, segment: str,
+                            chunk_size: int = DEFAULT_CHUNK_SIZE) -> Optional[Iterator[Dict[str, Any]]]:
+        """顺序流式读取分段对象中的所有页面，内存占用与单个页面相当
+        
+        Args:
+            bucket_name: 存储桶名称
+            segment: 分段对象名称
+            chunk_size: 下载块大小
+            
+        Returns:
+            Optional[Iterator[Dict[str, Any]]]: 逐页返回{'key': 页面标识, 'text': 页面文本}；读取失败返回None
+        """
+        index = self.read_archive_index(bucket_name, segment)
+        if index is None:
+            return None
+        pages = sorted(index['pages'], key=lambda page: page['offset'])
+        if not pages:
+            return iter(())
+        end = pages[-1]['offset'] + pages[-1]['length']
+        chunks = self.iter_object(bucket_name, segment, chunk_size, offset=pages[0]['offset'], length=end - pages[0]['offset'])
+        if chunks is None:
+            return None
+        
+        def iter_pages():
+            buffer, position = bytearray(), pages[0]['offset'] # position为buffer首字节在对象中的偏移
+            chunk_iter = iter(chunks)
+            try:
+                for page in pages:
+                    start, stop = page['offset'] - position, page['offset'] + page['length'] - position
+                    while len(buffer) < stop:
+                        chunk = next(chunk_iter, None)
+                        if chunk is None:
+                            raise ValueError(f"分段对象内容不完整: {bucket_name}/{segment}")
+                        buffer += chunk
+                    frame = bytes(buffer[start:stop])
+                    del buffer[:stop]
+                    position += stop
+                    yield {'key': page['key'], 'text': decompress(frame, index['codec']).decode('utf-8')}
+            finally:
+                chunks.close()
+        return iter_pages()
+    
+    def get_range(self, bucket_name: str, object_name: str, offset: int, length: int) -> Optional[bytes]:
+        """按字节范围读取对象
+        
+        Args:
+            bucket_name: 存储桶名称
+            object_name: 对象名称
+            offset: 起始字节
+            length: 读取长度
+            
+        Returns:
+            Optional[bytes]: 读取的内容，如果失败则返回None
+        """
+        if not self.client:
+            logger.error("MinIO客户端未初始化")
+            return None
+        
+        response = None
+        try:
+            response = self.client.get_object(bucket_name, object_name, offset=offset, length=length)
+            return response.read()
+        except S3Error as e:
+            logger.error(f"从MinIO按范围读取失败: {bucket_name}/{object_name} [{offset}, +{length}] {str(e)}")
+            return None
+        except Exception as e:
+            logger.error(f"从MinIO按范围读取时发生未知错误: {str(e)}")
+            return None
+        finally:
+            if response is not None:
+                response.close()
+                response.release_conn()
+    
+    def archive_writer(self, bucket_name: str, prefix: str, codec: str = 'gzip',
+                       segment_size: int = DEFAULT_SEGMENT_SIZE) -> PageArchiveWriter:
+        """创建页面归档写入器，多个页面压缩后打包为一个分段对象，见PageArchiveWriter
+        
+        Args:
+            bucket_name: 存储桶名称
+            prefix: 分段对象名前缀
+            codec: 压缩格式，gzip或zstd
+            segment_size: 分段封存阈值（压缩后字节数）
+            
+        Returns:
+            PageArchiveWriter: 写入器
+        """
+        return PageArchiveWriter(self, bucket_name, prefix, codec, segment_size)
+    
+    def read_archived_page(self, bucket_name: str, entry: Dict[str, Any]) -> Optional[str]:
+        """按归档条目读取单个页面，只下载该页面的压缩帧
+        
+        Args:
+            bucket_name: 存储桶名称
+            entry: PageArchiveWriter.add返回的条目
+            
+        Returns:
+            Optional[str]: 页面文本，如果失败则返回None
+        """
+        frame = self.get_range(bucket_name, entry['segment'], entry['offset'], entry['length'])
+        if frame is None:
+            return None
+        return decompress(frame, entry['codec']).decode('utf-8')
+    
+    def read_archive_index(self, bucket_name: str, segment: str) -> Optional[Dict[str, Any]]:
+        """读取分段对象尾部的页面索引
+        
+        Args:
+            bucket_name: 存储桶名称
+            segment: 分段对象名称
+            
+        Returns:
+            Optional[Dict[str, Any]]: {'codec': 压缩格式, 'pages': [{'key', 'offset', 'length', 'size'}]}
+        """
+        if not self.client:
+            logger.error("MinIO客户端未初始化")
+            return None
+        try:
+            size = self.client.stat_object(bucket_name, segment).size
+        except Exception as e:
+            logger.error(f"获取分段对象信息失败: {bucket_name}/{segment} {str(e)}")
+            return None
+        footer = self.get_range(bucket_name, segment, size - FOOTER.size, FOOTER.size)
+        if footer is None:
+            return None
+        index_offset, index_length = parse_footer(footer)
+        index = self.get_range(bucket_name, segment, index_offset, index_length)
+        return json.loads(index) if index is not None else None
+    
     def get_text(self, bucket_name: str, object_name: str) -> Optional[str]:
         """从MinIO获取文本内容
         
@@ -3,10 +3,14 @@ import logging
 import time
 from typing import Optional, Dict, Any, List
 
+from pymongo.errors import BulkWriteError
+
 from dspider.common.load_config import config
 
 logger = logging.getLogger(__name__)
 
+DUPLICATE_KEY_ERROR = 11000
+
 class MongoDBService:
     """MongoDB连接管理类"""
     
@@ -107,12 +111,14 @@ class MongoDBService:
             logger.error(f"插入文档失败: {str(e)}")
         return None
     
-    def insert_many(self, collection_name: str, documents: List[Dict[str, Any]]) -> Optional[List[str]]:
+    def insert_many(self, collection_name: str, documents: List[Dict[str, Any]],
+                    ordered: bool = True) -> Optional[List[str]]:
         """批量插入文档
         
         Args:
             collection_name: 集合名称
             documents: 文档列表
+            ordered: 是否按顺序插入（遇错即停）。为False时跳过_id重复的文档，其余照常插入
             
         Returns:
             List[str]: 插入的文档ID列表，失败返回None
@@ -120,9 +126,16 @@ class MongoDBService:
         try:
             collection = self.get_collection(collection_name)
             if collection is not None:
-                result = collection.insert_many(documents)
+                result = collection.insert_many(documents, ordered=ordered)
                 logger.info(f"成功插入 {len(documents)} 条文档到 {collection_name}")
                 return [str(_id) for _id in result.inserted_ids]
+        except BulkWriteError as e:
+            write_errors = e.details.get('writeErrors', [])
+            if not ordered and all(error['code'] == DUPLICATE_KEY_ERROR for error in write_errors):
+                duplicated = {error['index'] for error in write_errors}
+                logger.info(f"插入 {len(documents) - len(duplicated)} 条文档到 {collection_name}, 跳过重复 {len(duplicated)} 条")
+                return [str(document['_id']) for i, document in enumerate(documents) if i not in duplicated]
+            logger.error(f"批量插入文档失败: {str(e)}")
         except Exception as e:
             logger.error(f"批量插入文档失败: {str(e)}")
         return None
@@ -175,13 +188,14 @@ class MongoDBService:
         return []
     
     def update_one(self, collection_name: str, query: Dict[str, Any], 
-                   update: Dict[str, Any]) -> bool:
+                   update: Dict[str, Any], upsert: bool = False) -> bool:
         """更新单条文档
         
         Args:
             collection_name: 集合名称
             query: 查询条件
             update: 更新内容
+            upsert: 不存在时是否插入
             
         Returns:
             bool: 是否更新成功
@@ -189,13 +203,77 @@ class MongoDBService:
         try:
             collection = self.get_collection(collection_name)
             if collection is not None:
-                result = collection.update_one(query, update)
+                result = collection.update_one(query, update, upsert=upsert)
                 logger.info(f"更新文档结果: 匹配 {result.matched_count}, 修改 {result.modified_count}")
-                return result.modified_count > 0
+                return result.modified_count > 0 or result.upserted_id is not None
         except Exception as e:
             logger.error(f"更新文档失败: {str(e)}")
         return False
-    
+
+    def update_many(self, collection_name: str, query: Dict[str, Any],
+                    update: Dict[str, Any]) -> int:
+        """批量更新文档
+
+        Args:
+            collection_name: 集合名称
+            query: 查询条件
+            update: 更新内容
+
+        Returns:
+            int: 修改的文档数，失败返回-1
+        """
+        try:
+            collection = self.get_collection(collection_name)
+            if collection is not None:
+                result = collection.update_many(query, update)
+                logger.info(f"批量更新文档结果: 匹配 {result.matched_count}, 修改 {result.modified_count}")
+                return result.modified_count
+        except Exception as e:
+            logger.error(f"批量更新文档失败: {str(e)}")
+        return -1
+
+    def bulk_write(self, collection_name: str, operations: List[Any], ordered: bool = False) -> int:
+        """批量执行写操作，一次往返提交多条UpdateOne/InsertOne等操作
+
+        Args:
+            collection_name: 集合名称
+            operations: pymongo写操作列表
+            ordered: 是否按顺序执行（遇错即停）
+
+        Returns:
+            int: 修改的文档数，失败返回-1
+        """
+        if not operations:
+            return 0
+        try:
+            collection = self.get_collection(collection_name)
+            if collection is not None:
+                result = collection.bulk_write(operations, ordered=ordered)
+                logger.info(f"批量写入 {collection_name} {len(operations)} 个操作: 匹配 {result.matched_count}, 修改 {result.modified_count}")
+                return result.modified_count
+        except Exception as e:
+            logger.error(f"批量写入失败: {str(e)}")
+        return -1
+
+    def create_index(self, collection_name: str, keys: List[Any], **kwargs) -> Optional[str]:
+        """创建索引，已存在相同索引时不做改动
+        
+        Args:
+            collection_name: 集合名称
+            keys: 索引键，如[('ds', 1)]
+            **kwargs: 透传给Collection.create_index的选项，如unique
+            
+        Returns:
+            str: 索引名称，失败返回None
+        """
+        try:
+            collection = self.get_collection(collection_name)
+            if collection is not None:
+                return collection.create_index(keys, **kwargs)
+        except Exception as e:
+            logger.error(f"创建索引失败: {str(e)}")
+        return None
+
     def count_documents(self, collection_name: str, query: Dict[str, Any] = None) -> int:
         """统计文档数量
         
@@ -213,3 +291,215 @@ class MongoDBService:
         except Exception as e:
             logger.error(f"统计文档失败: {str(e)}")
         return 0
+
+
+import asyncio
+from pymongo import AsyncMongoClient
+
+class AsyncMongoDBService:
+    """异步MongoDB连接管理类"""
+    
+    def __init__(self, host: str, port: int, username: Optional[str], password: Optional[str], db_name: str):
+        """初始化异步MongoDB连接
+        
+        Args:
+            host: MongoDB主机地址
+            port: MongoDB端口
+            username: 用户名（可选）
+            password: 密码（可选）
+            db_name: 数据库名称
+        """
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.db_name = db_name
+        self.client: Optional[AsyncMongoClient] = None
+        self.db = None
+    
+    async def connect(self, max_retries: int = 3, retry_delay: int = 2) -> bool:
+        """异步连接到MongoDB
+        
+        Args:
+            max_retries: 最大重试次数
+            retry_delay: 重试延迟（秒）
+            
+        Returns:
+            bool: 是否连接成功
+        """
+        for attempt in range(max_retries):
+            try:
+                if self.username and self.password:
+                    self.client = AsyncMongoClient(
+                        host=self.host,
+                        port=self.port,
+                        username=self.username,
+                        password=self.password,
+                        authSource='admin'  # 指定使用admin数据库进行认证
+                    )
+                else:
+                    self.client = AsyncMongoClient(host=self.host, port=self.port)
+                
+                # 测试连接
+                await self.client.admin.command('ping')
+                self.db = self.client[self.db_name]
+                logger.info(f"成功连接到MongoDB: {self.host}:{self.port}/{self.db_name}")
+                return True
+            except Exception as e:
+                logger.error(f"连接MongoDB失败 (尝试 {attempt + 1}/{max_retries}): {str(e)}")
+                if attempt < max_retries - 1:
+                    await asyncio.sleep(retry_delay)
+        return False
+    
+    async def disconnect(self):
+        """异步断开MongoDB连接"""
+        if self.client:
+            await self.client.close()
+            logger.info("已断开MongoDB连接")
+    
+    def get_collection(self, collection_name: str):
+        """获取集合
+        
+        Args:
+            collection_name: 集合名称
+            
+        Returns:
+            AsyncCollection: MongoDB集合对象
+        """
+        if self.db is None:
+            logger.error("MongoDB未连接")
+            return None
+        return self.db[collection_name]
+    
+    async def insert_one(self, collection_name: str, document: Dict[str, Any]) -> Optional[str]:
+        """异步插入单条文档
+        
+        Args:
+            collection_name: 集合名称
+            document: 文档数据
+            
+        Returns:
+            str: 插入的文档ID，失败返回None
+        """
+        try:
+            collection = self.get_collection(collection_name)
+            if collection is not None:
+                result = await collection.insert_one(document)
+                return str(result.inserted_id)
+        except Exception as e:
+            logger.error(f"插入文档失败: {str(e)}")
+        return None
+    
+    async def insert_many(self, collection_name: str, documents: List[Dict[str, Any]],
+                          ordered: bool = True) -> Optional[List[str]]:
+        """异步批量插入文档
+        
+        Args:
+            collection_name: 集合名称
+            documents: 文档列表
+            ordered: 是否按顺序插入（遇错即停）。为False时跳过_id重复的文档，其余照常插入
+            
+        Returns:
+            List[str]: 插入的文档ID列表，失败返回None
+        """
+        try:
+            collection = self.get_collection(collection_name)
+            if collection is not None:
+                result = await collection.insert_many(documents, ordered=ordered)
+                logger.info(f"成功插入 {len(documents)} 条文档到 {collection_name}")
+                return [str(_id) for _id in result.inserted_ids]
+        except BulkWriteError as e:
+            write_errors = e.details.get('writeErrors', [])
+            if not ordered and all(error['code'] == DUPLICATE_KEY_ERROR for error in write_errors):
+                duplicated = {error['index'] for error in write_errors}
+                logger.info(f"插入 {len(documents) - len(duplicated)} 条文档到 {collection_name}, 跳过重复 {len(duplicated)} 条")
+                return [str(document['_id']) for i, document in enumerate(documents) if i not in duplicated]
+            logger.error(f"批量插入文档失败: {str(e)}")
+        except Exception as e:
+            logger.error(f"批量插入文档失败: {str(e)}")
+        return None
+    
+    async def create_index(self, collection_name: str, keys: List[Any], **kwargs) -> Optional[str]:
+        """异步创建索引，已存在相同索引时不做改动
+        
+        Args:
+            collection_name: 集合名称
+            keys: 索引键，如[('ds', 1)]
+            **kwargs: 透传给AsyncCollection.create_index的选项，如unique
+            
+        Returns:
+            str: 索引名称，失败返回None
+        """
+        try:
+            collection = self.get_collection(collection_name)
+            if collection is not None:
+                return await collection.create_index(keys, **kwargs)
+        except Exception as e:
+            logger.error(f"创建索引失败: {str(e)}")
+        return None
+    
+    async def find_one(self, collection_name: str, query: Dict[str, Any],
+                       projection: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """异步查找单条文档
+        
+        Args:
+            collection_name: 集合名称
+            query: 查询条件
+            projection: 投影条件
+            
+        Returns:
+            Dict[str, Any]: 找到的文档，未找到返回None
+        """
+        try:
+            collection = self.get_collection(collection_name)
+            if collection is not None:
+                return await collection.find_one(query, projection)
+        except Exception as e:
+            logger.error(f"查找文档失败: {str(e)}")
+        return None
+    
+    async def find(self, collection_name: str, query: Dict[str, Any],
+                   projection: Optional[Dict[str, Any]] = None,
+                   limit: int = 0, skip: int = 0) -> List[Dict[str, Any]]:
+        """异步查找多条文档
+        
+        Args:
+            collection_name: 集合名称
+            query: 查询条件
+            projection: 投影条件
+            limit: 返回数量限制
+            skip: 跳过文档数
+            
+        Returns:
+            List[Dict[str, Any]]: 文档列表
+        """
+        try:
+            collection = self.get_collection(collection_name)
+            if collection is not None:
+                cursor = collection.find(query, projection, skip=skip, limit=limit)
+                return await cursor.to_list()
+        except Exception as e:
+            logger.error(f"查询文档失败: {str(e)}")
+        return []
+    
+    async def update_one(self, collection_name: str, query: Dict[str, Any],
+                         update: Dict[str, Any], upsert: bool = False) -> bool:
+        """异步更新单条文档
+        
+        Args:
+            collection_name: 集合名称
+            query: 查询条件
+            update: 更新内容
+            upsert: 不存在时是否插入
+            
+        Returns:
+            bool: 是否更新成功
+        """
+        try:
+            collection = self.get_collection(collection_name)
+            if collection is not None:
+                result = await collection.update_one(query, update, upsert=upsert)
+                return result.modified_count > 0 or result.upserted_id is not None
+        except Exception as e:
+            logger.error(f"更新文档失败: {str(e)}")
+        return False
@@ -0,0 +1,161 @@
+import gzip
+import json
+import logging
+import struct
+import uuid
+from typing import TYPE_CHECKING, List, Optional, Tuple
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+if TYPE_CHECKING:
+    from dspider.common.minio_service import MinIOService
+
+logger = logging.getLogger(__name__)
+
+# 分段对象格式：
+#   [页面1压缩帧][页面2压缩帧]...[索引JSON][索引偏移 8字节][索引长度 4字节][魔数 4字节]
+# 每个页面单独压缩为一个gzip成员/zstd帧，凭(offset, length)按字节范围读取即可解压单页；
+# 尾部索引使分段对象可以脱离MongoDB自描述。
+ARCHIVE_MAGIC = b'DSPA'
+FOOTER = struct.Struct('<QI4s')
+
+CODEC_EXTENSIONS = {'gzip': 'gz', 'zstd': 'zst'}
+DEFAULT_SEGMENT_SIZE = 64 * 1024 * 1024
+
+
+def compress(data: bytes, codec: str) -> bytes:
+    """压缩单个页面
+
+    Args:
+        data: 页面内容
+        codec: gzip或zstd（需安装zstandard）
+
+    Returns:
+        bytes: 压缩帧
+    """
+    if codec == 'gzip':
+        return gzip.compress(data, compresslevel=6, mtime=0)
+    if codec == 'zstd':
+        if zstandard is None:
+            raise ValueError("未安装zstandard，无法使用zstd压缩")
+        return zstandard.ZstdCompressor(level=3).compress(data)
+    raise ValueError(f"不支持的压缩格式: {codec}")
+
+
+def decompress(data: bytes, codec: str) -> bytes:
+    """解压单个页面的压缩帧"""
+    if codec == 'gzip':
+        return gzip.decompress(data)
+    if codec == 'zstd':
+        if zstandard is None:
+            raise ValueError("未安装zstandard，无法解压zstd")
+        return zstandard.ZstdDecompressor().decompress(data)
+    raise ValueError(f"不支持的压缩格式: {codec}")
+
+
+def parse_footer(data: bytes) -> Tuple[int, int]:
+    """解析分段对象末尾的定长尾部
+
+    Returns:
+        Tuple[int, int]: (索引偏移, 索引长度)
+    """
+    index_offset, index_length, magic = FOOTER.unpack(data[-FOOTER.size:])
+    if magic != ARCHIVE_MAGIC:
+        raise ValueError("不是页面归档分段对象")
+    return index_offset, index_length
+
+
+class PageArchiveWriter:
+    """页面归档写入器
+
+    将页面逐个压缩后追加到内存中的分段，分段达到segment_size后封存为一个MinIO对象，
+    一个任务的多页只产生少量对象。add返回的条目（分段名、偏移、长度）保存到列表页记录中，
+    读取时通过MinIOService.read_archived_page按字节范围取回单页。
+    """
+
+    def __init__(self, minio_client: 'MinIOService', bucket_name: str, prefix: str,
+                 codec: str = 'gzip', segment_size: int = DEFAULT_SEGMENT_SIZE):
+        """初始化写入器
+
+        Args:
+            minio_client: MinIO服务
+            bucket_name: 存储桶名称
+            prefix: 分段对象名前缀，如2023/08/25/1/task_id
+            codec: 压缩格式，gzip或zstd
+            segment_size: 分段封存阈值（压缩后字节数）
+        """
+        if codec not in CODEC_EXTENSIONS:
+            raise ValueError(f"不支持的压缩格式: {codec}")
+        self.minio_client = minio_client
+        self.bucket_name = bucket_name
+        self.prefix = prefix
+        self.codec = codec
+        self.segment_size = segment_size
+        self.writer_id = uuid.uuid4().hex[:8] # 同一前缀多次运行（重试、分片）时区分分段对象
+        self.seq = 0
+        self.buffer = bytearray()
+        self.index: List[dict] = []
+
+    @property
+    def segment_name(self) -> str:
+        return f"{self.prefix}_{self.writer_id}_{self.seq:05d}.{CODEC_EXTENSIONS[self.codec]}"
+
+    @property
+    def is_full(self) -> bool:
+        return len(self.buffer) >= self.segment_size
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def add(self, key: str, data: bytes) -> dict:
+        """压缩并追加一个页面
+
+        Args:
+            key: 页面标识，写入分段尾部索引
+            data: 页面内容
+
+        Returns:
+            dict: 归档条目，segment/offset/length/size/codec
+        """
+        frame = compress(data, self.codec)
+        entry = {
+            'segment': self.segment_name,
+            'offset': len(self.buffer),
+            'length': len(frame),
+            'size': len(data),
+            'codec': self.codec,
+        }
+        self.buffer += frame
+        self.index.append({'key': key, 'offset': entry['offset'], 'length': entry['length'], 'size': entry['size']})
+        return entry
+
+    def seal(self) -> Optional[Tuple[str, bytes]]:
+        """封存当前分段，开始新的分段
+
+        Returns:
+            Optional[Tuple[str, bytes]]: (分段对象名, 对象内容)，当前分段为空时返回None
+        """
+        if not self.index:
+            return None
+        index = json.dumps({'codec': self.codec, 'pages': self.index}, ensure_ascii=False).encode('utf-8')
+        payload = bytes(self.buffer) + index + FOOTER.pack(len(self.buffer), len(index), ARCHIVE_MAGIC)
+        name = self.segment_name
+        self.seq += 1
+        self.buffer = bytearray()
+        self.index = []
+        return name, payload
+
+    def flush(self) -> bool:
+        """封存当前分段并同步上传
+
+        Returns:
+            bool: 是否成功，当前分段为空时返回True
+        """
+        sealed = self.seal()
+        if sealed is None:
+            return True
+        name, payload = sealed
+        return self.minio_client.upload_bytes(self.bucket_name, name, payload, 'application/octet-stream')
@@ -2,10 +2,13 @@ import pika
 import logging
 import json
 import time
-from typing import Optional, Dict, Any, Callable, Union
+import functools
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, Callable, Union, List
 
 from pika.exceptions import ChannelClosedByBroker, ConnectionClosedByBroker, IncompatibleProtocolError, StreamLostError
-from pika import BasicProperties
+from pika import BasicProperties, spec
 
 from dspider.common.load_config import config
 
@@ -280,50 +283,112 @@ class RabbitMQService:
             return False
     
     def consume_messages(self, queue_name: str, callback: Callable[[str, Dict[str, Any]], bool],
-                        auto_ack: bool = False, prefetch_count: int = 1) -> None:
+                        auto_ack: bool = False, prefetch_count: int = 1,
+                        concurrency: int = 1, message_timeout: Optional[float] = None) -> None:
         """消费消息
         
+        concurrency大于1时，消息分发到有界线程池并发处理，ack/nack通过add_callback_threadsafe
+        回到连接线程执行（pika连接不是线程安全的）。同时处理的消息不超过concurrency条，
+        其余已预取的消息在连接线程内排队，有线程空闲时再提交，线程池的任务队列不会无限增长。
+        
         Args:
             queue_name: 队列名称
             callback: 回调函数，接收消息体和属性，返回是否确认
             auto_ack: 是否自动确认
             prefetch_count: 预取消息数
+            concurrency: 并发处理的线程数，1表示在连接线程内串行处理
+            message_timeout: 单条消息处理超时（秒），从开始处理时计时，超时只记录错误，
+                处理结束后才按结果确认，避免同一消息在处理中重回队列被重复执行；仅concurrency大于1时生效
         """
+        pool = None
         try:
             if not self.channel:
                 logger.error("RabbitMQ未连接")
                 return
             
+            if concurrency > 1:
+                pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix=f"consumer-{queue_name}")
+                if prefetch_count < concurrency:
+                    logger.warning(f"prefetch_count({prefetch_count})小于并发数({concurrency})，调整为{concurrency}")
+                    prefetch_count = concurrency
+            
             # 设置预取数量
             self.channel.basic_qos(prefetch_count=prefetch_count)
             
-            def _on_message(ch, method, properties, body):
+            # 以下状态只在连接线程内读写
+            running = {} # 正在处理的消息 delivery_tag -> 处理超时定时器（未设置时为None）
+            waiting = deque() # 已预取、等待空闲线程的消息
+            
+            def _settle(ch, delivery_tag, should_ack):
+                if not ch.is_open:
+                    logger.warning(f"channel已关闭，无法确认消息: {delivery_tag}")
+                elif should_ack:
+                    ch.basic_ack(delivery_tag=delivery_tag)
+                else:
+                    ch.basic_nack(delivery_tag=delivery_tag, requeue=True)
+            
+            def _on_timeout(delivery_tag):
+                if delivery_tag in running:
+                    running[delivery_tag] = None # 定时器已触发，无需取消
+                    logger.error(f"消息处理超时({message_timeout}s)，仍在处理中: {delivery_tag}")
+            
+            def _process(message_body, message_properties):
                 try:
-                    # 尝试解析JSON
-                    try:
-                        message_body = json.loads(body.decode('utf-8'))
-                    except json.JSONDecodeError:
-                        message_body = body.decode('utf-8')
-                    
-                    # 调用回调函数
-                    should_ack = callback(message_body, {
-                        'delivery_tag': method.delivery_tag,
-                        'redelivered': method.redelivered,
-                        'routing_key': method.routing_key
-                    })
-                    
-                    # 手动确认
-                    if not auto_ack and should_ack:
-                        ch.basic_ack(delivery_tag=method.delivery_tag)
-                    elif not auto_ack and not should_ack:
-                        ch.basic_nack(delivery_tag=method.delivery_tag, requeue=True)
+                    return callback(message_body, message_properties)
                 except Exception as e:
                     logger.exception(f"处理消息时出错: {str(e)}")
-                    if not auto_ack:
-                        ch.basic_nack(delivery_tag=method.delivery_tag, requeue=True)
+                    return False
+            
+            def _process_in_pool(ch, delivery_tag, message_body, message_properties):
+                should_ack = _process(message_body, message_properties)
+                self.connection.add_callback_threadsafe(
+                    functools.partial(_on_processed, ch, delivery_tag, should_ack)
+                )
+            
+            def _on_processed(ch, delivery_tag, should_ack):
+                timer = running.pop(delivery_tag)
+                if timer is not None:
+                    self.connection.remove_timeout(timer) # 按时处理完的消息取消定时器，避免定时器随消息数累积
+                if not auto_ack:
+                    _settle(ch, delivery_tag, should_ack)
+                _dispatch()
+            
+            def _dispatch():
+                while waiting and len(running) < concurrency:
+                    ch, delivery_tag, message_body, message_properties = waiting.popleft()
+                    running[delivery_tag] = None
+                    if message_timeout:
+                        # 有空闲线程才提交，提交即开始处理，超时从此时计时
+                        running[delivery_tag] = self.connection.call_later(
+                            message_timeout, functools.partial(_on_timeout, delivery_tag)
+                        )
+                    pool.submit(_process_in_pool, ch, delivery_tag, message_body, message_properties)
+            
+            def _on_message(ch, method, properties, body):
+                # 尝试解析JSON
+                try:
+                    message_body = json.loads(body.decode('utf-8'))
+                except json.JSONDecodeError:
+                    message_body = body.decode('utf-8')
+                message_properties = {
+                    'delivery_tag': method.delivery_tag,
+                    'redelivered': method.redelivered,
+                    'routing_key': method.routing_key
+                }
+                
+                if pool is not None:
+                    waiting.append((ch, method.delivery_tag, message_body, message_properties))
+                    _dispatch()
+                    return
+                
+                # 调用回调函数
+                should_ack = _process(message_body, message_properties)
+                # 手动确认
+                if not auto_ack:
+                    _settle(ch, method.delivery_tag, should_ack)
             
             # 开始消费
-            logger.info(f"开始消费队列: {queue_name}")
+            logger.info(f"开始消费队列: {queue_name}, 并发数: {concurrency}")
             self.channel.basic_consume(
                 queue=queue_name,
                 on_message_callback=_on_message,
@@ -339,6 +404,9 @@ class RabbitMQService:
             logger.error(f"消费消息时出错: {str(e)}")
             if self.channel and self.channel.is_open:
                 self.channel.stop_consuming()
+        finally:
+            if pool is not None:
+                pool.shutdown(wait=False)
     
     def purge_queue(self, queue_name: str) -> bool:
         """清空队列
@@ -381,6 +449,222 @@ class RabbitMQService:
             logger.error(f"获取队列消息数失败: {str(e)}")
             return 0
 
+    def create_confirm_publisher(self, max_in_flight: int = 1000,
+                                 confirm_timeout: float = 30) -> 'RabbitMQConfirmPublisher':
+        """创建基于publisher confirm的流水线发布器
+
+        Args:
+            max_in_flight: 未确认消息窗口大小
+            confirm_timeout: 等待确认的超时时间（秒）
+
+        Returns:
+            RabbitMQConfirmPublisher: 发布器实例
+        """
+        return RabbitMQConfirmPublisher(self, max_in_flight=max_in_flight,
+                                        confirm_timeout=confirm_timeout)
+
+
+class RabbitMQConfirmPublisher:
+    """流水线式publisher confirm发布器
+
+    BlockingChannel.confirm_delivery()会让每条basic_publish同步等待broker确认，
+    发布N条消息需要N次往返。这里直接在底层channel上开启confirm模式，
+    保持最多max_in_flight条未确认消息在途，按delivery_tag批量回收ack/nack。
+    """
+
+    def __init__(self, rabbitmq_service: RabbitMQService, max_in_flight: int = 1000,
+                 confirm_timeout: float = 30):
+        """初始化发布器
+
+        Args:
+            rabbitmq_service: 已连接的RabbitMQService
+            max_in_flight: 未确认消息窗口大小
+            confirm_timeout: 等待确认的超时时间（秒）
+        """
+        if max_in_flight < 1:
+            raise ValueError("max_in_flight must be >= 1")
+        self.rabbitmq_service = rabbitmq_service
+        self.max_in_flight = max_in_flight
+        self.confirm_timeout = confirm_timeout
+        self.channel = None
+        self._delivery_tag = 0
+        self._pending: 'OrderedDict[int, Any]' = OrderedDict()
+        self._acked: List[Any] = []
+        self._nacked: List[Any] = []
+
+    def open(self) -> bool:
+        """打开独立channel并开启confirm模式
+
+        Returns:
+            bool: 是否成功
+        """
+        connection = self.rabbitmq_service.connection
+        if not connection or not connection.is_open:
+            logger.error("RabbitMQ未连接")
+            return False
+
+        try:
+            self.channel = connection.channel()
+            select_ok = []
+            # 注册到底层channel，ack/nack不会阻塞basic_publish
+            self.channel._impl.confirm_delivery(
+                ack_nack_callback=self._on_confirm,
+                callback=select_ok.append
+            )
+            deadline = time.monotonic() + self.confirm_timeout
+            while not select_ok:
+                if time.monotonic() >= deadline:
+                    raise TimeoutError("等待Confirm.SelectOk超时")
+                connection.process_data_events(time_limit=1)
+            self._delivery_tag = 0
+            self._pending.clear()
+            logger.info(f"confirm发布器已开启, 窗口大小: {self.max_in_flight}")
+            return True
+        except Exception as e:
+            logger.error(f"开启confirm模式失败: {str(e)}")
+            self.channel = None
+            return False
+
+    def close(self):
+        """关闭发布器channel"""
+        if self.channel and self.channel.is_open:
+            self.channel.close()
+        self.channel = None
+
+    @property
+    def in_flight(self) -> int:
+        """当前未确认的消息数"""
+        return len(self._pending)
+
+    def _on_confirm(self, method_frame):
+        """处理broker返回的Basic.Ack/Basic.Nack"""
+        method = method_frame.method
+        acked = isinstance(method, spec.Basic.Ack)
+        result = self._acked if acked else self._nacked
+        if method.multiple:
+            while self._pending:
+                tag = next(iter(self._pending))
+                if tag > method.delivery_tag:
+                    break
+                result.append(self._pending.pop(tag))
+        elif method.delivery_tag in self._pending:
+            result.append(self._pending.pop(method.delivery_tag))
+
+    def _wait(self, max_pending: int, timeout: float) -> bool:
+        """处理IO事件直到未确认消息数不超过max_pending
+
+        Returns:
+            bool: 是否在超时前满足条件
+        """
+        connection = self.rabbitmq_service.connection
+        deadline = time.monotonic() + timeout
+        while len(self._pending) > max_pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            connection.process_data_events(time_limit=min(remaining, 1))
+        return True
+
+    def publish(self, message: Union[Dict[str, Any], str], routing_key: str, exchange: str = "",
+                priority: int = 15, message_key: Any = None, **kwargs) -> int:
+        """发布单条消息，不等待确认；窗口已满时先回收确认
+
+        Args:
+            message: 消息内容（字典或字符串）
+            routing_key: 路由键
+            exchange: 交换机
+            priority: 优先级
+            message_key: 回报ack/nack时使用的标识，默认为delivery_tag
+
+        Returns:
+            int: 消息的delivery_tag
+        """
+        if not self.channel:
+            raise ConnectionError("未开启confirm channel")
+
+        if isinstance(message, dict):
+            body = json.dumps(message, ensure_ascii=False).encode('utf-8')
+        elif isinstance(message, str):
+            body = message.encode('utf-8')
+        else:
+            raise TypeError("message must be str or dict")
+
+        if not self._wait(self.max_in_flight - 1, self.confirm_timeout):
+            raise TimeoutError(f"等待broker确认超时, 在途消息: {len(self._pending)}")
+
+        self.channel.basic_publish(
+            exchange=exchange,
+            routing_key=routing_key,
+            body=body,
+            properties=BasicProperties(
+                delivery_mode=2,  # 2-持久化
+                priority=priority,
+                **kwargs,
+            ),
+        )
+        self._delivery_tag += 1
+        self._pending[self._delivery_tag] = self._delivery_tag if message_key is None else message_key
+        return self._delivery_tag
+
+    def flush(self, timeout: Optional[float] = None) -> Dict[str, List[Any]]:
+        """等待所有在途消息确认，并取出累计的ack/nack结果
+
+        Args:
+            timeout: 超时时间（秒），默认confirm_timeout
+
+        Returns:
+            Dict[str, List[Any]]: {'acked': [...], 'nacked': [...], 'unconfirmed': [...]}
+        """
+        if self._pending:
+            try:
+                self._wait(0, self.confirm_timeout if timeout is None else timeout)
+            except Exception as e:
+                logger.error(f"等待broker确认时出错: {str(e)}")
+
+        result = {
+            'acked': self._acked,
+            'nacked': self._nacked,
+            'unconfirmed': list(self._pending.values()),
+        }
+        self._acked, self._nacked = [], []
+        self._pending.clear()
+        return result
+
+    def publish_batch(self, messages: List[Union[Dict[str, Any], str]], routing_key: str,
+                      exchange: str = "", priority: int = 15,
+                      message_keys: Optional[List[Any]] = None) -> Dict[str, List[Any]]:
+        """流水线发布一批消息并等待全部确认
+
+        Args:
+            messages: 消息列表
+            routing_key: 路由键
+            exchange: 交换机
+            priority: 优先级
+            message_keys: 与messages一一对应的标识，默认使用列表下标
+
+        Returns:
+            Dict[str, List[Any]]: {'acked': [...], 'nacked': [...], 'unconfirmed': [...]}
+        """
+        if message_keys is None:
+            message_keys = list(range(len(messages)))
+        elif len(message_keys) != len(messages):
+            raise ValueError("message_keys must match messages")
+
+        unsent = []
+        for i, (message, key) in enumerate(zip(messages, message_keys)):
+            try:
+                self.publish(message, routing_key, exchange, priority, message_key=key)
+            except Exception as e:
+                logger.error(f"批量发布中断: {str(e)}, 未发送 {len(messages) - i} 条")
+                unsent = list(message_keys[i:])
+                break
+
+        result = self.flush()
+        result['unconfirmed'].extend(unsent)
+        logger.info(f"批量发布完成: ack {len(result['acked'])}, nack {len(result['nacked'])}, "
+                    f"未确认 {len(result['unconfirmed'])}")
+        return result
+
 import aio_pika
 import logging
 import json
@@ -654,7 +938,7 @@ class AsyncRabbitMQClient:
                     
                     # 手动确认
                     if auto_ack:
-                        await message.ack()
+                        return
                     elif should_ack:
                         await message.ack()
                     else:
@@ -666,7 +950,7 @@ class AsyncRabbitMQClient:
             
             # 开始消费
             logger.info(f"开始消费队列: {queue_name}")
-            await queue.consume(_on_message, auto_ack=auto_ack)
+            await queue.consume(_on_message, no_ack=auto_ack)
         except Exception as e:
             logger.error(f"消费消息时出错: {str(e)}")
 
@@ -7,9 +7,11 @@ from datetime import datetime, timedelta
 from typing import Any, Dict
 import asyncio
 
-from dspider.celery_worker.tasks import process_url_task
+from dspider.celery_worker.tasks import process_url_task, process_urls_task
 from dspider.common.rabbitmq_service import rabbitmq_client
 from dspider.common.mongodb_service import mongodb_conn
+from dspider.common.cookie_state import COOKIE_STATE_FIELD
+from dspider.cookie_manager.refresh_queue import RefreshQueue
 import logging
 
 logger = logging.getLogger(__name__)
@@ -18,18 +20,28 @@ class CookieManager:
     """
     Cookie更新管理类，支持定时批量更新和实时信号更新
     """
-    def __init__(self, update_interval: int = 3600):
+    def __init__(self, update_interval: int = 3600, batch_size: int = 20, poll_interval: int = 5,
+                 refresh_margin: int = 600, retry_interval: int = 600):
         """
         初始化Cookie更新器
         
         Args:
-            update_interval: 批量更新间隔时间（秒）
+            update_interval: 全量同步数据源配置的间隔（秒），也是没有过期时间的cookie的刷新周期
+            batch_size: 每个Celery任务处理的数据源数，为1时每个数据源单独提交一个任务
+            poll_interval: 增量同步cookie状态、检查到期数据源的间隔（秒），决定Worker刷新信号的响应延迟
+            refresh_margin: 在cookie过期前多少秒刷新
+            retry_interval: 提交刷新后多久仍未捕获成功则再次提交（秒）
         """
         self.update_interval = update_interval
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
         self.running = False
         
         self.rabbitmq_client = rabbitmq_client
         self.mongodb_conn = mongodb_conn
+        self.refresh_queue = RefreshQueue(refresh_margin, update_interval, retry_interval)
+        self.datasource_configs: Dict[str, dict] = {} # url -> 数据源配置
+        self.last_sync = None # 最近一次同步开始的时间
     
     def stop(self):
         """停止定时更新"""
@@ -37,19 +49,67 @@ class CookieManager:
         logger.info("CookieManager stopped")
     
     def start(self):
-        """定时批量更新cookie"""
-        # 定期扫描数据库，通过celery任务更新cookie
+        """按cookie过期时间增量更新cookie
+        
+        只提交cookie即将过期、从未捕获或被Worker报告请求被拒（401/403）的数据源，
+        浏览器负载与cookie的变化量成正比，而不是与数据源总数成正比。
+        """
         self.running = True
+        last_full_sync = 0
         while self.running:
-            # 扫描数据库，获取所有需要更新的URL
-            datasource_configs = self.mongodb_conn.get_collection('recruitment_datasource_config').find()
+            now = time.time()
+            full = now - last_full_sync >= self.update_interval
+            self.sync(full)
+            if full:
+                last_full_sync = now
+            
+            due = self.refresh_queue.pop_due(now)
+            if due:
+                logger.info(f"{len(due)}/{len(self.refresh_queue)} datasources due for cookie refresh, "
+                            f"{self.refresh_queue.coalesced} refresh requests coalesced so far")
+                self.submit([self.datasource_configs[url] for url in due])
             
+            # 等到下一个数据源到期，最长poll_interval秒（期间可能有新的请求被拒）
+            next_due = self.refresh_queue.next_due()
+            wait = self.poll_interval if next_due is None else min(self.poll_interval, max(next_due - time.time(), 1))
+            time.sleep(wait)
+    
+    def sync(self, full: bool = False):
+        """从数据库同步数据源配置与cookie状态
+        
+        全量同步读取所有数据源（发现新增、删除的数据源），增量同步只读取cookie_state.updated_at
+        在上次同步之后变化的数据源（捕获完成、请求被拒）。
+        
+        Args:
+            full: 是否全量同步
+        """
+        sync_start = time.time()
+        query = {}
+        if not full and self.last_sync is not None:
+            query = {f'{COOKIE_STATE_FIELD}.updated_at': {'$gte': self.last_sync}}
+        datasource_configs = self.mongodb_conn.find('recruitment_datasource_config', query)
+        
+        seen = set()
+        for datasource_config in datasource_configs:
+            url = datasource_config['url']
+            seen.add(url)
+            self.datasource_configs[url] = datasource_config
+            self.refresh_queue.update(url, datasource_config.get(COOKIE_STATE_FIELD), sync_start)
+        if full:
+            for url in set(self.datasource_configs) - seen:
+                self.datasource_configs.pop(url)
+                self.refresh_queue.remove(url)
+        self.last_sync = sync_start
+        logger.debug(f"Synced {len(seen)} datasource configs ({'full' if full else 'incremental'})")
+    
+    def submit(self, datasource_configs: List[dict]):
+        """提交需要刷新的数据源，按batch_size分批，每批一个Celery任务"""
+        if self.batch_size > 1:
+            for i in range(0, len(datasource_configs), self.batch_size):
+                self._update_cookie_batch(datasource_configs[i:i + self.batch_size])
+        else:
             for datasource_config in datasource_configs:
                 self._update_single_cookie(datasource_config)
-            
-            # 等待下一个更新周期
-            logger.info(f"Waiting for next update cycle ({self.update_interval} seconds)")
-            time.sleep(self.update_interval)
     
     def _update_single_cookie(self, data: dict):
         """
@@ -75,6 +135,21 @@ class CookieManager:
         except Exception as e:
             logger.error(f"Error handling message: {str(e)}")
 
+    def _update_cookie_batch(self, data_list: List[dict]):
+        """
+        批量更新多个URL的cookie，一批数据源只提交一个Celery任务
+        
+        Args:
+            data_list: 数据源配置列表
+        """
+        try:
+            # 移除MongoDB的ObjectId类型字段
+            serializable_list = [{k: v for k, v in data.items() if k != '_id'} for data in data_list]
+            process_urls_task.delay(serializable_list)
+            logger.info(f"Submitted Celery task for {len(serializable_list)} URLs")
+        except Exception as e:
+            logger.error(f"Error submitting batch: {str(e)}")
+
 
 if __name__ == "__main__":
     # 设置日志
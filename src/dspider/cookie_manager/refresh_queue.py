@@ -0,0 +1,123 @@
+import heapq
+import logging
+import time
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class RefreshQueue:
+    """按下次刷新时间排序的数据源优先队列
+
+    每个数据源的下次刷新时间由其cookie_state决定（见dspider.common.cookie_state）：
+    - 从未捕获过，或捕获后被Worker报告请求被拒：立即刷新
+    - 观察到cookie过期时间：过期前refresh_margin秒刷新；cookie有效期短于refresh_margin时在有效期过半时刷新，
+      且距捕获至少min_interval秒，避免每次同步都重新捕获
+    - 只有会话cookie：捕获后default_ttl秒刷新
+    已提交刷新的数据源在retry_interval秒后重新到期，捕获失败时得以重试。
+    同一数据源同时只有一次捕获（single-flight）：捕获进行中再次到期（如多个Worker先后报告请求被拒）时合并到
+    进行中的捕获，不重复提交；cookie_state.captured_at不早于提交时间即视为捕获完成。
+    堆中的旧条目不删除，出堆时与当前计划时间不一致的条目直接跳过。
+    """
+
+    def __init__(self, refresh_margin: float = 600, default_ttl: float = 3600, retry_interval: float = 600,
+                 min_interval: float = 60):
+        """初始化刷新队列
+
+        Args:
+            refresh_margin: 在cookie过期前多少秒刷新
+            default_ttl: 没有过期时间的cookie多久刷新一次（秒）
+            retry_interval: 提交刷新后多久仍未捕获成功则再次刷新（秒）
+            min_interval: 两次捕获之间的最短间隔（秒），请求被拒时不受限制
+        """
+        self.refresh_margin = refresh_margin
+        self.min_interval = min_interval
+        self.default_ttl = default_ttl
+        self.retry_interval = retry_interval
+        self.heap: List[Tuple[float, str]] = []
+        self.scheduled: Dict[str, float] = {}
+        self.states: Dict[str, dict] = {}
+        self.in_flight: Dict[str, float] = {} # url -> 提交捕获的时间
+        self.coalesced = 0 # 合并到进行中捕获的刷新次数
+
+    def __len__(self) -> int:
+        return len(self.scheduled)
+
+    def next_refresh_at(self, state: Optional[dict], now: float) -> float:
+        """按cookie状态计算下次刷新时间"""
+        state = state or {}
+        captured_at = state.get('captured_at')
+        if captured_at is None:
+            return now
+        rejected_at = state.get('rejected_at')
+        if rejected_at is not None and rejected_at >= captured_at:
+            return now
+        expires_at = state.get('expires_at')
+        if expires_at is not None:
+            lifetime = expires_at - captured_at
+            return max(expires_at - self.refresh_margin, captured_at + lifetime / 2, captured_at + self.min_interval)
+        return captured_at + self.default_ttl
+
+    def update(self, url: str, state: Optional[dict], now: Optional[float] = None):
+        """数据源的cookie状态变化后重新计划刷新时间
+
+        Args:
+            url: 数据源URL
+            state: 数据源配置中的cookie_state
+            now: 当前时间
+        """
+        now = time.time() if now is None else now
+        state = state or {}
+        previous = self.states.get(url)
+        if previous is not None and previous.get('updated_at') == state.get('updated_at') and url in self.scheduled:
+            return # 状态未变化，保留已有计划（可能是提交后的重试时间）
+        self.states[url] = state
+        submitted_at = self.in_flight.get(url)
+        if submitted_at is not None and (state.get('captured_at') or 0) >= submitted_at:
+            self.in_flight.pop(url) # 捕获完成
+        self._schedule(url, self.next_refresh_at(state, now))
+
+    def remove(self, url: str):
+        """数据源已删除，不再刷新"""
+        self.scheduled.pop(url, None)
+        self.states.pop(url, None)
+        self.in_flight.pop(url, None)
+
+    def _schedule(self, url: str, at: float):
+        self.scheduled[url] = at
+        heapq.heappush(self.heap, (at, url))
+
+    def pop_due(self, now: Optional[float] = None, limit: Optional[int] = None) -> List[str]:
+        """取出已到刷新时间且没有进行中捕获的数据源，记为进行中并将其下次刷新时间推迟retry_interval秒
+
+        Args:
+            now: 当前时间
+            limit: 最多取出的数量
+
+        Returns:
+            List[str]: 到期的数据源URL，按计划时间排序
+        """
+        now = time.time() if now is None else now
+        due = []
+        popped = set()
+        while self.heap and self.heap[0][0] <= now and (limit is None or len(due) < limit):
+            at, url = heapq.heappop(self.heap)
+            if self.scheduled.get(url) != at or url in popped:
+                continue # 已重新计划或已删除的旧条目，或计划时间相同的重复条目
+            popped.add(url)
+            submitted_at = self.in_flight.get(url)
+            if submitted_at is not None and now - submitted_at < self.retry_interval:
+                self.coalesced += 1
+                self._schedule(url, submitted_at + self.retry_interval) # 进行中的捕获超时后再重试
+                continue
+            due.append(url)
+        for url in due:
+            self.in_flight[url] = now
+            self._schedule(url, now + self.retry_interval)
+        return due
+
+    def next_due(self) -> Optional[float]:
+        """最早的计划刷新时间，队列为空时返回None"""
+        while self.heap and self.scheduled.get(self.heap[0][1]) != self.heap[0][0]:
+            heapq.heappop(self.heap)
+        return self.heap[0][0] if self.heap else None
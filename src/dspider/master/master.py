@@ -1,16 +1,23 @@
 import os
 import time
+import uuid
 import logging
 import logging.config
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 
 import structlog
+from pymongo.errors import OperationFailure, PyMongoError
 
 from dspider.common.mongodb_service import mongodb_conn
 from dspider.common.rabbitmq_service import rabbitmq_client
 from dspider.common.load_config import config
 from dspider.master.master_config import master_config
 
+DS_CONFIG_COLLECTION = 'recruitment_datasource_config'
+RESUME_TOKEN_COLLECTION = 'master_resume_token'
+CHANGE_STREAM_UNSUPPORTED = (40573, 40324) # 非副本集、不识别$changeStream
+CHANGE_STREAM_RESUME_FAILED = (286, 260) # resume token已超出oplog范围、token无效（如invalidate事件之后）
+
 # 配置日志系统
 logging_config = {
     'version': 1,
@@ -41,6 +48,7 @@ logging.config.dictConfig(logging_config)
 
 class MasterNode:
     def __init__(self):
+        self.master_id = str(uuid.uuid4())[:8]
         self.mongo_client = mongodb_conn
         self.rabbitmq_client = rabbitmq_client
         self.send_interval = master_config['sql_select_frenquency']
@@ -49,6 +57,16 @@ class MasterNode:
         self.task_queue = master_config['queue_name']
         self.exchange_name = master_config['exchange_name']
         self.routing_key = master_config['routing_key']
+        self.distribute_batch_size = master_config['distribute_batch_size']
+        self.publish_window = master_config['publish_window']
+        self.confirm_publisher = None
+        self.claim_mode = master_config['claim_mode']
+        self.lease_seconds = master_config['lease_seconds']
+        self.dispatch_mode = master_config['dispatch_mode']
+        self.change_stream_max_await_ms = master_config['change_stream_max_await_ms']
+        self.change_stream_idle_poll = master_config['change_stream_idle_poll']
+        self.change_stream_retry_interval = master_config['change_stream_retry_interval']
+        self.running = False
         self.initialize()
         
     
@@ -75,11 +93,127 @@ class MasterNode:
     
     def run(self):
         self.logger.info("Master节点开始运行")
-        while True:
-            ds_configs = self.get_ds_configs()
-            self.distribute_tasks(ds_configs)
+        self.running = True
+        if self.dispatch_mode == 'change_stream' and self.run_change_stream():
+            return
+        
+        self.logger.info(f"Master节点以轮询模式运行, 间隔 {self.send_interval}s")
+        while self.running:
+            self.dispatch_once()
             time.sleep(self.send_interval)
     
+    def stop(self):
+        """停止主循环"""
+        self.running = False
+    
+    def dispatch_once(self) -> int:
+        """加载（或认领）一批待分发配置并分发
+        
+        Returns:
+            int: 成功分发的URL数
+        """
+        if self.claim_mode:
+            ds_configs = self.claim_ds_configs()
+        else:
+            ds_configs = self.get_ds_configs()
+        return self.distribute_tasks_batch(ds_configs)
+    
+    def dispatch_backlog(self) -> int:
+        """连续分发，直到一批不满sql_select_count条（积压已取完）
+        
+        Returns:
+            int: 成功分发的URL数
+        """
+        total = 0
+        while self.running:
+            dispatched = self.dispatch_once()
+            total += dispatched
+            if dispatched < master_config['sql_select_count']:
+                break
+        return total
+    
+    def load_resume_token(self):
+        """读取持久化的change stream resume token"""
+        document = self.mongo_client.find_one(RESUME_TOKEN_COLLECTION, {'_id': DS_CONFIG_COLLECTION})
+        return document.get('token') if document else None
+    
+    def save_resume_token(self, token):
+        """持久化change stream resume token，重启后从该位置继续"""
+        self.mongo_client.update_one(
+            RESUME_TOKEN_COLLECTION,
+            {'_id': DS_CONFIG_COLLECTION},
+            {'$set': {'token': token, 'updated_at': time.time()}},
+            upsert=True
+        )
+    
+    def run_change_stream(self) -> bool:
+        """监听配置集合的change stream，出现可分发的配置时立即分发
+        
+        同一时刻到达的事件合并为一次分发；长时间无事件时按change_stream_idle_poll兜底分发一次，
+        用于回收过期租约。resume token在分发完成后才持久化，重启后不会漏掉未分发的变更。
+        游标关闭（如invalidate事件）或出现网络中断、主节点切换等临时错误时，
+        等待change_stream_retry_interval秒后从已保存的resume token重新监听。
+        
+        Returns:
+            bool: 是否正常结束；change stream不受支持（如非副本集）时返回False，由调用方回退到轮询
+        """
+        collection = self.mongo_client.get_collection(DS_CONFIG_COLLECTION)
+        if collection is None:
+            return False
+        
+        pipeline = [{'$match': {
+            'operationType': {'$in': ['insert', 'update', 'replace']},
+            'fullDocument.state': 0,
+        }}]
+        saved_token = self.load_resume_token()
+        while self.running:
+            try:
+                with collection.watch(
+                    pipeline,
+                    full_document='updateLookup',
+                    resume_after=saved_token,
+                    max_await_time_ms=self.change_stream_max_await_ms
+                ) as stream:
+                    self.logger.info(f"开始监听 {DS_CONFIG_COLLECTION} 的change stream")
+                    # 先处理停机或断开期间积压的配置
+                    self.dispatch_backlog()
+                    last_dispatch = time.time()
+                    pending = 0
+                    
+                    while self.running and stream.alive:
+                        change = stream.try_next()
+                        if change is not None:
+                            pending += 1
+                            if pending < self.distribute_batch_size:
+                                continue # 继续合并同一时刻到达的事件
+                        
+                        if pending or time.time() - last_dispatch >= self.change_stream_idle_poll:
+                            self.logger.info(f"收到 {pending} 个配置变更事件，开始分发")
+                            self.dispatch_backlog()
+                            last_dispatch = time.time()
+                            pending = 0
+                        
+                        if stream.resume_token is not None and stream.resume_token != saved_token:
+                            self.save_resume_token(stream.resume_token)
+                            saved_token = stream.resume_token
+                if not self.running:
+                    break
+                self.logger.warning(f"change stream已关闭，{self.change_stream_retry_interval}秒后重新监听")
+            except OperationFailure as e:
+                if e.code in CHANGE_STREAM_UNSUPPORTED:
+                    self.logger.warning(f"change stream不可用，回退到轮询: {str(e)}")
+                    return False
+                if saved_token is not None and e.code in CHANGE_STREAM_RESUME_FAILED:
+                    self.logger.warning(f"无法从resume token继续，从当前位置重新监听: {str(e)}")
+                    saved_token = None
+                    self.save_resume_token(None)
+                    continue
+                self.logger.error(f"change stream异常，{self.change_stream_retry_interval}秒后重新监听: {str(e)}")
+            except PyMongoError as e:
+                self.logger.error(f"change stream异常，{self.change_stream_retry_interval}秒后重新监听: {str(e)}")
+            time.sleep(self.change_stream_retry_interval)
+        return True
+    
     def get_ds_configs(self) -> List[Dict[str, Any]]:
         """从MongoDB加载URL
         
@@ -89,7 +223,7 @@ class MasterNode:
         try:
             # 从WebsiteConfig表读取未处理的URL
             ds_configs = self.mongo_client.find(
-                'recruitment_datasource_config',
+                DS_CONFIG_COLLECTION,
                 {'state': 0},
                 limit=master_config['sql_select_count']
             )
@@ -99,6 +233,94 @@ class MasterNode:
             self.logger.error(f"从MongoDB加载URL失败: {str(e)}")
             return []
     
+    def reclaim_expired_leases(self) -> int:
+        """回收租约已过期但未确认分发的配置（认领后Master崩溃或发布失败）
+        
+        Returns:
+            int: 回收的配置数
+        """
+        reclaimed = self.mongo_client.update_many(
+            DS_CONFIG_COLLECTION,
+            {'state': 1, 'lease_expire_at': {'$lt': time.time()}},
+            {'$set': {'state': 0}, '$unset': {'claim_token': '', 'lease_expire_at': ''}}
+        )
+        if reclaimed > 0:
+            self.logger.warning(f"回收了 {reclaimed} 个租约过期的配置")
+        return reclaimed
+    
+    def claim_ds_configs(self) -> List[Dict[str, Any]]:
+        """以租约方式认领待分发的配置
+        
+        先查出候选_id，再用带state=0条件的update_many打上本次认领的token，
+        最后按token取回。每条文档的更新是原子的，多个Master并发认领时同一配置只会被一个Master拿到。
+        
+        Returns:
+            List[Dict[str, Any]]: 本次认领到的配置列表
+        """
+        try:
+            self.reclaim_expired_leases()
+            
+            candidates = self.mongo_client.find(
+                DS_CONFIG_COLLECTION,
+                {'state': 0},
+                projection={'_id': 1},
+                limit=master_config['sql_select_count']
+            )
+            if not candidates:
+                return []
+            
+            claim_token = f"{self.master_id}-{uuid.uuid4().hex}"
+            self.mongo_client.update_many(
+                DS_CONFIG_COLLECTION,
+                {'_id': {'$in': [c['_id'] for c in candidates]}, 'state': 0},
+                {'$set': {
+                    'state': 1,
+                    'claim_token': claim_token,
+                    'lease_expire_at': time.time() + self.lease_seconds
+                }}
+            )
+            ds_configs = self.mongo_client.find(
+                DS_CONFIG_COLLECTION,
+                {'claim_token': claim_token}
+            )
+            self.logger.info(f"[{self.master_id}] 认领了 {len(ds_configs)}/{len(candidates)} 个URL")
+            return ds_configs
+        except Exception as e:
+            self.logger.error(f"认领URL失败: {str(e)}")
+            return []
+    
+    def release_ds_configs(self, ids: List[Any]) -> int:
+        """释放认领但未能分发的配置，使其可被立即重新认领
+        
+        Args:
+            ids: 配置_id列表
+            
+        Returns:
+            int: 释放的配置数
+        """
+        return self.mongo_client.update_many(
+            DS_CONFIG_COLLECTION,
+            {'_id': {'$in': ids}, 'state': 1, 'claim_token': {'$exists': True}},
+            {'$set': {'state': 0}, '$unset': {'claim_token': '', 'lease_expire_at': ''}}
+        )
+    
+    def distributed_query(self, query: Dict[str, Any], claim_token: Optional[str]) -> Dict[str, Any]:
+        """分发成功后更新状态的过滤条件
+        
+        认领模式下附加本次认领的claim_token：租约过期后被其他Master重新认领的配置token已变，
+        不会被本Master的迟到确认改写状态。
+        
+        Args:
+            query: 按_id匹配的条件
+            claim_token: 配置认领时写入的token
+            
+        Returns:
+            Dict[str, Any]: 过滤条件
+        """
+        if self.claim_mode:
+            query['claim_token'] = claim_token
+        return query
+    
     def distribute_tasks(self, ds_confgs: List[Dict[str, Any]]) -> int:
         """分发URL到RabbitMQ
         
@@ -111,22 +333,140 @@ class MasterNode:
         success_count = 0
         
         for ds_config in ds_confgs:
-            ds_config['_id'] = str(ds_config.get('_id', ''))
-            ds_config['timestamp'] = time.time()
+            _id = ds_config.get('_id', '')
+            messages = self.build_task_messages(ds_config, time.time())
             
-            # 发布到RabbitMQ
-            if self.rabbitmq_client.publish_message(
+            # 发布到RabbitMQ，分片全部发布成功才算分发成功
+            if all([self.rabbitmq_client.publish_message(
                 self.exchange_name,
                 self.routing_key,
-                ds_config
-            ):
+                message
+            ) for message in messages]):
                 success_count += 1
                 # 更新URL状态
                 self.mongo_client.update_one(
-                    'recruitment_datasource_config',
-                    {'_id': ds_config['_id']},
-                    {'$set': {'state': 1, 'distributed_at': time.time()}}
+                    DS_CONFIG_COLLECTION,
+                    self.distributed_query({'_id': _id}, ds_config.get('claim_token')), # 使用原生ObjectId匹配
+                    {'$set': {'state': 1, 'distributed_at': time.time()},
+                     '$unset': {'lease_expire_at': ''}}
+                )
+        
+        self.logger.info(f"成功分发 {success_count}/{len(ds_confgs)} 个URL")
+        return success_count
+    
+    def get_confirm_publisher(self):
+        """获取confirm发布器，未开启或channel已关闭时重新创建
+        
+        Returns:
+            RabbitMQConfirmPublisher: 发布器，开启失败返回None
+        """
+        publisher = self.confirm_publisher
+        if publisher is None or not publisher.channel or not publisher.channel.is_open:
+            publisher = self.rabbitmq_client.create_confirm_publisher(max_in_flight=self.publish_window)
+            if not publisher.open():
+                self.logger.error("confirm发布器开启失败")
+                return None
+            self.confirm_publisher = publisher
+        return publisher
+    
+    def build_task_messages(self, ds_config: Dict[str, Any], timestamp: float) -> List[Dict[str, Any]]:
+        """生成配置对应的任务消息
+        
+        配置了shard_size与max_page的列表按页码区间拆分为多个分片消息，由多个Worker并行抓取，
+        同一次分发的分片共享listing_id，抓到列表末尾的分片据此通知其余分片停止。
+        
+        Args:
+            ds_config: 数据源配置
+            timestamp: 分发时间
+            
+        Returns:
+            List[Dict[str, Any]]: 任务消息列表
+        """
+        message = dict(ds_config)
+        message['_id'] = str(ds_config.get('_id', ''))
+        message['timestamp'] = timestamp
+        shard_size, max_page = ds_config.get('shard_size'), ds_config.get('max_page')
+        if not shard_size or not max_page:
+            return [message]
+        
+        start, step = ds_config['pagination'][0], ds_config['pagination'][1]
+        listing_id = f"{message['_id']}:{uuid.uuid4().hex[:8]}"
+        messages = []
+        for index, shard_start in enumerate(range(start, max_page + 1, shard_size * step)):
+            shard_message = dict(message)
+            shard_message['pagination'] = [shard_start, step]
+            shard_message['shard'] = {
+                'listing_id': listing_id,
+                'index': index,
+                'end': min(shard_start + (shard_size - 1) * step, max_page), # 分片最后一页（含）
+            }
+            messages.append(shard_message)
+        self.logger.info(f"配置 {message['_id']} 拆分为 {len(messages)} 个分片, 每片 {shard_size} 页")
+        return messages
+    
+    def distribute_tasks_batch(self, ds_confgs: List[Dict[str, Any]]) -> int:
+        """按批分发URL到RabbitMQ，每批只做一次状态更新
+        
+        每批消息流水线发布并等待broker确认，只把ack的配置用一次update_many置为state=1。
+        confirm发布器不可用时退回distribute_tasks逐条分发。
+        
+        Args:
+            ds_confgs: URL列表
+            
+        Returns:
+            int: 成功分发的URL数
+        """
+        publisher = self.get_confirm_publisher()
+        if publisher is None:
+            return self.distribute_tasks(ds_confgs)
+        
+        success_count = 0
+        for i in range(0, len(ds_confgs), self.distribute_batch_size):
+            batch = ds_confgs[i:i + self.distribute_batch_size]
+            start_time = time.time()
+            
+            ids = []
+            message_keys = []
+            messages = []
+            for ds_config in batch:
+                _id = ds_config.get('_id', '')
+                ids.append(_id) # 保留原生ObjectId用于状态更新
+                for message in self.build_task_messages(ds_config, start_time):
+                    message_keys.append(_id)
+                    messages.append(message)
+            
+            result = publisher.publish_batch(
+                messages, self.routing_key, self.exchange_name, message_keys=message_keys
+            )
+            publish_time = time.time() - start_time
+            
+            # 配置的所有分片都被ack才算分发成功
+            failed = set(result['nacked'] + result['unconfirmed'])
+            acked = set(result['acked'])
+            acked_ids = [_id for _id in ids if _id in acked and _id not in failed]
+            failed_ids = [_id for _id in ids if _id in failed]
+            # 认领模式下按claim_token分组更新，每次认领的配置共用一个token，通常仍是一次update_many
+            groups: Dict[Optional[str], List[Any]] = {}
+            for ds_config in batch:
+                if ds_config.get('_id', '') in acked_ids:
+                    groups.setdefault(ds_config.get('claim_token'), []).append(ds_config.get('_id', ''))
+            for claim_token, group_ids in groups.items():
+                self.mongo_client.update_many(
+                    DS_CONFIG_COLLECTION,
+                    self.distributed_query({'_id': {'$in': group_ids}}, claim_token),
+                    {'$set': {'state': 1, 'distributed_at': time.time()},
+                     '$unset': {'lease_expire_at': ''}}
                 )
+            if failed_ids and self.claim_mode:
+                self.release_ds_configs(failed_ids)
+            success_count += len(acked_ids)
+            
+            total_time = time.time() - start_time
+            self.logger.info(
+                f"批次分发完成: 消息 {len(messages)}, ack {len(acked_ids)}, nack {len(result['nacked'])}, "
+                f"未确认 {len(result['unconfirmed'])}, 发布耗时 {publish_time:.3f}s, "
+                f"更新耗时 {total_time - publish_time:.3f}s, 总耗时 {total_time:.3f}s"
+            )
         
         self.logger.info(f"成功分发 {success_count}/{len(ds_confgs)} 个URL")
         return success_count
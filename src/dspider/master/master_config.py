@@ -4,4 +4,12 @@ master_config = {
     'queue_name': 'sql2mq',
     'exchange_name': '',
     'routing_key': 'sql2mq',
-}
\ No newline at end of file
+    'distribute_batch_size': 500, # 每批发布并更新状态的配置数
+    'publish_window': 1000, # publisher confirm未确认消息窗口
+    'claim_mode': True, # 认领模式：多个Master并发运行时避免重复分发
+    'lease_seconds': 300, # 认领租约时长，超时未确认分发的配置会被回收
+    'dispatch_mode': 'change_stream', # change_stream: 监听配置变更即时分发，不可用时回退polling
+    'change_stream_max_await_ms': 1000, # change stream单次等待事件的最长时间
+    'change_stream_idle_poll': 60, # 无变更事件时的兜底分发间隔（秒），用于回收过期租约
+    'change_stream_retry_interval': 5, # change stream关闭或临时出错后重新监听的间隔（秒）
+}
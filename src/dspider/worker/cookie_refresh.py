@@ -0,0 +1,110 @@
+import logging
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from dspider.common.cookie_state import COOKIE_STATE_FIELD, rejected_update
+from dspider.common.mongodb_service import MongoDBService
+
+logger = logging.getLogger(__name__)
+
+
+class _Flight:
+    """一次进行中的刷新，同一数据源的其他线程等待其结果"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result: Optional[Tuple[dict, float]] = None
+
+
+class CookieRefreshClient:
+    """请求头失效时按需刷新
+
+    请求被拒（401/403）时，先查看数据源配置中是否已有比本任务更新的请求头（其他Worker触发的刷新已完成），
+    有则直接使用；否则写入刷新信号（cookie_state.rejected_at），CookieManager增量同步时发现后立即捕获，
+    捕获结果写回配置后本客户端轮询到新的请求头并返回。
+    同一进程内对同一数据源的并发刷新合并为一次：第一个线程负责写信号与轮询，其余线程等待其结果。
+    Executor内所有任务共享同一个CookieRefreshClient。
+    """
+
+    def __init__(self, mongodb_service: MongoDBService, collection_name: str = 'recruitment_datasource_config',
+                 wait_timeout: float = 60, poll_interval: float = 1.0):
+        """初始化刷新客户端
+
+        Args:
+            mongodb_service: MongoDB服务
+            collection_name: 数据源配置集合
+            wait_timeout: 等待新请求头的最长时间（秒），为0时只写刷新信号不等待
+            poll_interval: 轮询配置的间隔（秒）
+        """
+        self.mongodb_service = mongodb_service
+        self.collection_name = collection_name
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        self.flights: Dict[str, _Flight] = {}
+        self.lock = threading.Lock()
+
+    def refresh(self, task: dict, status_code: int) -> Optional[dict]:
+        """请求被拒后获取新的请求头
+
+        Args:
+            task: 数据源配置（任务），需包含url；成功后更新其中的cookie_state.captured_at
+            status_code: 被拒的状态码
+
+        Returns:
+            Optional[dict]: 新的请求头，超时或失败返回None
+        """
+        url = task['url']
+        captured_at = (task.get(COOKIE_STATE_FIELD) or {}).get('captured_at') or 0
+        with self.lock:
+            flight = self.flights.get(url)
+            leader = flight is None
+            if leader:
+                flight = self.flights[url] = _Flight()
+        if leader:
+            try:
+                flight.result = self._refresh(url, captured_at, status_code)
+            finally:
+                with self.lock:
+                    self.flights.pop(url, None)
+                flight.event.set()
+        else:
+            flight.event.wait(self.wait_timeout + self.poll_interval)
+        if flight.result is None:
+            return None
+        headers, captured_at = flight.result
+        task.setdefault(COOKIE_STATE_FIELD, {})['captured_at'] = captured_at
+        return headers
+
+    def _refresh(self, url: str, captured_at: float, status_code: int) -> Optional[Tuple[dict, float]]:
+        fresh = self.get_fresh_headers(url, captured_at)
+        if fresh is not None:
+            logger.info(f"数据源 {url} 已有更新的请求头")
+            return fresh
+        self.mongodb_service.update_one(self.collection_name, {'url': url}, rejected_update(status_code))
+        logger.warning(f"数据源 {url} 请求被拒（{status_code}），已请求刷新请求头")
+        deadline = time.monotonic() + self.wait_timeout
+        while time.monotonic() < deadline:
+            time.sleep(self.poll_interval)
+            fresh = self.get_fresh_headers(url, captured_at)
+            if fresh is not None:
+                logger.info(f"数据源 {url} 请求头已刷新")
+                return fresh
+        if self.wait_timeout > 0:
+            logger.warning(f"等待数据源 {url} 刷新请求头超时（{self.wait_timeout}秒）")
+        return None
+
+    def get_fresh_headers(self, url: str, captured_at: float) -> Optional[Tuple[dict, float]]:
+        """查询捕获时间晚于captured_at的请求头
+
+        Returns:
+            Optional[Tuple[dict, float]]: (请求头, 捕获时间)，没有更新的请求头时返回None
+        """
+        document = self.mongodb_service.find_one(
+            self.collection_name,
+            {'url': url, f'{COOKIE_STATE_FIELD}.captured_at': {'$gt': captured_at}},
+            {'request_params.headers': 1, f'{COOKIE_STATE_FIELD}.captured_at': 1}
+        )
+        if not document:
+            return None
+        return document['request_params']['headers'], document[COOKIE_STATE_FIELD]['captured_at']
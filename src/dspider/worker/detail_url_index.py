@@ -0,0 +1,186 @@
+import datetime
+import hashlib
+import json
+import logging
+import threading
+from typing import Dict, List, Union
+
+from dspider.common.fingerprint_store import FingerprintStore, canonicalize_url
+from dspider.common.mongodb_service import MongoDBService
+
+logger = logging.getLogger(__name__)
+
+
+class DetailUrlIndex:
+    """详情页去重索引
+
+    MongoDB中按数据源保存已见过的详情页指纹（精确集合），内存中每个数据源一个FingerprintStore作为缓存，
+    由同一进程的Executor线程共享。缓存判定不存在的指纹无需查库，判定存在的指纹批量到MongoDB确认以排除误判；
+    新指纹以无序insert_many写入，_id冲突说明已被其他Executor记录，同样视为已见过。
+    """
+
+    def __init__(self, mongodb_service: MongoDBService, collection_name: str = 'detail_url_seen',
+                 capacity: int = 100000, error_rate: float = 0.001):
+        """初始化去重索引
+
+        Args:
+            mongodb_service: MongoDB服务
+            collection_name: 保存指纹的集合
+            capacity: 每个数据源指纹缓存的初始容量，写满后自动扩容
+            error_rate: 指纹缓存的误判率
+        """
+        self.mongodb_service = mongodb_service
+        self.collection_name = collection_name
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.filters: Dict[str, FingerprintStore] = {}
+        self.lock = threading.Lock()
+        self.indexes_ready = False
+
+    @staticmethod
+    def get_key(item: Union[dict, str]) -> str:
+        """取列表项的详情页键：GET详情页为规范化的URL，POST详情页为排序后的请求体"""
+        url = item.get('url') if isinstance(item, dict) else item
+        if isinstance(url, dict):
+            return json.dumps(url, sort_keys=True, ensure_ascii=False)
+        return canonicalize_url(str(url))
+
+    def fingerprint(self, datasource_id: str, key: str) -> str:
+        return f"{datasource_id}:{hashlib.sha1(key.encode('utf-8')).hexdigest()}"
+
+    # 指纹即_id，天然唯一；按数据源加载指纹的查询使用ds索引
+    INDEXES = [[('ds', 1)]]
+
+    def ensure_indexes(self):
+        """首次使用时创建索引"""
+        if self.indexes_ready:
+            return
+        for keys in self.INDEXES:
+            self.mongodb_service.create_index(self.collection_name, keys)
+        self.indexes_ready = True
+
+    def new_filter(self, datasource_id: str, documents: List[dict]) -> FingerprintStore:
+        """用从MongoDB加载的指纹构建数据源的指纹缓存"""
+        store = FingerprintStore(self.capacity, self.error_rate)
+        store.add_fingerprints(document['_id'] for document in documents)
+        logger.info(f"加载数据源 {datasource_id} 的详情页指纹 {len(documents)} 条")
+        return store
+
+    def get_filter(self, datasource_id: str) -> FingerprintStore:
+        """获取数据源的指纹缓存，首次使用时从MongoDB加载已有指纹"""
+        store = self.filters.get(datasource_id)
+        if store is None:
+            with self.lock:
+                store = self.filters.get(datasource_id)
+                if store is None:
+                    self.ensure_indexes()
+                    documents = self.mongodb_service.find(self.collection_name, {'ds': datasource_id}, {'_id': 1})
+                    store = self.filters[datasource_id] = self.new_filter(datasource_id, documents)
+        return store
+
+    def candidates(self, datasource_id: str, keys: List[str]) -> Dict[str, str]:
+        """去重后的指纹 -> 详情页键"""
+        candidates = {}
+        for key in keys:
+            candidates.setdefault(self.fingerprint(datasource_id, key), key)
+        return candidates
+
+    @staticmethod
+    def maybe_seen(store: FingerprintStore, candidates: Dict[str, str]) -> List[str]:
+        """指纹缓存判定可能已记录、需要到MongoDB确认的指纹"""
+        fingerprints = list(candidates)
+        return [fp for fp, seen in zip(fingerprints, store.contains_fingerprints(fingerprints)) if seen]
+
+    @staticmethod
+    def unseen_keys(candidates: Dict[str, str], seen_documents: List[dict]) -> List[str]:
+        """排除MongoDB中已存在的指纹，返回新的详情页键"""
+        for document in seen_documents:
+            candidates.pop(document['_id'], None)
+        return list(candidates.values())
+
+    @staticmethod
+    def new_documents(datasource_id: str, candidates: Dict[str, str]) -> List[dict]:
+        now = datetime.datetime.now()
+        return [{'_id': fp, 'ds': datasource_id, 'created_at': now} for fp in candidates]
+
+    def filter_new(self, datasource_id: str, keys: List[str]) -> List[str]:
+        """只读判断，返回此前未记录过的详情页键，不写入索引
+
+        翻页时用于判断是否继续，页面保存成功后再通过commit记录，
+        避免页面未保存（上传失败、任务中断）而指纹已记录，下一轮误判为已见过而提前停止。
+
+        Args:
+            datasource_id: 数据源ID
+            keys: 一页中提取的详情页键
+
+        Returns:
+            List[str]: 新的详情页键
+        """
+        candidates = self.candidates(datasource_id, keys)
+        if not candidates:
+            return []
+        maybe_seen = self.maybe_seen(self.get_filter(datasource_id), candidates)
+        seen = self.mongodb_service.find(self.collection_name, {'_id': {'$in': maybe_seen}}, {'_id': 1}) if maybe_seen else []
+        return self.unseen_keys(candidates, seen)
+
+    def commit(self, datasource_id: str, keys: List[str]) -> bool:
+        """记录已保存页面的详情页键
+
+        Args:
+            datasource_id: 数据源ID
+            keys: 详情页键
+
+        Returns:
+            bool: 是否记录成功
+        """
+        candidates = self.candidates(datasource_id, keys)
+        if not candidates:
+            return True
+        inserted = self.mongodb_service.insert_many(
+            self.collection_name, self.new_documents(datasource_id, candidates), ordered=False)
+        if inserted is None:
+            logger.error(f"记录详情页指纹失败，数据源 {datasource_id}")
+            return False
+        self.get_filter(datasource_id).add_fingerprints(candidates) # _id冲突的指纹已被其他Executor记录，同样加入缓存
+        return True
+
+
+class AsyncDetailUrlIndex(DetailUrlIndex):
+    """基于AsyncMongoDBService的详情页去重索引，供AsyncListSpider使用"""
+
+    async def ensure_indexes(self):
+        if self.indexes_ready:
+            return
+        for keys in self.INDEXES:
+            await self.mongodb_service.create_index(self.collection_name, keys)
+        self.indexes_ready = True
+
+    async def get_filter(self, datasource_id: str) -> FingerprintStore:
+        store = self.filters.get(datasource_id)
+        if store is None:
+            await self.ensure_indexes()
+            documents = await self.mongodb_service.find(self.collection_name, {'ds': datasource_id}, {'_id': 1})
+            store = self.filters.get(datasource_id) # 加载期间其他协程可能已创建
+            if store is None:
+                store = self.filters[datasource_id] = self.new_filter(datasource_id, documents)
+        return store
+
+    async def filter_new(self, datasource_id: str, keys: List[str]) -> List[str]:
+        candidates = self.candidates(datasource_id, keys)
+        if not candidates:
+            return []
+        maybe_seen = self.maybe_seen(await self.get_filter(datasource_id), candidates)
+        seen = await self.mongodb_service.find(self.collection_name, {'_id': {'$in': maybe_seen}}, {'_id': 1}) if maybe_seen else []
+        return self.unseen_keys(candidates, seen)
+
+    async def commit(self, datasource_id: str, keys: List[str]) -> bool:
+        candidates = self.candidates(datasource_id, keys)
+        if not candidates:
+            return True
+        inserted = await self.mongodb_service.insert_many(
+            self.collection_name, self.new_documents(datasource_id, candidates), ordered=False)
+        if inserted is None:
+            logger.error(f"记录详情页指纹失败，数据源 {datasource_id}")
+            return False
+        (await self.get_filter(datasource_id)).add_fingerprints(candidates)
+        return True
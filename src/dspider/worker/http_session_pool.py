@@ -0,0 +1,115 @@
+import http.cookiejar
+import logging
+import threading
+from typing import Dict, Optional, Tuple, Union
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+logger = logging.getLogger(__name__)
+
+# 记录当前线程本次请求新建的连接数，由连接池在新建连接时累加
+_local = threading.local()
+
+
+def _count_new_conn(pool_cls):
+    class CountingPool(pool_cls):
+        def _new_conn(self):
+            _local.new_connections = getattr(_local, 'new_connections', 0) + 1
+            return super()._new_conn()
+    CountingPool.__name__ = f"Counting{pool_cls.__name__}"
+    return CountingPool
+
+
+class CountingHTTPAdapter(HTTPAdapter):
+    """统计新建连接数的HTTPAdapter"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _count_new_conn(HTTPConnectionPool),
+            'https': _count_new_conn(HTTPSConnectionPool),
+        }
+
+
+class HttpSessionPool:
+    """按host复用的HTTP会话池
+
+    每个scheme://host对应一个requests.Session，Session内维持keep-alive连接池，
+    Executor内所有任务共享同一个HttpSessionPool，同一站点的翻页请求复用TCP/TLS连接。
+    会话只复用连接，不保存响应中的Set-Cookie，cookie只来自各任务数据源配置的请求头，不会在任务之间串用。
+    """
+
+    def __init__(self, pool_maxsize: int = 10, timeout: Union[float, Tuple[float, float]] = (5, 30),
+                 max_retries: int = 0):
+        """初始化会话池
+
+        Args:
+            pool_maxsize: 每个host保持的最大连接数，应不小于Executor的并发数
+            timeout: 默认超时（秒），可为(连接超时, 读取超时)
+            max_retries: 连接失败时的重试次数
+        """
+        self.pool_maxsize = pool_maxsize
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.sessions: Dict[str, requests.Session] = {}
+        self.lock = threading.Lock()
+
+    def get_session(self, url: str) -> requests.Session:
+        """获取url所属host的会话，不存在时创建
+
+        Args:
+            url: 请求地址
+
+        Returns:
+            requests.Session: 该host共享的会话
+        """
+        parts = urlsplit(url)
+        key = f"{parts.scheme}://{parts.netloc}"
+        session = self.sessions.get(key)
+        if session is None:
+            with self.lock:
+                session = self.sessions.get(key)
+                if session is None:
+                    session = requests.Session()
+                    session.cookies.set_policy(http.cookiejar.DefaultCookiePolicy(allowed_domains=[])) # 拒绝保存任何cookie
+                    adapter = CountingHTTPAdapter(pool_connections=1, pool_maxsize=self.pool_maxsize,
+                                                  max_retries=self.max_retries)
+                    session.mount('http://', adapter)
+                    session.mount('https://', adapter)
+                    self.sessions[key] = session
+                    logger.info(f"创建HTTP会话: {key}, 连接池大小: {self.pool_maxsize}")
+        return session
+
+    def request(self, method: str, url: str, statistic: Optional[dict] = None, **kwargs) -> requests.Response:
+        """通过host共享的会话发送请求
+
+        Args:
+            method: 请求方法
+            url: 请求地址
+            statistic: 任务统计信息，传入时累加new_connections/reused_connections
+            **kwargs: 透传给requests.Session.request的参数，未指定timeout时使用默认超时
+
+        Returns:
+            requests.Response: 响应对象
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        session = self.get_session(url)
+        _local.new_connections = 0
+        try:
+            return session.request(method, url, **kwargs)
+        finally:
+            if statistic is not None:
+                new_connections = _local.new_connections
+                statistic['new_connections'] = statistic.get('new_connections', 0) + new_connections
+                if new_connections == 0:
+                    statistic['reused_connections'] = statistic.get('reused_connections', 0) + 1
+
+    def close(self):
+        """关闭所有会话及其连接"""
+        with self.lock:
+            for session in self.sessions.values():
+                session.close()
+            self.sessions.clear()
@@ -0,0 +1,232 @@
+import logging
+import math
+import threading
+import time
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+# 默认限速参数，可被数据源配置中的rate_limit覆盖
+DEFAULT_RATE_LIMIT = {
+    'rate': 0.2, # 初始速率（请求/秒），与原先每页sleep 5秒一致
+    'min_rate': 0.05, # 最低速率
+    'max_rate': 5, # 最高速率
+    'burst': 1, # 令牌桶容量
+    'increase': 0.05, # 成功时速率的加性增量
+    'backoff': 0.5, # 限流/出错时速率的乘性减量
+    'latency_threshold': 5, # 响应耗时超过该值（秒）视为过载
+}
+
+
+def normalize_rate_limit(options: Optional[dict]) -> dict:
+    """校验数据源配置中的rate_limit，忽略未知参数与非正数值，缺省项取DEFAULT_RATE_LIMIT
+
+    Args:
+        options: 数据源配置中的rate_limit
+
+    Returns:
+        dict: 完整的限速参数
+    """
+    normalized = dict(DEFAULT_RATE_LIMIT)
+    for key, value in (options or {}).items():
+        if key not in DEFAULT_RATE_LIMIT:
+            logger.warning(f"忽略未知的限速参数: {key}")
+        elif isinstance(value, bool) or not isinstance(value, (int, float)) or value <= 0:
+            logger.warning(f"忽略无效的限速参数: {key}={value!r}")
+        else:
+            normalized[key] = value
+    if normalized['min_rate'] > normalized['max_rate']:
+        logger.warning(f"限速参数min_rate大于max_rate，使用默认值: {options}")
+        normalized['min_rate'], normalized['max_rate'] = DEFAULT_RATE_LIMIT['min_rate'], DEFAULT_RATE_LIMIT['max_rate']
+    return normalized
+
+
+class DomainRateLimiter:
+    """单个域名的自适应限速器
+
+    令牌桶控制请求间隔，速率按AIMD调整：响应为200且耗时正常时加性提速，
+    429/5xx/请求异常/响应变慢时乘性降速，每个冷却周期内最多降速一次。
+    """
+
+    def __init__(self, domain: str, rate: float, min_rate: float, max_rate: float, burst: int,
+                 increase: float, backoff: float, latency_threshold: float):
+        """初始化限速器
+
+        Args:
+            domain: 域名
+            rate: 初始速率（请求/秒）
+            min_rate: 最低速率
+            max_rate: 最高速率
+            burst: 令牌桶容量
+            increase: 加性增量
+            backoff: 乘性减量
+            latency_threshold: 过载耗时阈值（秒）
+        """
+        self.domain = domain
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = burst
+        self.increase = increase
+        self.backoff = backoff
+        self.latency_threshold = latency_threshold
+
+        self.tokens = float(burst)
+        self.updated_at = time.monotonic()
+        self.blocked_until = 0.0 # Retry-After指定的暂停截止时间
+        self.last_decrease = 0.0
+        self.lock = threading.Lock()
+
+    def configure(self, min_rate: float, max_rate: float, burst: int, increase: float, backoff: float,
+                  latency_threshold: float, **kwargs):
+        """更新限速参数，当前速率保留自适应调整的结果，只收敛到新的上下限内（初始速率rate不再生效）"""
+        with self.lock:
+            self.min_rate = min_rate
+            self.max_rate = max_rate
+            self.burst = burst
+            self.tokens = min(self.tokens, float(burst))
+            self.increase = increase
+            self.backoff = backoff
+            self.latency_threshold = latency_threshold
+            self.rate = min(max_rate, max(min_rate, self.rate))
+
+    def reserve(self) -> float:
+        """预留一个令牌
+
+        Returns:
+            float: 使用该令牌前需要等待的秒数
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            return max(wait, self.blocked_until - now)
+
+    def acquire(self) -> float:
+        """阻塞直到可以发送下一个请求
+
+        Returns:
+            float: 实际等待的秒数
+        """
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def feedback(self, status_code: Optional[int], latency: float, retry_after: Optional[float] = None):
+        """根据响应结果调整速率
+
+        Args:
+            status_code: 响应状态码，请求异常时为None
+            latency: 请求耗时（秒）
+            retry_after: 响应头Retry-After指定的秒数
+        """
+        with self.lock:
+            now = time.monotonic()
+            if retry_after:
+                self.blocked_until = max(self.blocked_until, now + retry_after)
+            overloaded = status_code is None or status_code == 429 or status_code >= 500 \
+                or latency > self.latency_threshold
+            if overloaded:
+                if now - self.last_decrease >= 1 / self.rate:
+                    self.rate = max(self.min_rate, self.rate * self.backoff)
+                    self.last_decrease = now
+                    logger.info(f"域名 {self.domain} 降速至 {self.rate:.3f} 请求/秒 (状态码 {status_code}, 耗时 {latency:.2f}s)")
+            elif status_code == 200:
+                self.rate = min(self.max_rate, self.rate + self.increase)
+
+
+class RateLimiterRegistry:
+    """按域名共享的限速器注册表
+
+    同一进程内的所有Executor共用（WorkerNode在同一进程的线程中运行多个Executor）。
+    限速器状态不跨进程共享，同一主机运行多个Worker进程时通过set_processes按进程数均分速率，
+    各进程合计不超过配置的速率。
+    同一域名被多个数据源配置rate_limit时，各参数取这些配置中的最小值（最保守），不因调用先后互相覆盖。
+    """
+
+    def __init__(self, processes: int = 1):
+        """初始化注册表
+
+        Args:
+            processes: 同一主机上共同访问各域名的Worker进程数
+        """
+        self.limiters: Dict[str, DomainRateLimiter] = {}
+        self.sources: Dict[str, Dict[Optional[str], dict]] = {} # 域名 -> 数据源 -> 校验后的rate_limit
+        self.processes = processes
+        self.lock = threading.Lock()
+
+    def set_processes(self, processes: int):
+        """设置同一主机上的Worker进程数，已有限速器按新的进程数重新均分速率"""
+        processes = max(1, int(processes))
+        with self.lock:
+            if processes == self.processes:
+                return
+            self.processes = processes
+            configs = {domain: self.effective_config(domain) for domain in self.limiters}
+        for domain, config in configs.items():
+            self.limiters[domain].configure(**config)
+        logger.info(f"限速按 {processes} 个Worker进程均分")
+
+    def effective_config(self, domain: str) -> dict:
+        """合并各数据源对该域名的限速参数（取最小值），并按进程数均分速率"""
+        configs = list(self.sources.get(domain, {}).values())
+        if configs:
+            config = {key: min(c[key] for c in configs) for key in DEFAULT_RATE_LIMIT}
+        else:
+            config = dict(DEFAULT_RATE_LIMIT)
+        for key in ('rate', 'min_rate', 'max_rate', 'increase'):
+            config[key] /= self.processes
+        config['burst'] = max(1, math.ceil(config['burst'] / self.processes))
+        return config
+
+    def get(self, url: str, options: Optional[dict] = None, source: Optional[str] = None) -> DomainRateLimiter:
+        """获取url所属域名的限速器，不存在时创建
+
+        传入options时记录为数据源source对该域名的限速参数，参数变化后按所有数据源的合并结果更新限速器，
+        见DomainRateLimiter.configure；不传options时不改变已有参数。
+
+        Args:
+            url: 请求地址
+            options: 数据源配置中的rate_limit，未知参数与无效值被忽略
+            source: 数据源ID，同一数据源再次传入的参数替换其上一次的参数
+
+        Returns:
+            DomainRateLimiter: 该域名共享的限速器
+        """
+        domain = urlsplit(url).netloc
+        if options is None:
+            limiter = self.limiters.get(domain)
+            if limiter is not None:
+                return limiter
+        with self.lock:
+            changed = False
+            if options is not None:
+                config = normalize_rate_limit(options)
+                sources = self.sources.setdefault(domain, {})
+                changed = sources.get(source) != config
+                sources[source] = config
+            limiter = self.limiters.get(domain)
+            if limiter is None:
+                limiter = self.limiters[domain] = DomainRateLimiter(domain, **self.effective_config(domain))
+                logger.info(f"创建域名限速器: {domain}, 初始速率 {limiter.rate} 请求/秒")
+                return limiter
+            config = self.effective_config(domain) if changed else None
+        if config is not None:
+            limiter.configure(**config)
+            logger.info(f"更新域名限速器参数: {domain}, {config}")
+        return limiter
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """解析Retry-After响应头，只支持秒数格式"""
+    try:
+        return float(value) if value else None
+    except (TypeError, ValueError):
+        return None
+
+
+rate_limiter_registry = RateLimiterRegistry()
@@ -0,0 +1,211 @@
+import asyncio
+import datetime
+import logging
+import time
+import typing
+
+from dspider.common.cookie_state import AUTH_REJECTED_STATUS, rejected_update
+from dspider.worker.detail_url_index import AsyncDetailUrlIndex
+from dspider.worker.rate_limiter import parse_retry_after
+from dspider.worker.spider.list_spider import ListSpider, TaskIncompleteError, get_extractor
+
+if typing.TYPE_CHECKING:
+    from dspider.worker.worker import AsyncExecutor
+
+
+class AsyncListSpider(ListSpider):
+    """
+    基于asyncio的列表页爬虫
+    复用ListSpider的分页、解析和存储路径逻辑，网络请求与存储改为异步，
+    由AsyncExecutor在同一事件循环中并发运行多个任务
+    """
+    def __init__(self, executor: 'AsyncExecutor'):
+        super().__init__(executor)
+        self.detail_url_index = AsyncDetailUrlIndex(self.mongodb_service, self.detail_url_index.collection_name)
+        self.logger = logging.getLogger(__name__)
+
+    async def start(self, task: dict):
+        self.logger.info(f"[{self.executor.executor_id}] 开始执行任务 {task.get('task_name')}")
+        self.logger.debug(f"[{self.executor.executor_id}] 任务参数 {task}")
+
+        request_params = task['request_params']
+        parse_rule_list = task['parse_rule']['list_page']
+
+        api_url, headers, postdata_template = request_params['api_url'], request_params['headers'], request_params['postdata']
+        postdata = postdata_template.copy()
+
+        req_method = self.req_method_judger.judge(task)
+        pagination = self.pagination_getter.get_pagination(task)
+        start, cur, step = pagination[0], pagination[0], pagination[1]
+
+        additional_params = request_params['additional']
+        if additional_params['index_api_url'] != '' or \
+            additional_params['index_postdata'] != {}:
+                api_url = additional_params['index_api_url']
+                postdata = additional_params['index_postdata']
+
+        page_filed = self.get_page_filed(task)
+        self.rate_limiters.get(request_params['api_url'], task.get('rate_limit'), self.get_datasource_id(task))
+        statistic = {
+            'stop_reason': '',
+            'last_fail': -1,
+            'fail': [],
+            'last_resp_text': '',
+            'total': 0,
+            'success': 0,
+            'rate_limit_wait': 0,
+        }
+        extractor = get_extractor(parse_rule_list)
+        shard = task.get('shard')
+        detail_keys = set() # 本任务发现的新详情页键，页面全部保存后才记录到去重索引
+        stored = True
+
+        while True:
+            if shard:
+                if cur > shard['end']:
+                    statistic['stop_reason'] = f"分片结束，最后请求页：{shard['end']}"
+                    break
+                listing_end = await self.get_listing_end(shard)
+                if listing_end is not None and cur > listing_end:
+                    statistic['stop_reason'] = f"列表已在第{listing_end}页结束，取消分片剩余页：{cur}"
+                    break
+
+            page_url = api_url
+            if page_filed['location'] == 'api_url':
+                page_url = api_url.format(cur)
+            elif page_filed['location'] == 'postdata':
+                postdata[page_filed['key']] = postdata_template[page_filed['key']].format(cur)
+
+            resp_text = await self.single_request(page_url, headers, postdata, req_method, cur, step, statistic, parse_rule_list)
+
+            if resp_text is None:
+                if statistic.get('listing_end'):
+                    await self.mark_listing_end(shard, cur) # 连续请求失败不取消后续分片
+                break
+            elif resp_text:
+                urls = extractor.extract_url(resp_text)
+                has = await self.has_new_detail_url(urls, task, detail_keys)
+                if not has:
+                    statistic['stop_reason'] = f"无新详情页，最后请求页：{cur}"
+                    await self.mark_listing_end(shard, cur)
+                    break
+                save_info = self.get_save_info(task, resp_text, cur)
+                if await self.store_to_minio(save_info['filepath'], resp_text):
+                    stored = await self.save(save_info) and stored
+                else:
+                    stored = False
+
+            cur += step
+
+        if stored:
+            await self.commit_detail_urls(task, detail_keys)
+        if statistic.get('auth_rejected') and task.get('url'):
+            await self.report_auth_rejected(task, statistic['auth_rejected'])
+        if not stored:
+            raise TaskIncompleteError("部分页面或列表页记录保存失败")
+        return statistic
+
+    async def report_auth_rejected(self, task: dict, status_code: int):
+        await self.mongodb_service.update_one(self.datasource_collection_name, {'url': task['url']}, rejected_update(status_code))
+        self.logger.warning(f"[{self.executor.executor_id}] 数据源 {task['url']} 请求被拒（{status_code}），等待刷新请求头")
+
+    async def single_request(self, api_url, headers, postdata, req_method, cur, step, statistic, parse_rule_list):
+        """异步请求单页，判定逻辑与ListSpider.single_request一致
+
+        Returns:
+            Optional[str]: 响应文本；单页失败但可继续翻页时返回空字符串；需要停止翻页时返回None
+        """
+        statistic['total'] = statistic.get('total', 0) + 1
+        last_fail = statistic.get('last_fail')
+        last_resp_text = statistic.get('last_resp_text')
+
+        limiter = self.rate_limiters.get(api_url)
+        wait = limiter.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        statistic['rate_limit_wait'] = statistic.get('rate_limit_wait', 0) + wait
+
+        request_start = time.monotonic()
+        retry_after = None
+        try:
+            async with self.executor.http_session.request(req_method, api_url, headers=headers, data=postdata or None) as resp:
+                status_code = resp.status
+                retry_after = parse_retry_after(resp.headers.get('Retry-After'))
+                resp_text = await resp.text()
+        except Exception as e:
+            self.logger.error(f"[{self.executor.executor_id}] 请求失败: {api_url} {str(e)}")
+            status_code, resp_text = None, None
+        limiter.feedback(status_code, time.monotonic() - request_start, retry_after)
+
+        if status_code == 200:
+            statistic['success'] = statistic.get('success', 0) + 1
+            if resp_text == last_resp_text:
+                statistic['stop_reason'] = f"重复页响应内容，最后成功页：{cur}"
+                statistic['listing_end'] = cur
+                return None
+            statistic['last_resp_text'] = resp_text
+            return resp_text
+
+        if status_code in AUTH_REJECTED_STATUS:
+            statistic['auth_rejected'] = status_code # 请求头/cookie可能已失效
+        statistic['fail'].append(cur)
+        statistic['last_fail'] = cur
+        if last_fail + step == cur: # 有连续页面请求失败
+            statistic['stop_reason'] = f"连续页请求失败，最后失败页：{cur}"
+            return None
+        return ''
+
+    async def has_new_detail_url(self, urls: list, task: dict = None, pending: set = None) -> bool:
+        if task is None or not task.get('dedup', True):
+            return True
+        keys = [self.detail_url_index.get_key(item) for item in urls]
+        new_keys = await self.detail_url_index.filter_new(self.get_datasource_id(task), keys)
+        if pending is not None:
+            new_keys = [key for key in new_keys if key not in pending]
+            pending.update(new_keys)
+        return len(new_keys) > 0
+
+    async def commit_detail_urls(self, task: dict, keys: set) -> bool:
+        if not keys or not task.get('dedup', True):
+            return True
+        return await self.detail_url_index.commit(self.get_datasource_id(task), list(keys))
+
+    async def get_listing_end(self, shard: dict):
+        document = await self.mongodb_service.find_one(self.listing_end_collection_name, {'_id': shard['listing_id']})
+        return document['end_page'] if document else None
+
+    async def mark_listing_end(self, shard: dict, cur: int):
+        if not shard:
+            return
+        await self.mongodb_service.update_one(
+            self.listing_end_collection_name,
+            {'_id': shard['listing_id']},
+            {'$min': {'end_page': cur}, '$setOnInsert': {'created_at': datetime.datetime.now()}},
+            upsert=True
+        )
+        self.logger.info(f"[{self.executor.executor_id}] 列表 {shard['listing_id']} 在第{cur}页结束")
+
+    async def store_to_minio(self, object_name: str, content: str) -> bool:
+        """将内容存储到MinIO，MinIO客户端为同步实现，放到线程池中执行
+
+        Args:
+            object_name: 对象名称
+            content: 要存储的内容
+
+        Returns:
+            bool: 是否成功存储
+        """
+        success = await asyncio.to_thread(self.minio_client.upload_text, self.bucket_name, object_name, content)
+        self.logger.info(f"存储到MinIO成功: {object_name} {success}")
+        return success
+
+    async def save(self, save_info: dict) -> bool:
+        """将列表页路径异步保存到MongoDB
+
+        Args:
+            save_info: 列表页存储信息
+
+        Returns:
+            bool: 是否成功保存
+        """
+        return await self.mongodb_service.insert_one(self.list_collection_name, save_info) is not None
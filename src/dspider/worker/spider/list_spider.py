@@ -3,11 +3,29 @@ import uuid
 import time
 import typing
 import datetime
+import io
 import json
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
+import lxml.etree
+import lxml.html
 import requests
 
+from dspider.common.cookie_state import AUTH_REJECTED_STATUS, rejected_update
+from dspider.common.page_archive import DEFAULT_SEGMENT_SIZE, PageArchiveWriter
 from dspider.worker.judge_requests_method import ReqMethodHasPostJudger
+from dspider.worker.rate_limiter import rate_limiter_registry, parse_retry_after
+from dspider.worker.detail_url_index import DetailUrlIndex
+from dspider.worker.write_behind import WriteTicket
+from dspider.worker.spider.parse_rule import compile_item_matcher, compile_list_rule
+
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
 
 if typing.TYPE_CHECKING:
     from dspider.worker.worker import Executor
@@ -50,51 +68,130 @@ class ListSpiderExtractor:
         self.parse_rule_list = parse_rule_list
 
 class ListSpiderExtractorJson(ListSpiderExtractor):
+    """JSON列表页解析器
+    
+    构造时按规则哈希取得编译后的解析规则（见parse_rule），每个响应只解析一次：
+    parse得到的对象可以直接传给extract_list_data/extract_url，这些方法也接受str/bytes并在内部解析。
+    安装orjson时使用orjson解析。
+    """
+    def __init__(self, parse_rule_list):
+        super().__init__(parse_rule_list)
+        self.rule = compile_list_rule(parse_rule_list)
+    
+    @staticmethod
+    def parse(content: typing.Union[str, bytes, dict, list]):
+        """解析响应内容，已解析的对象原样返回"""
+        if isinstance(content, (str, bytes, bytearray)):
+            return json_loads(content)
+        return content
     
-    def extract_list_data(self, resp_text: str):
-        self.list_items_rule = self.parse_rule_list['list_data']
-        resp_json = json.loads(resp_text)
-        path = self.list_items_rule.split('.')
-        list_items: list = resp_json
-        for p in path:
-            list_items = list_items.get(p)
-        return list_items
+    def extract_list_data(self, content: typing.Union[str, bytes, dict, list]):
+        return self.rule.list_data(self.parse(content))
     
-    def extract_url(self, resp_text: str):
-        list_items = self.extract_list_data(resp_text)
+    def extract_url(self, content: typing.Union[str, bytes, dict, list]):
+        list_items = self.extract_list_data(content)
         return self._extract_url_handler(list_items)
         
     def extract_other(self, resp_text: str):
         pass
     
     def _extract_url_handler(self, list_items: list):
-        url_rule = self.parse_rule_list['url_rule']
-        url_path, params, postdata_rule = url_rule['url_path'], url_rule['params'], url_rule['postdata']
-        urls = []
-        postdata_list = []
-        for item in list_items:
-            target_url = url_path
-            if postdata_rule == {}:
-                target_url += '?'
-                for list_data_key, url_key in params.items():
-                    target_url += f"{url_key}={item.get(list_data_key)}&" # TODO: 是否要考虑参数在目标URL的位置
-                target_url = target_url[:-1] # 去掉最后一个&
-                item['url'] = target_url
-                urls.append(target_url)
-            else: # detail为post请求
-                target_postdata = {}
-                for list_data_key, url_key in postdata_rule.items():
-                    target_postdata[url_key] = item.get(list_data_key)
-                # TODO: 补充额外字段
-                item['url'] = target_postdata
-                postdata_list.append(target_postdata)
-        return list_items
+        # TODO: 是否要考虑参数在目标URL的位置
+        return self.rule.apply(list_items)
     
     def _extract_other_handler(self, list_items: list):
         pass
 
 class ListSpiderExtractorHTML(ListSpiderExtractor):
-    pass
+    """HTML列表页解析器
+    
+    基于lxml，list_data与url_rule/fields中的CSS/XPath规则在构造时编译（见parse_rule），
+    字段规则相对于每个列表项元素求值。响应超过stream_threshold字节且list_data为不含层级关系的选择器时，
+    extract_url流式解析，每处理完一个列表项即释放对应元素，内存占用不随文档大小增长。
+    """
+    STREAM_THRESHOLD = 1024 * 1024
+    _local = threading.local() # lxml解析器不能跨线程共用
+    
+    def __init__(self, parse_rule_list):
+        super().__init__(parse_rule_list)
+        self.rule = compile_list_rule(parse_rule_list)
+        self.stream_threshold = parse_rule_list.get('stream_threshold', self.STREAM_THRESHOLD)
+        self.item_matcher = compile_item_matcher(parse_rule_list['list_data'])
+    
+    @classmethod
+    def get_parser(cls, encoding: typing.Optional[str]):
+        parsers = cls._local.__dict__.setdefault('parsers', {})
+        if encoding not in parsers:
+            parsers[encoding] = lxml.html.HTMLParser(encoding=encoding)
+        return parsers[encoding]
+    
+    def parse(self, content: typing.Union[str, bytes, 'lxml.html.HtmlElement']):
+        """解析HTML，bytes按文档声明的编码解析，str按UTF-8编码后解析，已解析的元素原样返回"""
+        if isinstance(content, str):
+            return lxml.html.document_fromstring(content.encode('utf-8'), parser=self.get_parser('utf-8'))
+        if isinstance(content, (bytes, bytearray)):
+            return lxml.html.document_fromstring(bytes(content), parser=self.get_parser(None))
+        return content
+    
+    def extract_list_data(self, content):
+        """返回列表项元素"""
+        return self.rule.list_data(self.parse(content))
+    
+    def extract_url(self, content):
+        if self.item_matcher is not None and isinstance(content, (str, bytes, bytearray)) \
+                and len(content) >= self.stream_threshold:
+            return list(self.iter_items(content))
+        return [self.rule.to_item(element) for element in self.extract_list_data(content)]
+    
+    def iter_items(self, content: typing.Union[str, bytes]):
+        """流式解析HTML，逐个生成列表项字典"""
+        tag, is_item = self.item_matcher
+        if isinstance(content, str):
+            source, encoding = io.BytesIO(content.encode('utf-8')), 'utf-8'
+        else:
+            source, encoding = io.BytesIO(content), None
+        for _, element in lxml.etree.iterparse(source, events=('end',), tag=tag, html=True, encoding=encoding):
+            if not is_item(element):
+                continue
+            yield self.rule.to_item(element)
+            element.clear(keep_tail=True)
+            # 删除已处理的兄弟元素，保持内存占用与单个列表项相当
+            while element.getprevious() is not None:
+                del element.getparent()[0]
+    
+    def extract_other(self, resp_text: str):
+        pass
+
+
+class TaskIncompleteError(Exception):
+    """任务的页面或记录未能全部保存，消息应重回队列重新执行"""
+
+
+class TaskHeaders:
+    """任务内各翻页线程共用的请求头
+
+    刷新时整体替换为新的字典，不修改正在使用的字典；每次发送取当前请求头的副本，
+    并发预取的请求不会读到修改中的字典，也不会混用新旧请求头。
+    """
+
+    def __init__(self, headers: dict):
+        self.lock = threading.Lock()
+        self.current = dict(headers)
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return dict(self.current)
+
+    def replace(self, headers: dict):
+        with self.lock:
+            self.current = dict(headers)
+
+
+def get_extractor(parse_rule_list: dict) -> ListSpiderExtractor:
+    """按列表页规则的type（json/html，默认json）创建解析器"""
+    if parse_rule_list.get('type', 'json') == 'html':
+        return ListSpiderExtractorHTML(parse_rule_list)
+    return ListSpiderExtractorJson(parse_rule_list)
 
 class ListSpider:
     def __init__(self, executor: 'Executor'):
@@ -103,19 +200,27 @@ class ListSpider:
         self.minio_client = executor.minio_client
         self.list_collection_name = executor.task_config['datasource']['list_page']
         self.bucket_name = executor.task_config['datasource']['bucket_name']
+        self.listing_end_collection_name = executor.task_config['datasource'].get('listing_end', 'listing_end') # 分片列表的结束页
+        self.datasource_collection_name = executor.task_config['datasource'].get('datasource_config', 'recruitment_datasource_config')
+        self.detail_url_index = DetailUrlIndex(
+            self.mongodb_service, executor.task_config['datasource'].get('detail_url_seen', 'detail_url_seen'))
         self.req_method_judger = ReqMethodHasPostJudger()
         self.pagination_getter = PaginationGetterDefault()
+        self.rate_limiters = rate_limiter_registry # 按域名限速，进程内所有Executor共享
+        self.current = threading.local() # 当前线程正在执行的任务，Executor并发执行任务时各线程互不影响
         self.logger = logging.getLogger(__name__)
     
     def start(self, task: dict):
         self.logger.info(f"[{self.executor.executor_id}] 开始执行任务 {task.get('task_name')}")
         self.logger.debug(f"[{self.executor.executor_id}] 任务参数 {task}")
         task_id = task.get('_id', str(uuid.uuid4()))
+        self.current.task = task # 请求被拒时据此刷新请求头
      
         request_params = task['request_params']
         parse_rule_list = task['parse_rule']['list_page']
         
-        api_url, headers, postdata_template = request_params['api_url'], request_params['headers'], request_params['postdata']
+        api_url, postdata_template = request_params['api_url'], request_params['postdata']
+        headers = TaskHeaders(request_params['headers']) # 并发预取的线程共用，刷新后整体替换
         postdata = postdata_template.copy()
         
         req_method = self.req_method_judger.judge(task)
@@ -129,6 +234,7 @@ class ListSpider:
                 postdata = additional_params['index_postdata']
         
         page_filed = self.get_page_filed(task)
+        self.rate_limiters.get(request_params['api_url'], task.get('rate_limit'), self.get_datasource_id(task)) # 按数据源配置初始化该域名的限速器
         statistic = {
             'stop_reason': '',
             'last_fail': -1,
@@ -136,35 +242,114 @@ class ListSpider:
             'last_resp_text': '',
             'total': 0,
             'success': 0,
+            'new_connections': 0, # 新建的TCP/TLS连接数
+            'reused_connections': 0, # 复用已有连接的请求数
+            'rate_limit_wait': 0, # 限速累计等待秒数
         }
 
-        while True:
-            if page_filed['location'] == 'api_url':
-                api_url = api_url.format(cur)
-            elif page_filed['location'] == 'postdata':
-                postdata[page_filed['key']] = postdata_template[page_filed['key']].format(cur)
-            
-            resp = self.single_request(api_url, headers, postdata, req_method, cur, step, statistic, parse_rule_list)
-            
-            if not resp:
-                break
-            else:
-                extractor = ListSpiderExtractorJson(parse_rule_list) # Todo: 列表页一般情况下返回格式（json还是html）都是统一的
-                urls = extractor.extract_url(resp.text)
-                has = self.has_new_detail_url(urls)
-                if not has:
-                    statistic['stop_reason'] = f"无新详情页，最后请求页：{cur}"
+        extractor = get_extractor(parse_rule_list) # 列表页返回格式（json/html）由规则中的type指定
+        shard = task.get('shard') # Master拆分的页码区间分片，见MasterNode.build_task_messages
+        shard_end = shard['end'] if shard else None
+        page_window = task.get('page_window', 1) # 同时请求的页数，大于1时并发预取后续页
+        fetch_pool = ThreadPoolExecutor(max_workers=page_window) if page_window > 1 else None
+        pending = deque() # 按页码顺序排列的预取请求
+        next_page = cur
+        uploads = [] # 本任务提交的后台上传
+        archive = self.open_archive(task) # 数据源配置archive时多页打包压缩为分段对象
+        segment_records = [] # 当前分段中页面的列表页记录
+        detail_keys = set() # 本任务发现的新详情页键，页面全部保存后才记录到去重索引
+        ticket = WriteTicket() # 本任务写入缓冲的列表页记录，全部写入后才确认消息
+
+        try:
+            while True:
+                if shard:
+                    if cur > shard_end:
+                        statistic['stop_reason'] = f"分片结束，最后请求页：{shard_end}"
+                        break
+                    listing_end = self.get_listing_end(shard)
+                    if listing_end is not None and cur > listing_end:
+                        statistic['stop_reason'] = f"列表已在第{listing_end}页结束，取消分片剩余页：{cur}"
+                        break
+                
+                if fetch_pool:
+                    while len(pending) < page_window and (shard_end is None or next_page <= shard_end):
+                        page_url, page_postdata = self.get_page_request(api_url, postdata, postdata_template, page_filed, next_page)
+                        page_statistic = {}
+                        pending.append((page_statistic, fetch_pool.submit(
+                            self.fetch, page_url, headers, page_postdata, req_method, page_statistic, task)))
+                        next_page += step
+                    page_statistic, future = pending.popleft()
+                    fetched = future.result()
+                    self.merge_fetch_statistic(statistic, page_statistic)
+                    resp = self.check_response(fetched, cur, step, statistic)
+                else:
+                    page_url, page_postdata = self.get_page_request(api_url, postdata, postdata_template, page_filed, cur)
+                    resp = self.single_request(page_url, headers, page_postdata, req_method, cur, step, statistic, parse_rule_list)
+                
+                if not resp:
+                    if statistic.get('listing_end'):
+                        # 只有列表确实到头才取消后续分片；连续请求失败可能只是暂时的，不影响其他分片
+                        self.mark_listing_end(shard, cur)
                     break
-                save_info = self.get_save_info(task, resp.text, cur)
-                self.store_to_minio(save_info['filepath'], resp.text) # 一致性：如果save失败，minio中也会有数据
-                save_success = self.save(save_info)
-            
-            cur += step
-            time.sleep(5)
+                else:
+                    resp_text = statistic['last_resp_text'] # check_response已解码的本页内容，requests每次访问text都会重新解码
+                    urls = extractor.extract_url(resp_text) # 解析器内部只解析一次
+                    has = self.has_new_detail_url(urls, task, detail_keys)
+                    if not has:
+                        statistic['stop_reason'] = f"无新详情页，最后请求页：{cur}"
+                        self.mark_listing_end(shard, cur)
+                        break
+                    content = resp_text.encode('utf-8') # 只编码一次，计算md5与上传共用
+                    save_info = self.get_save_info(task, content, cur)
+                    if 'content_hash' in save_info and self.minio_client.is_known_object(self.bucket_name, save_info['filepath']):
+                        # 本进程已上传过相同内容，只保存引用该哈希的记录
+                        statistic['unchanged_pages'] = statistic.get('unchanged_pages', 0) + 1
+                        self.save(save_info, ticket)
+                    elif archive is None:
+                        uploads.append(self.submit_store(save_info, content, statistic, ticket))
+                    else:
+                        # 页面压缩后追加到分段，记录中的filepath为分段对象，archive为字节范围
+                        save_info['archive'] = archive.add(save_info['filepath'], content)
+                        save_info['filepath'] = save_info['archive']['segment']
+                        segment_records.append(save_info)
+                        if archive.is_full:
+                            uploads.append(self.submit_segment(archive, segment_records, statistic, ticket))
+                            segment_records = []
+                
+                cur += step
+        finally:
+            if fetch_pool:
+                # 已到达列表末尾，取消尚未发出的预取请求，已发出的结果直接丢弃
+                for _, future in pending:
+                    future.cancel()
+                fetch_pool.shutdown(wait=False, cancel_futures=True)
+            if segment_records:
+                uploads.append(self.submit_segment(archive, segment_records, statistic, ticket))
+            # 等本任务的页面全部上传后再结束任务（确认消息），进程退出不会丢失已抓取的页面；
+            # 有页面上传失败时任务以失败结束，消息重回队列，这些页面由重新执行的任务再次抓取
+            stored = (not uploads or self.executor.upload_queue.wait(uploads)) and not statistic.get('upload_fail')
+            if not stored:
+                statistic['incomplete'] = f"部分页面上传失败: {statistic.get('upload_fail')}"
+                self.logger.error(f"[{self.executor.executor_id}] {statistic['incomplete']}")
+            # 上传回调中保存的记录此时都已进入写后缓冲，全部写入后再结束任务；
+            # 未全部写入时撤回剩余记录，任务以失败结束，由重新执行的任务重新保存，不会在消息确认后丢失记录
+            self.executor.write_buffer.flush(self.list_collection_name)
+            if not ticket.done:
+                discarded = self.executor.write_buffer.discard(ticket)
+                stored = False
+                statistic['incomplete'] = statistic.get('incomplete') or f"列表页记录写入失败，撤回未写入的 {discarded} 条"
+                self.logger.error(f"[{self.executor.executor_id}] 列表页记录写入失败，撤回未写入的 {discarded} 条，等待重试")
+            # 页面与记录都已保存才记录详情页，否则下一轮重新抓取这些页
+            if stored:
+                self.commit_detail_urls(task, detail_keys)
+            if statistic.get('auth_rejected') and task.get('url'):
+                self.report_auth_rejected(task, statistic['auth_rejected'])
         
+        if statistic.get('incomplete'):
+            raise TaskIncompleteError(statistic['incomplete'])
         return statistic
 
-    def get_save_info(self, task, resp_text: str, cur: int):
+    def get_save_info(self, task, resp_text: typing.Union[str, bytes], cur: int):
         """ 
         输入：任务信息+响应信息
         输出：
@@ -176,7 +361,19 @@ class ListSpider:
         schedule = task['schedule']
         round = schedule['round']
         import hashlib
-        md5 = hashlib.md5(resp_text.encode('utf-8')).hexdigest()
+        content = resp_text.encode('utf-8') if isinstance(resp_text, str) else resp_text
+        if task.get('content_addressed'):
+            # 内容寻址：对象名只由内容哈希决定，各轮次内容未变的页面指向同一对象
+            content_hash = hashlib.sha256(content).hexdigest()
+            return {
+                'jd_config_id': task_id,
+                'round': round,
+                'filepath': f"cas/{content_hash[:2]}/{content_hash}.txt",
+                'content_hash': content_hash,
+                'insert_time': datetime.datetime.now(),
+                'page': cur,
+            }
+        md5 = hashlib.md5(content).hexdigest()
         filepath = f"{datetime.datetime.now().strftime('%Y/%m/%d')}/{round}/{task_id}_{md5}.txt" # 示例：2023/08/25/123456.txt
         return {
             'jd_config_id': task_id,
@@ -186,56 +383,152 @@ class ListSpider:
             'page': cur,
         }
 
+    def report_auth_rejected(self, task: dict, status_code: int):
+        """记录数据源请求被拒（401/403），CookieManager据此优先刷新该数据源的请求头"""
+        self.mongodb_service.update_one(self.datasource_collection_name, {'url': task['url']}, rejected_update(status_code))
+        self.logger.warning(f"[{self.executor.executor_id}] 数据源 {task['url']} 请求被拒（{status_code}），等待刷新请求头")
+
+    def get_listing_end(self, shard: dict):
+        """查询分片所属列表已知的结束页，未结束返回None"""
+        document = self.mongodb_service.find_one(self.listing_end_collection_name, {'_id': shard['listing_id']})
+        return document['end_page'] if document else None
+
+    def mark_listing_end(self, shard: dict, cur: int):
+        """记录列表在第cur页结束，页码更大的分片据此提前停止"""
+        if not shard:
+            return
+        self.mongodb_service.update_one(
+            self.listing_end_collection_name,
+            {'_id': shard['listing_id']},
+            {'$min': {'end_page': cur}, '$setOnInsert': {'created_at': datetime.datetime.now()}},
+            upsert=True
+        )
+        self.logger.info(f"[{self.executor.executor_id}] 列表 {shard['listing_id']} 在第{cur}页结束")
+
+    def get_page_request(self, api_url, postdata, postdata_template, page_filed, cur):
+        """生成第cur页的请求地址与请求体，不修改模板"""
+        if page_filed['location'] == 'api_url':
+            return api_url.format(cur), postdata
+        elif page_filed['location'] == 'postdata':
+            page_postdata = postdata.copy()
+            page_postdata[page_filed['key']] = postdata_template[page_filed['key']].format(cur)
+            return api_url, page_postdata
+        return api_url, postdata
+
     def single_request(self, api_url, headers, postdata, req_method, cur, step, statistic, parse_rule_list):
-        resp = requests.request(req_method, api_url, headers=headers, data=postdata)
+        resp = self.fetch(api_url, headers, postdata, req_method, statistic, getattr(self.current, 'task', None))
+        return self.check_response(resp, cur, step, statistic)
+
+    def fetch(self, api_url, headers, postdata, req_method, statistic, task=None):
+        """经限速后发送请求，请求异常时返回None
+
+        并发预取时在线程池中执行，只累加连接与限速计数，不修改翻页相关的统计。
+        请求被拒（401/403）且传入task时，等待CookieManager刷新请求头后用新请求头重试一次，
+        headers（TaskHeaders）整体替换为新请求头，本任务后续页面都使用新请求头。
+        """
+        if not isinstance(headers, TaskHeaders):
+            headers = TaskHeaders(headers)
+        resp = self.send(api_url, headers.snapshot(), postdata, req_method, statistic)
+        if resp is None or resp.status_code not in AUTH_REJECTED_STATUS or not task or not task.get('url') \
+                or not task.get('cookie_refresh', True):
+            return resp
+        fresh_headers = self.executor.cookie_refresh.refresh(task, resp.status_code)
+        if fresh_headers is None:
+            return resp
+        headers.replace(fresh_headers)
+        if 'request_params' in task:
+            task['request_params']['headers'] = headers.snapshot()
+        statistic['headers_refreshed'] = statistic.get('headers_refreshed', 0) + 1
+        return self.send(api_url, headers.snapshot(), postdata, req_method, statistic)
+
+    def send(self, api_url, headers, postdata, req_method, statistic):
+        """经限速后发送一次请求，请求异常时返回None"""
+        limiter = self.rate_limiters.get(api_url)
+        statistic['rate_limit_wait'] = statistic.get('rate_limit_wait', 0) + limiter.acquire()
+        request_start = time.monotonic()
+        try:
+            # 通过Executor共享的会话池请求，同一host的翻页请求复用连接
+            resp = self.executor.http_pool.request(req_method, api_url, statistic=statistic, headers=headers, data=postdata)
+        except requests.RequestException as e:
+            self.logger.error(f"[{self.executor.executor_id}] 请求失败: {api_url} {str(e)}")
+            resp = None
+        if resp is None:
+            limiter.feedback(None, time.monotonic() - request_start)
+        else:
+            limiter.feedback(resp.status_code, time.monotonic() - request_start, parse_retry_after(resp.headers.get('Retry-After')))
+        return resp
+
+    def merge_fetch_statistic(self, statistic, page_statistic):
+        for key in ('new_connections', 'reused_connections', 'rate_limit_wait', 'headers_refreshed'):
+            statistic[key] = statistic.get(key, 0) + page_statistic.get(key, 0)
+
+    def check_response(self, resp, cur, step, statistic):
+        """按页码顺序判断响应，更新统计并决定是否继续翻页
+
+        成功响应的解码内容保存在statistic['last_resp_text']，用于下一页的重复判断，调用方直接复用，不再访问resp.text。
+        重复页说明列表已到头，记入statistic['listing_end']；连续请求失败只停止本任务翻页。
+        """
         statistic['total'] = statistic.get('total', 0) + 1
         last_fail = statistic.get('last_fail')
         last_resp_text = statistic.get('last_resp_text')
         
-        if resp.status_code == 200:
+        if resp is not None and resp.status_code == 200:
             statistic['success'] = statistic.get('success', 0) + 1
-            if resp.text == last_resp_text:
+            resp_text = resp.text
+            if resp_text == last_resp_text:
                 statistic['stop_reason'] = f"重复页响应内容，最后成功页：{cur}"
+                statistic['listing_end'] = cur
                 return None
             else:
-                statistic['last_resp_text'] = resp.text
+                statistic['last_resp_text'] = resp_text
                 # urls = self.get_urls(resp, parse_rule_list)
                 return resp
         else:
+            if resp is not None and resp.status_code in AUTH_REJECTED_STATUS:
+                statistic['auth_rejected'] = resp.status_code # 请求头/cookie可能已失效
             statistic['fail'].append(cur)
             statistic['last_fail'] = cur
             if last_fail + step == cur: # 有连续页面请求失败
                 statistic['stop_reason'] = f"连续页请求失败，最后失败页：{cur}"
                 return None
             
-    def has_new_detail_url(self, urls: list):
-        return True
+    def has_new_detail_url(self, urls: list, task: dict = None, pending: set = None) -> bool:
+        """判断一页中是否有此前未见过的详情页（只读，不记录）
+        
+        数据源配置dedup为False时不去重，始终继续翻页。
+        新详情页键加入pending，任务的页面全部保存成功后由commit_detail_urls记录到去重索引。
+        
+        Args:
+            urls: extract_url提取的列表项
+            task: 数据源配置
+            pending: 本任务已发现、尚未记录的详情页键
+            
+        Returns:
+            bool: 是否有新详情页
+        """
+        if task is None or not task.get('dedup', True):
+            return True
+        datasource_id = self.get_datasource_id(task)
+        keys = [self.detail_url_index.get_key(item) for item in urls]
+        new_keys = self.detail_url_index.filter_new(datasource_id, keys)
+        if pending is not None:
+            new_keys = [key for key in new_keys if key not in pending] # 本任务前面的页已出现过
+            pending.update(new_keys)
+        self.logger.debug(f"[{self.executor.executor_id}] 数据源 {datasource_id} 本页新详情页 {len(new_keys)}/{len(keys)}")
+        return len(new_keys) > 0
+
+    def commit_detail_urls(self, task: dict, keys: set) -> bool:
+        """页面与记录全部保存后，记录本任务发现的详情页键"""
+        if not keys or not task.get('dedup', True):
+            return True
+        return self.detail_url_index.commit(self.get_datasource_id(task), list(keys))
+
+    @staticmethod
+    def get_datasource_id(task: dict) -> str:
+        return str(task.get('_id', task.get('id', '')))
     
     def get_urls(self, resp, parse_rule_list) -> list:
-        resp_json = json.loads(resp.text)
-        list_items_rule = parse_rule_list['list_data']
-        path = list_items_rule.split('.')
-        list_items: list = resp_json
-        for p in path:
-            list_items = list_items.get(p)
-        
-        url_rule = parse_rule_list['url_rule']
-        url_path, params, postdata_rule = url_rule['url_path'], url_rule['params'], url_rule['postdata']
-        for item in list_items:
-            target_url = url_path
-            if postdata_rule == {}: # detail为get请求
-                target_url += '?'
-                for list_data_key, url_key in params.items():
-                    target_url += f"{url_key}={item.get(list_data_key)}&" # TODO: 是否要考虑参数在目标URL的位置
-                target_url = target_url[:-1] # 去掉最后一个&
-                item['url'] = target_url
-            else: # detail为post请求
-                target_postdata = {}
-                for list_data_key, url_key in postdata_rule.items():
-                    target_postdata[url_key] = item.get(list_data_key)
-                # TODO: 补充额外字段
-                item['url'] = target_postdata
-        print(list_items)
+        return get_extractor(parse_rule_list).extract_url(resp.text)
 
     def get_page_filed(self, task):
         api_url = task['request_params']['api_url']
@@ -253,6 +546,64 @@ class ListSpider:
                     'key': k
                 }
         
+    def submit_store(self, save_info: dict, content: bytes, statistic: dict, ticket: WriteTicket = None):
+        """提交页面到后台上传队列，上传成功后再保存列表页记录，保证记录指向的对象已存在
+        
+        Args:
+            save_info: get_save_info生成的记录
+            content: 已编码的页面内容
+            statistic: 任务统计，上传失败的页码记入upload_fail
+            ticket: 本任务的写入情况
+            
+        Returns:
+            Future: 上传结果
+        """
+        def on_uploaded(success: bool):
+            if success:
+                self.save(save_info, ticket)
+            else:
+                statistic.setdefault('upload_fail', []).append(save_info['page'])
+        return self.executor.upload_queue.submit(
+            self.bucket_name, save_info['filepath'], content, callback=on_uploaded, statistic=statistic,
+            skip_if_exists='content_hash' in save_info)
+
+    def open_archive(self, task: dict) -> typing.Optional[PageArchiveWriter]:
+        """按数据源配置archive创建页面归档写入器，未配置时返回None（每页一个对象）
+        
+        配置示例：{"codec": "gzip", "segment_size": 67108864}。与content_addressed同时配置时按内容寻址逐页存储
+        """
+        options = task.get('archive')
+        if not options or task.get('content_addressed'):
+            return None
+        task_id = task.get('_id', str(uuid.uuid4()))
+        prefix = f"{datetime.datetime.now().strftime('%Y/%m/%d')}/{task['schedule']['round']}/{task_id}"
+        if task.get('shard'):
+            prefix = f"{prefix}_{task['shard']['index']}"
+        return self.minio_client.archive_writer(
+            self.bucket_name, prefix, options.get('codec', 'gzip'), options.get('segment_size', DEFAULT_SEGMENT_SIZE))
+
+    def submit_segment(self, archive: PageArchiveWriter, records: list, statistic: dict, ticket: WriteTicket = None):
+        """封存当前分段并提交到后台上传队列，上传成功后再保存分段内各页的列表页记录
+        
+        Args:
+            archive: 页面归档写入器
+            records: 分段内页面的列表页记录
+            statistic: 任务统计，上传失败的页码记入upload_fail
+            ticket: 本任务的写入情况
+            
+        Returns:
+            Future: 上传结果
+        """
+        name, payload = archive.seal()
+        def on_uploaded(success: bool):
+            if success:
+                for save_info in records:
+                    self.save(save_info, ticket)
+            else:
+                statistic.setdefault('upload_fail', []).extend(save_info['page'] for save_info in records)
+        return self.executor.upload_queue.submit(
+            self.bucket_name, name, payload, 'application/octet-stream', callback=on_uploaded, statistic=statistic)
+
     def store_to_minio(self, object_name: str, content: str) -> bool:
         """将内容存储到MinIO
         
@@ -268,15 +619,17 @@ class ListSpider:
         self.logger.info(f"存储到MinIO成功: {object_name} {success}")
         return success
 
-    def save(self, save_info: dict) -> bool:
+    def save(self, save_info: dict, ticket: WriteTicket = None) -> bool:
         """将列表页路径保存到MongoDB
         
+        记录先进入Executor共享的写后缓冲，按批量大小或时间间隔批量写入，任务结束时写入剩余记录
+        
         Args:
             filepath: 列表页路径
+            ticket: 本任务的写入情况，任务结束时据此判断记录是否全部写入
             
         Returns:
             bool: 是否成功保存
         """
-        collection = self.mongodb_service.get_collection(self.list_collection_name)
-        result = collection.insert_one(save_info)
-        return result.acknowledged
+        self.executor.write_buffer.add(self.list_collection_name, save_info, ticket)
+        return True
@@ -0,0 +1,325 @@
+import functools
+import hashlib
+import json
+import re
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urljoin
+
+# 解析规则编译器
+#
+# 字段规则（字符串）支持以下写法：
+#   result.list              点分路径（原有写法），逐级取字典键
+#   $.result.list[0].code    JSONPath子集：.key、['key']、[n]、[*]、.*
+#   css:div.job a::attr(href) CSS选择器，支持::text与::attr(name)，作用于lxml元素
+#   xpath://div[@class="job"] XPath表达式，作用于lxml元素
+# 同一规则只编译一次：字符串规则按规则本身缓存，列表页规则按规则内容的哈希缓存。
+
+Getter = Callable[[Any], Any]
+
+CSS_PREFIX = 'css:'
+XPATH_PREFIX = 'xpath:'
+
+_JSONPATH_TOKEN = re.compile(r"\.\*|\[\*\]|\.([^.\[\]]+)|\[(-?\d+)\]|\[['\"](.+?)['\"]\]")
+_CSS_PSEUDO = re.compile(r"::(text|attr\(([^)]+)\))\s*$")
+_WILDCARD = object()
+
+
+def rule_hash(rule: Any) -> str:
+    """计算规则内容的哈希，键顺序不同的同一规则哈希相同"""
+    return hashlib.sha1(json.dumps(rule, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+def _parse_json_path(rule: str) -> List[Tuple[str, Any]]:
+    """将JSONPath/点分路径拆分为(类型, 键)步骤"""
+    if not rule.startswith('$'):
+        return [('key', key) for key in rule.split('.')]
+    steps, pos = [], 1
+    while pos < len(rule):
+        match = _JSONPATH_TOKEN.match(rule, pos)
+        if match is None:
+            raise ValueError(f"无法解析的JSONPath: {rule}，位置 {pos}")
+        name, index, quoted = match.groups()
+        if name is not None:
+            steps.append(('key', name))
+        elif quoted is not None:
+            steps.append(('key', quoted))
+        elif index is not None:
+            steps.append(('index', int(index)))
+        else:
+            steps.append(('wildcard', _WILDCARD))
+        pos = match.end()
+    return steps
+
+
+def _compile_steps(steps: List[Tuple[str, Any]]) -> Getter:
+    """将路径步骤编译为取值函数，遇到[*]时对每个元素应用剩余步骤并返回列表"""
+    for i, (kind, _) in enumerate(steps):
+        if kind == 'wildcard':
+            head, rest = _compile_steps(steps[:i]), _compile_steps(steps[i + 1:])
+
+            def fan_out(data):
+                values = head(data)
+                if isinstance(values, dict):
+                    values = values.values()
+                elif not isinstance(values, list):
+                    return []
+                return [rest(value) for value in values]
+            return fan_out
+
+    if not steps:
+        return lambda data: data
+    if len(steps) == 1 and steps[0][0] == 'key':
+        # 最常见的情况：列表项中的单个字段
+        key = steps[0][1]
+        return lambda data: data.get(key) if isinstance(data, dict) else None
+
+    steps = tuple(steps)
+
+    def getter(data):
+        for kind, key in steps:
+            if kind == 'key':
+                if not isinstance(data, dict):
+                    return None
+                data = data.get(key)
+            else:
+                if not isinstance(data, list) or not -len(data) <= key < len(data):
+                    return None
+                data = data[key]
+        return data
+    return getter
+
+
+def _is_path(rule: str) -> bool:
+    return '.' in rule or rule.startswith('$') or rule.startswith(CSS_PREFIX) or rule.startswith(XPATH_PREFIX)
+
+
+def _compile_css(selector: str) -> str:
+    """将CSS选择器转为XPath，::text与::attr(name)转为对应的XPath步骤"""
+    from cssselect import HTMLTranslator
+
+    match = _CSS_PSEUDO.search(selector)
+    suffix = ''
+    if match:
+        suffix = '/text()' if match.group(1) == 'text' else f"/@{match.group(2).strip()}"
+        selector = selector[:match.start()]
+    return HTMLTranslator().css_to_xpath(selector, prefix='descendant-or-self::') + suffix
+
+
+@functools.lru_cache(maxsize=1024)
+def compile_rule(rule: str) -> Getter:
+    """编译单条规则，返回取值函数
+
+    JSON规则返回路径上的值（含[*]时为列表），CSS/XPath规则返回匹配结果列表（元素或字符串）
+
+    Args:
+        rule: 字段规则
+
+    Returns:
+        Getter: 取值函数
+    """
+    if rule.startswith(CSS_PREFIX) or rule.startswith(XPATH_PREFIX):
+        from lxml import etree
+
+        if rule.startswith(CSS_PREFIX):
+            expression = _compile_css(rule[len(CSS_PREFIX):].strip())
+        else:
+            expression = rule[len(XPATH_PREFIX):].strip()
+        return etree.XPath(expression, smart_strings=False) # 不需要getparent()，省去智能字符串的开销
+    return _compile_steps(_parse_json_path(rule))
+
+
+_SIMPLE_CSS = re.compile(r"^(?:[A-Za-z][\w-]*|\*)?(?:[.#][\w-]+|\[[^\]]+\])*$")
+_SIMPLE_XPATH = re.compile(r"^//([A-Za-z][\w-]*|\*)(\[.*\])?$")
+
+
+def compile_item_matcher(rule: str) -> Optional[Tuple[Optional[str], Callable]]:
+    """为流式解析编译列表项匹配器
+
+    只有不含层级关系的选择器（如css:li.job、xpath://div[@class="job"]）可以在元素解析完成时
+    直接判断，其余规则返回None，只能整棵树解析后再选择
+
+    Args:
+        rule: list_data规则
+
+    Returns:
+        Optional[Tuple]: (标签名或None, 判断元素自身是否匹配的XPath)
+    """
+    from lxml import etree
+
+    if rule.startswith(CSS_PREFIX):
+        selector = rule[len(CSS_PREFIX):].strip()
+        if '::' in selector or not _SIMPLE_CSS.match(selector):
+            return None
+        from cssselect import HTMLTranslator
+        tag = selector.split('.', 1)[0].split('#', 1)[0].split('[', 1)[0]
+        return (tag if tag and tag != '*' else None), etree.XPath(HTMLTranslator().css_to_xpath(selector, prefix='self::'))
+    if rule.startswith(XPATH_PREFIX):
+        match = _SIMPLE_XPATH.match(rule[len(XPATH_PREFIX):].strip())
+        if match is None:
+            return None
+        tag = match.group(1)
+        return (tag if tag != '*' else None), etree.XPath(f"self::{tag}{match.group(2) or ''}")
+    return None
+
+
+def _first_text(matches) -> Optional[str]:
+    if not isinstance(matches, list):
+        return matches
+    if not matches:
+        return None
+    first = matches[0]
+    if isinstance(first, str):
+        return first.strip()
+    return first.text_content().strip() if hasattr(first, 'text_content') else ''.join(first.itertext()).strip()
+
+
+@functools.lru_cache(maxsize=1024)
+def compile_field(rule: str) -> Getter:
+    """编译字段规则，返回取单个字段值的函数
+
+    与compile_rule相同，但CSS/XPath规则只取第一个匹配的文本
+
+    Args:
+        rule: 字段规则
+
+    Returns:
+        Getter: 取值函数
+    """
+    getter = compile_rule(rule)
+    if rule.startswith(CSS_PREFIX) or rule.startswith(XPATH_PREFIX):
+        return lambda element: _first_text(getter(element))
+    return getter
+
+
+def compile_fields(rules: Dict[str, str]) -> Callable[[Any], Dict[str, Any]]:
+    """编译一组字段规则，用于详情页等需要提取多个字段的场景
+
+    Args:
+        rules: {字段名: 字段规则}
+
+    Returns:
+        Callable: 输入已解析的文档，返回{字段名: 字段值}
+    """
+    getters = tuple((name, compile_field(rule)) for name, rule in rules.items())
+    return lambda document: {name: getter(document) for name, getter in getters}
+
+
+class CompiledListRule:
+    """编译后的列表页解析规则
+
+    list_data编译为取列表的函数；url_rule编译为URL模板（GET）或请求体键对（POST），
+    每个列表项只需一次format或一次字典推导，不再逐个参数拼接字符串；
+    可选的fields规则编译后写入列表项。
+    """
+
+    def __init__(self, parse_rule_list: dict):
+        """编译列表页规则
+
+        Args:
+            parse_rule_list: task['parse_rule']['list_page']
+        """
+        self.list_data = compile_rule(parse_rule_list['list_data'])
+        url_rule = parse_rule_list['url_rule']
+        self.url_path = url_rule['url_path']
+        # 可选的link规则：直接取列表项中的详情页链接（HTML列表常见），相对链接按url_path补全
+        self.link = compile_field(url_rule['link']) if url_rule.get('link') else None
+        # 常见的相对链接（detail/1、detail?id=1）直接拼接到url_path所在目录，省去每项一次urljoin
+        self.link_base = self.url_path[:self.url_path.rfind('/') + 1] \
+            if '?' not in self.url_path and '#' not in self.url_path and '/' in self.url_path.partition('://')[2] else None
+        params, postdata = url_rule.get('params', {}), url_rule.get('postdata', {})
+        self.url_getters = tuple(compile_field(key) for key in params)
+        # 参数全部为列表项的顶层键时直接item.get，省去逐个调用取值函数
+        self.url_keys = None if any(_is_path(key) for key in params) else tuple(params)
+        self.postdata = tuple((compile_field(key), url_key) for key, url_key in postdata.items())
+        self.fields = tuple((name, compile_field(rule)) for name, rule in parse_rule_list.get('fields', {}).items())
+        if params:
+            escape = lambda s: str(s).replace('{', '{{').replace('}', '}}')
+            query = '&'.join(f"{escape(url_key)}={{}}" for url_key in params.values())
+            self.url_template = f"{escape(self.url_path)}?{query}"
+        else:
+            self.url_template = None
+
+    def apply(self, list_items: Optional[list]) -> list:
+        """为每个列表项写入url与fields字段
+
+        Args:
+            list_items: list_data提取的列表项
+
+        Returns:
+            list: 原列表项，list_data未匹配时为空列表
+        """
+        if not list_items:
+            return []
+        url_getters, postdata, fields = self.url_getters, self.postdata, self.fields
+        if self.link is not None:
+            for item in list_items:
+                item['url'] = self.build_url(item)
+        elif postdata: # detail为post请求
+            for item in list_items:
+                item['url'] = {url_key: getter(item) for getter, url_key in postdata}
+        elif self.url_template is not None:
+            template = self.url_template.format
+            if self.url_keys is not None:
+                url_keys = self.url_keys
+                for item in list_items:
+                    get = item.get
+                    item['url'] = template(*[get(key) for key in url_keys])
+            else:
+                for item in list_items:
+                    item['url'] = template(*[getter(item) for getter in url_getters])
+        else:
+            for item in list_items:
+                item['url'] = self.url_path
+        if fields:
+            for item in list_items:
+                for name, getter in fields:
+                    item[name] = getter(item)
+        return list_items
+
+
+    def build_url(self, source: Any):
+        """从单个列表项（字典或lxml元素）生成详情页URL或POST请求体"""
+        if self.link is not None:
+            link = self.link(source)
+            if not link:
+                return None
+            if link.startswith(('http://', 'https://')):
+                return link
+            if self.link_base is not None and not link.startswith(('/', '.', '?', '#')) \
+                    and ':' not in link.split('/', 1)[0]:
+                return self.link_base + link
+            return urljoin(self.url_path, link)
+        if self.postdata:
+            return {url_key: getter(source) for getter, url_key in self.postdata}
+        if self.url_template is not None:
+            return self.url_template.format(*[getter(source) for getter in self.url_getters])
+        return self.url_path
+
+    def to_item(self, element: Any) -> dict:
+        """将HTML列表项元素转换为字典：fields规则提取的字段加上url"""
+        item = {name: getter(element) for name, getter in self.fields}
+        item['url'] = self.build_url(element)
+        return item
+
+
+_list_rules: Dict[str, CompiledListRule] = {}
+_list_rules_lock = threading.Lock()
+
+
+def compile_list_rule(parse_rule_list: dict) -> CompiledListRule:
+    """按规则哈希获取编译后的列表页规则，同一数据源的任务共用
+
+    Args:
+        parse_rule_list: task['parse_rule']['list_page']
+
+    Returns:
+        CompiledListRule: 编译后的规则
+    """
+    key = rule_hash(parse_rule_list)
+    compiled = _list_rules.get(key)
+    if compiled is None:
+        compiled = CompiledListRule(parse_rule_list)
+        with _list_rules_lock:
+            compiled = _list_rules.setdefault(key, compiled)
+    return compiled
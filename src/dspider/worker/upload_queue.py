@@ -0,0 +1,111 @@
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Callable, Iterable, Optional, Set, Union
+
+from dspider.common.minio_service import MinIOService
+
+logger = logging.getLogger(__name__)
+
+
+class UploadQueue:
+    """MinIO后台上传队列
+
+    翻页线程只负责提交，上传由线程池完成，抓取不再等待对象存储的响应。
+    队列有界：待上传数达到max_pending时submit阻塞，避免上传跟不上时内存无限增长。
+    Executor内所有任务共享同一个UploadQueue。
+    """
+
+    def __init__(self, minio_client: MinIOService, workers: int = 4, max_pending: int = 100):
+        """初始化上传队列
+
+        Args:
+            minio_client: MinIO服务
+            workers: 上传线程数
+            max_pending: 最多排队（含正在上传）的对象数
+        """
+        self.minio_client = minio_client
+        self.workers = workers
+        self.max_pending = max_pending
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='minio-upload')
+        self.slots = threading.BoundedSemaphore(max_pending)
+        self.pending: Set[Future] = set()
+        self.lock = threading.Lock()
+
+    def submit(self, bucket_name: str, object_name: str, data: Union[str, bytes],
+               content_type: str = 'text/plain', callback: Optional[Callable[[bool], None]] = None,
+               statistic: Optional[dict] = None, skip_if_exists: bool = False) -> Future:
+        """提交上传，队列已满时阻塞直到有空位
+
+        Args:
+            bucket_name: 存储桶名称
+            object_name: 对象名称
+            data: 上传内容，str按UTF-8编码一次
+            content_type: 内容类型
+            callback: 上传完成后在上传线程中调用，参数为是否成功
+            statistic: 累加upload_wait（因队列已满等待的秒数）
+            skip_if_exists: 对象已存在时不再上传（内容寻址的对象）
+
+        Returns:
+            Future: 结果为是否成功
+        """
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        wait_start = time.monotonic()
+        self.slots.acquire()
+        if statistic is not None:
+            statistic['upload_wait'] = statistic.get('upload_wait', 0) + time.monotonic() - wait_start
+        try:
+            future = self.pool.submit(self._upload, bucket_name, object_name, data, content_type, callback, skip_if_exists)
+        except BaseException:
+            self.slots.release()
+            raise
+        with self.lock:
+            self.pending.add(future)
+        future.add_done_callback(self._done)
+        return future
+
+    def _upload(self, bucket_name: str, object_name: str, data: bytes, content_type: str,
+                callback: Optional[Callable[[bool], None]], skip_if_exists: bool) -> bool:
+        if skip_if_exists:
+            success = self.minio_client.upload_bytes_if_absent(bucket_name, object_name, data, content_type)
+        else:
+            success = self.minio_client.upload_bytes(bucket_name, object_name, data, content_type)
+        if not success:
+            logger.error(f"后台上传失败: {bucket_name}/{object_name}")
+        if callback is not None:
+            callback(success)
+        return success
+
+    def _done(self, future: Future):
+        with self.lock:
+            self.pending.discard(future)
+        self.slots.release()
+        if not future.cancelled() and future.exception() is not None:
+            logger.error(f"后台上传出错: {future.exception()}")
+
+    def wait(self, futures: Iterable[Future], timeout: Optional[float] = None) -> bool:
+        """等待指定的上传完成
+
+        Args:
+            futures: submit返回的Future
+            timeout: 超时（秒）
+
+        Returns:
+            bool: 是否全部上传成功
+        """
+        futures = list(futures)
+        done, not_done = wait(futures, timeout)
+        return not not_done and all(not f.cancelled() and f.exception() is None and f.result() for f in done)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """等待当前所有待上传对象完成"""
+        with self.lock:
+            futures = list(self.pending)
+        return self.wait(futures, timeout)
+
+    def close(self):
+        """上传完剩余对象后关闭线程池"""
+        self.flush()
+        self.pool.shutdown(wait=True)
@@ -1,20 +1,28 @@
 import os
 import time
+import asyncio
 import logging
 import requests
 from typing import Dict, Any, Optional
 import uuid
 import json
 import importlib
+import threading
 from threading import Thread
 from concurrent.futures import ThreadPoolExecutor
 
+import aiohttp
 import requests
 
 from dspider.common.datasource_manager import DataSourceManager, data_source_type
 from dspider.common.logger_config import LoggerConfig
 from dspider.common.load_config import config
 from dspider.worker.spider.list_spider import ListSpider
+from dspider.worker.http_session_pool import HttpSessionPool
+from dspider.worker.upload_queue import UploadQueue
+from dspider.worker.cookie_refresh import CookieRefreshClient
+from dspider.worker.write_behind import WriteBehindBuffer
+from dspider.worker.rate_limiter import rate_limiter_registry
 
 # 配置日志系统
 logging_config = {
@@ -353,9 +361,32 @@ class Executor:
         self.rabbitmq_client = data_source_manager.get_data_source_with_config(data_source_type.RABBITMQ.value)
         self.queue_name = self.spider_config['queue_name']
         self.prefetch_count = self.spider_config['prefetch_count']
+        self.concurrency = self.spider_config.get('concurrency', 1) # 单个Executor内并发处理的任务数
+        self.message_timeout = self.spider_config.get('message_timeout') # 单个任务处理超时（秒）
+        self.http_pool = HttpSessionPool(
+            pool_maxsize=self.spider_config.get('http_pool_maxsize', max(10, self.concurrency)), # 每个host的连接池大小
+            timeout=(self.spider_config.get('http_connect_timeout', 5), self.spider_config.get('http_timeout', 30))
+        )
+        # 限速器状态只在进程内共享，同一主机上多个Worker进程访问同一批域名时按进程数均分速率
+        rate_limiter_registry.set_processes(self.spider_config.get('processes_per_host', 1))
         
         self.mongodb_service = data_source_manager.get_data_source_with_config(data_source_type.MONGODB.value)
         self.minio_client = data_source_manager.get_data_source_with_config(data_source_type.MINIO.value)
+        self.upload_queue = UploadQueue(
+            self.minio_client,
+            workers=self.spider_config.get('upload_workers', 4), # 后台上传线程数
+            max_pending=self.spider_config.get('upload_queue_size', 100) # 排队上限，满时翻页等待
+        )
+        self.write_buffer = WriteBehindBuffer(
+            self.mongodb_service,
+            batch_size=self.spider_config.get('write_batch_size', 500), # 单个集合累积该数量时立即写入
+            flush_interval=self.spider_config.get('write_flush_interval', 1.0) # 按时间写入的间隔（秒）
+        )
+        self.cookie_refresh = CookieRefreshClient(
+            self.mongodb_service,
+            self.task_config['datasource'].get('datasource_config', 'recruitment_datasource_config'),
+            wait_timeout=self.spider_config.get('cookie_refresh_timeout', 60) # 请求被拒后等待新请求头的时间（秒）
+        )
         
         self.logger = logging.getLogger(f"Executor-{self.executor_id}")
         self.logger.info(f"[{self.executor_id}] 初始化Executor for spider {self.spider_name}")
@@ -371,9 +402,24 @@ class Executor:
                 break
         else:
             raise ImportError(f"Spider {self.spider_name} not found in any module")
+        # 并发处理任务时每个消费线程使用自己的爬虫实例，见get_spider
+        self.local = threading.local()
+        self.local.spider = self.spider
         
         self.executor_id = str(uuid.uuid4())[:8]
     
+    def get_spider(self):
+        """获取当前线程的爬虫实例，不存在时创建
+
+        爬虫实例之间不共享任务状态；详情页去重索引的内存过滤器按数据源缓存，各实例共用同一个索引。
+        """
+        spider = getattr(self.local, 'spider', None)
+        if spider is None:
+            spider = self.local.spider = self.spider_class(self)
+            if hasattr(self.spider, 'detail_url_index'):
+                spider.detail_url_index = self.spider.detail_url_index
+        return spider
+    
     def run(self):
         self.logger.info(f"[{self.executor_id}] Worker节点开始运行")
         try:
@@ -381,7 +427,9 @@ class Executor:
                 self.queue_name,
                 callback=self.process_task,
                 auto_ack=False,
-                prefetch_count=self.prefetch_count
+                prefetch_count=self.prefetch_count,
+                concurrency=self.concurrency,
+                message_timeout=self.message_timeout
             )
         except KeyboardInterrupt:
             self.logger.info(f"[{self.executor_id}] 用户中断，停止Executor")
@@ -389,6 +437,10 @@ class Executor:
         except Exception as e:
             self.logger.error(f"[{self.executor_id}] 运行时错误: {str(e)}")
             raise
+        finally:
+            self.http_pool.close()
+            self.upload_queue.close()
+            self.write_buffer.close() # 上传回调会写入记录，在上传队列之后关闭
     
     def process_task(self, task: Dict[str, Any], properties: Dict[str, Any]) -> bool:
         """处理单个任务
@@ -402,7 +454,97 @@ class Executor:
         """
         self.logger.info(f"[{self.executor_id}] 收到任务: {task.get('_id', 'unknown')}")
         try:
-            self.spider.start(task)
+            self.get_spider().start(task)
+        except Exception as e:
+            self.logger.error(f"[{self.executor_id}] 处理任务时出错: {str(e)}")
+            return False
+        else:
+            return True
+
+class AsyncExecutor:
+    """基于asyncio的Executor
+    
+    通过AsyncRabbitMQClient消费任务，prefetch_count即单进程内同时运行的任务数，
+    所有任务在同一个事件循环中运行，共享一个aiohttp连接池。
+    spider_config中的spider_name对应的异步实现为Async前缀的同名类，如ListSpider -> AsyncListSpider。
+    """
+    def __init__(self, spider_name: str, task_config):
+        self.executor_id = str(uuid.uuid4())[:8]
+        self.task_config = task_config
+        self.spider_name = spider_name
+        self.spider_config = self.task_config['spider'][spider_name]
+        
+        data_source_manager = DataSourceManager()
+        self.rabbitmq_client = data_source_manager.get_data_source_with_config(
+            data_source_type.ASYNC_RABBITMQ.value, data_source_type.RABBITMQ.value)
+        self.queue_name = self.spider_config['queue_name']
+        self.concurrency = self.spider_config.get('concurrency', 100) # 单个事件循环内并发运行的任务数
+        self.http_limit = self.spider_config.get('http_limit', 1000) # 连接池总连接数
+        self.http_timeout = self.spider_config.get('http_timeout', 30) # 单次请求超时（秒）
+        rate_limiter_registry.set_processes(self.spider_config.get('processes_per_host', 1)) # 同一主机上的Worker进程数，限速按其均分
+        
+        self.mongodb_service = data_source_manager.get_data_source_with_config(
+            data_source_type.ASYNC_MONGODB.value, data_source_type.MONGODB.value)
+        self.minio_client = data_source_manager.get_data_source_with_config(data_source_type.MINIO.value)
+        self.http_session: Optional[aiohttp.ClientSession] = None
+        self.stop_event: Optional[asyncio.Event] = None
+        
+        self.logger = logging.getLogger(f"AsyncExecutor-{self.executor_id}")
+        self.logger.info(f"[{self.executor_id}] 初始化AsyncExecutor for spider {self.spider_name}")
+        
+        async_spider_name = f"Async{self.spider_name}"
+        for mod in walk_modules('dspider.worker.spider'):
+            if hasattr(mod, async_spider_name):
+                self.spider_class = getattr(mod, async_spider_name)
+                self.spider = self.spider_class(self)
+                break
+        else:
+            raise ImportError(f"Spider {async_spider_name} not found in any module")
+    
+    async def run(self):
+        self.logger.info(f"[{self.executor_id}] AsyncExecutor开始运行, 并发数: {self.concurrency}")
+        if not await self.rabbitmq_client.connect():
+            raise ConnectionError("RabbitMQ连接失败")
+        if not await self.mongodb_service.connect():
+            raise ConnectionError("MongoDB连接失败")
+        
+        self.stop_event = asyncio.Event()
+        self.http_session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.http_limit),
+            timeout=aiohttp.ClientTimeout(total=self.http_timeout),
+        )
+        try:
+            await self.rabbitmq_client.consume_messages(
+                self.queue_name,
+                callback=self.process_task,
+                auto_ack=False,
+                prefetch_count=self.concurrency
+            )
+            await self.stop_event.wait()
+        finally:
+            await self.http_session.close()
+            await self.rabbitmq_client.disconnect()
+            await self.mongodb_service.disconnect()
+            self.logger.info(f"[{self.executor_id}] AsyncExecutor已停止")
+    
+    def stop(self):
+        """停止消费，run()在清理资源后返回"""
+        if self.stop_event is not None:
+            self.stop_event.set()
+    
+    async def process_task(self, task: Dict[str, Any], properties: Dict[str, Any]) -> bool:
+        """处理单个任务
+        
+        Args:
+            task: 任务数据
+            properties: 消息属性
+            
+        Returns:
+            bool: 是否成功处理
+        """
+        self.logger.info(f"[{self.executor_id}] 收到任务: {task.get('_id', 'unknown')}")
+        try:
+            await self.spider.start(task)
         except Exception as e:
             self.logger.error(f"[{self.executor_id}] 处理任务时出错: {str(e)}")
             return False
@@ -460,6 +602,10 @@ class WorkerNode:
     
     def init_executor(self, spider_name: str, task_config):
         self.logger.info(f"[{self.worker_id}] 初始化Executor for spider {spider_name}")
+        if task_config['spider'][spider_name].get('mode') == 'async':
+            self.executor = AsyncExecutor(spider_name, task_config)
+            asyncio.run(self.executor.run())
+            return
         self.executor = Executor(spider_name, task_config)
         self.executor.run()
 
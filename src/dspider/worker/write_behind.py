@@ -0,0 +1,211 @@
+import logging
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+from dspider.common.mongodb_service import MongoDBService
+
+logger = logging.getLogger(__name__)
+
+
+class WriteTicket:
+    """一个任务写入缓冲的文档的写入情况
+
+    任务结束前flush并检查done，文档全部写入后才确认消息；
+    未全部写入时通过WriteBehindBuffer.discard撤回剩余文档，由重新执行的任务重新写入。
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = 0 # 已加入缓冲、尚未写入的文档数
+        self.failed = 0 # 被丢弃或撤回的文档数
+
+    @property
+    def done(self) -> bool:
+        """文档是否全部写入"""
+        with self.lock:
+            return self.pending == 0 and self.failed == 0
+
+    def _settle(self, written: int = 0, failed: int = 0):
+        with self.lock:
+            self.pending -= written + failed
+            self.failed += failed
+
+
+class WriteBehindBuffer:
+    """MongoDB写后缓冲
+
+    按集合累积文档，达到batch_size或距上次写入超过flush_interval秒时以无序insert_many批量写入，
+    后台线程负责按时间写入，达到批量大小时由添加文档的线程直接写入。
+    写入失败的文档放回缓冲等待下次重试，积压超过max_pending条时丢弃最早的文档并记录错误。
+    文档可关联任务的WriteTicket，被丢弃时记入ticket，任务据此以失败结束而不是确认消息。
+    Executor内所有任务共享同一个WriteBehindBuffer。
+    """
+
+    def __init__(self, mongodb_service: MongoDBService, batch_size: int = 500, flush_interval: float = 1.0,
+                 max_pending: Optional[int] = None):
+        """初始化写后缓冲
+
+        Args:
+            mongodb_service: MongoDB服务
+            batch_size: 单个集合累积到该数量时立即写入
+            flush_interval: 后台线程写入间隔（秒）
+            max_pending: 单个集合最多积压的文档数，默认batch_size的10倍
+        """
+        self.mongodb_service = mongodb_service
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending or batch_size * 10
+        self.buffers: Dict[str, List[Tuple[Dict[str, Any], Optional[WriteTicket]]]] = defaultdict(list)
+        self.lock = threading.Lock()
+        self.flush_locks: Dict[str, threading.Lock] = defaultdict(threading.Lock) # 同一集合的批次依次写入
+        self.stats_lock = threading.Lock()
+        self.batches = 0
+        self.documents = 0
+        self.failed_batches = 0
+        self.dropped = 0
+        self.max_batch_size = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+        self.last_latency = 0.0
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+        self.thread.start()
+
+    def add(self, collection_name: str, document: Dict[str, Any], ticket: Optional[WriteTicket] = None):
+        """添加待写入的文档
+
+        Args:
+            collection_name: 集合名称
+            document: 文档
+            ticket: 文档所属任务的写入情况
+        """
+        if ticket is not None:
+            with ticket.lock:
+                ticket.pending += 1
+        with self.lock:
+            buffer = self.buffers[collection_name]
+            buffer.append((document, ticket))
+            full = len(buffer) >= self.batch_size
+        if full:
+            self.flush(collection_name)
+
+    def _run(self):
+        while not self.stop_event.wait(self.flush_interval):
+            self.flush()
+
+    def flush(self, collection_name: Optional[str] = None) -> bool:
+        """立即写入缓冲中的文档
+
+        Args:
+            collection_name: 只写入该集合，为None时写入所有集合
+
+        Returns:
+            bool: 是否全部写入成功
+        """
+        with self.lock:
+            names = [collection_name] if collection_name is not None else list(self.buffers)
+        return all([self._flush_collection(name) for name in names])
+
+    def _flush_collection(self, collection_name: str) -> bool:
+        with self.flush_locks[collection_name]:
+            with self.lock:
+                entries = self.buffers.pop(collection_name, [])
+            if not entries:
+                return True
+            start = time.monotonic()
+            inserted = self.mongodb_service.insert_many(collection_name, [document for document, _ in entries], ordered=False)
+            latency = time.monotonic() - start
+            self._record(len(entries), latency, inserted is not None)
+            if inserted is not None:
+                self._settle(entries)
+                logger.debug(f"批量写入 {collection_name} {len(entries)} 条，耗时 {latency * 1000:.1f}ms")
+                return True
+            self._requeue(collection_name, entries)
+            return False
+
+    @staticmethod
+    def _settle(entries: List[Tuple[Dict[str, Any], Optional[WriteTicket]]], failed: bool = False):
+        counts: Dict[WriteTicket, int] = defaultdict(int)
+        for _, ticket in entries:
+            if ticket is not None:
+                counts[ticket] += 1
+        for ticket, count in counts.items():
+            if failed:
+                ticket._settle(failed=count)
+            else:
+                ticket._settle(written=count)
+
+    def _requeue(self, collection_name: str, entries: List[Tuple[Dict[str, Any], Optional[WriteTicket]]]):
+        # 失败的批次放回队首，下次写入时重试；已写入的文档带有_id，重试时按重复跳过
+        with self.lock:
+            buffer = entries + self.buffers.get(collection_name, [])
+            dropped = len(buffer) - self.max_pending
+            if dropped > 0:
+                self._settle(buffer[:dropped], failed=True) # 所属任务据此以失败结束
+                buffer = buffer[dropped:]
+            self.buffers[collection_name] = buffer
+        if dropped > 0:
+            with self.stats_lock:
+                self.dropped += dropped
+            logger.error(f"批量写入 {collection_name} 持续失败，丢弃最早的 {dropped} 条文档")
+        else:
+            logger.error(f"批量写入 {collection_name} 失败，{len(entries)} 条文档等待重试")
+
+    def discard(self, ticket: WriteTicket) -> int:
+        """撤回任务尚未写入的文档，任务以失败结束、消息重回队列时调用，避免重新执行后重复写入
+
+        Args:
+            ticket: 任务的写入情况
+
+        Returns:
+            int: 撤回的文档数
+        """
+        discarded = []
+        with self.lock:
+            for collection_name, buffer in self.buffers.items():
+                kept = [entry for entry in buffer if entry[1] is not ticket]
+                if len(kept) != len(buffer):
+                    discarded.extend(entry for entry in buffer if entry[1] is ticket)
+                    self.buffers[collection_name] = kept
+        self._settle(discarded, failed=True)
+        return len(discarded)
+
+    def _record(self, batch_size: int, latency: float, success: bool):
+        with self.stats_lock:
+            if success:
+                self.batches += 1
+                self.documents += batch_size
+                self.max_batch_size = max(self.max_batch_size, batch_size)
+                self.total_latency += latency
+            else:
+                self.failed_batches += 1
+            self.last_latency = latency
+            self.max_latency = max(self.max_latency, latency)
+
+    def stats(self) -> Dict[str, Any]:
+        """批量写入统计，用于调整batch_size与flush_interval
+
+        Returns:
+            Dict[str, Any]: 批次数、文档数、平均/最大批量大小、平均/最大/最近一次写入耗时（秒）等
+        """
+        with self.stats_lock:
+            return {
+                'batches': self.batches,
+                'documents': self.documents,
+                'failed_batches': self.failed_batches,
+                'dropped': self.dropped,
+                'avg_batch_size': self.documents / self.batches if self.batches else 0,
+                'max_batch_size': self.max_batch_size,
+                'avg_latency': self.total_latency / self.batches if self.batches else 0,
+                'max_latency': self.max_latency,
+                'last_latency': self.last_latency,
+            }
+
+    def close(self):
+        """停止后台线程并写入剩余文档"""
+        self.stop_event.set()
+        self.thread.join()
+        self.flush()
+        logger.info(f"写后缓冲已关闭，统计: {self.stats()}")
@@ -0,0 +1,147 @@
+import asyncio
+import unittest
+from unittest.mock import patch
+
+from playwright.async_api import Error as PlaywrightError
+
+from dspider.celery_worker.browser_pool import BrowserPool
+
+
+class FakeContext:
+    def __init__(self, browser):
+        self.browser = browser
+        self.closed = False
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeBrowser:
+    def __init__(self):
+        self.connected = True
+        self.contexts = []
+
+    def is_connected(self):
+        return self.connected
+
+    async def new_context(self, **kwargs):
+        self.contexts.append(FakeContext(self))
+        return self.contexts[-1]
+
+    async def close(self):
+        self.connected = False
+
+
+class FakePlaywright:
+    def __init__(self):
+        self.browsers = []
+        self.chromium = self
+        self.stopped = False
+
+    async def launch(self, headless=True):
+        self.browsers.append(FakeBrowser())
+        return self.browsers[-1]
+
+    async def stop(self):
+        self.stopped = True
+
+
+class FakeAsyncPlaywright:
+    def __init__(self, playwright):
+        self.playwright = playwright
+
+    async def start(self):
+        return self.playwright
+
+
+class TestBrowserPool(unittest.TestCase):
+    def setUp(self):
+        self.playwright = FakePlaywright()
+        patcher = patch('dspider.celery_worker.browser_pool.async_playwright',
+                        side_effect=lambda: FakeAsyncPlaywright(self.playwright))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def make_pool(self, **kwargs):
+        pool = BrowserPool(**kwargs)
+        self.addCleanup(pool.close)
+        return pool
+
+    @staticmethod
+    async def use_context(pool, fail=None):
+        async with pool.context() as context:
+            if fail:
+                fail(context)
+            return context
+
+    def test_reuse_browser_with_isolated_contexts(self):
+        pool = self.make_pool(size=1, max_pages=100)
+        contexts = [pool.run(self.use_context) for _ in range(5)]
+
+        self.assertEqual(len(self.playwright.browsers), 1)
+        self.assertEqual(len({id(context) for context in contexts}), 5)
+        self.assertTrue(all(context.closed for context in contexts))
+
+    def test_recycle_after_max_pages(self):
+        pool = self.make_pool(size=1, max_pages=2)
+        for _ in range(5):
+            pool.run(self.use_context)
+        self.assertEqual(len(self.playwright.browsers), 3)
+        self.assertEqual(pool.launches, 3)
+
+    def test_relaunch_after_crash(self):
+        pool = self.make_pool(size=1, max_pages=100)
+
+        def crash(context):
+            context.browser.connected = False
+            raise PlaywrightError('Target page, context or browser has been closed')
+
+        with self.assertRaises(PlaywrightError):
+            pool.run(lambda p: self.use_context(p, crash))
+        pool.run(self.use_context)
+        self.assertEqual(len(self.playwright.browsers), 2)
+
+    def test_one_persistent_loop(self):
+        pool = self.make_pool()
+        loops = [pool.run(lambda p: self.current_loop()) for _ in range(3)]
+        self.assertTrue(all(loop is pool.loop for loop in loops))
+
+    @staticmethod
+    async def current_loop():
+        return asyncio.get_running_loop()
+
+    def test_map_contexts_in_one_browser(self):
+        pool = self.make_pool(size=1, max_pages=100)
+        state = {'active': 0, 'peak': 0}
+
+        async def capture(context, item):
+            state['active'] += 1
+            state['peak'] = max(state['peak'], state['active'])
+            await asyncio.sleep(0.01)
+            state['active'] -= 1
+            if item == 3:
+                raise PlaywrightError('timeout')
+            return (context, item)
+
+        results = pool.run(lambda p: p.map_contexts(capture, range(10), concurrency=3))
+
+        self.assertEqual(len(self.playwright.browsers), 1)
+        self.assertEqual(state['peak'], 3)
+        self.assertIsInstance(results[3], PlaywrightError)
+        self.assertEqual([r[1] for i, r in enumerate(results) if i != 3], [0, 1, 2, 4, 5, 6, 7, 8, 9])
+        contexts = self.playwright.browsers[0].contexts
+        self.assertEqual(len(contexts), 10)
+        self.assertTrue(all(context.closed for context in contexts))
+        self.assertEqual(pool.browsers[0].pages, 10)
+
+    def test_close(self):
+        pool = BrowserPool()
+        pool.run(self.use_context)
+        pool.close()
+        self.assertTrue(self.playwright.stopped)
+        self.assertFalse(self.playwright.browsers[0].connected)
+        self.assertIsNone(pool.loop)
+
+
+if __name__ == '__main__':
+    unittest.main()
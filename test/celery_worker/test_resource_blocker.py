@@ -0,0 +1,143 @@
+import asyncio
+import unittest
+
+from dspider.celery_worker.resource_blocker import (DEFAULT_HEADER_CAPTURE, ResourceBlocker, open_for_capture,
+                                                    site_of)
+
+DATASOURCE = {
+    'url': 'https://zhaopin.jd.com/web/job/job_info_list/3',
+    'request_params': {'api_url': 'https://zhaopin.jd.com/web/job/job_list'},
+}
+
+
+class FakeRequest:
+    def __init__(self, url, resource_type):
+        self.url = url
+        self.resource_type = resource_type
+
+
+class FakeRoute:
+    def __init__(self, request):
+        self.request = request
+        self.result = None
+
+    async def abort(self, error_code=None):
+        self.result = 'abort'
+
+    async def continue_(self):
+        self.result = 'continue'
+
+
+class FakeRequestInfo:
+    def __init__(self):
+        self.future = asyncio.get_running_loop().create_future()
+
+    @property
+    async def value(self):
+        return await self.future
+
+
+class FakeExpectRequest:
+    def __init__(self, page, predicate):
+        self.page = page
+        self.predicate = predicate
+
+    async def __aenter__(self):
+        self.info = FakeRequestInfo()
+        self.page.expectations.append((self.predicate, self.info))
+        return self.info
+
+    async def __aexit__(self, *args):
+        return False
+
+
+class FakePage:
+    """goto时依次发出requests中的请求，经过路由处理后触发expect_request"""
+
+    def __init__(self, requests, delay=0):
+        self.requests = requests
+        self.delay = delay
+        self.handler = None
+        self.expectations = []
+        self.routes = []
+        self.goto_kwargs = None
+
+    async def route(self, pattern, handler):
+        self.handler = handler
+
+    def expect_request(self, predicate, timeout=None):
+        return FakeExpectRequest(self, predicate)
+
+    async def goto(self, url, **kwargs):
+        self.goto_kwargs = kwargs
+        await asyncio.sleep(self.delay)
+        for request in self.requests:
+            route = FakeRoute(request)
+            if self.handler is not None:
+                await self.handler(route)
+            self.routes.append(route)
+            if route.result == 'abort':
+                continue
+            for predicate, info in self.expectations:
+                if predicate(request) and not info.future.done():
+                    info.future.set_result(request)
+
+
+class TestResourceBlocker(unittest.TestCase):
+    def setUp(self):
+        self.blocker = ResourceBlocker.from_config(DATASOURCE, DEFAULT_HEADER_CAPTURE)
+
+    def test_site_of(self):
+        self.assertEqual(site_of('zhaopin.jd.com'), 'jd.com')
+        self.assertEqual(site_of('jobs.example.com.cn'), 'example.com.cn')
+        self.assertEqual(site_of('localhost'), 'localhost')
+
+    def test_should_block(self):
+        block = self.blocker.should_block
+        self.assertTrue(block('image', 'https://img10.360buyimg.com/a.png'))
+        self.assertTrue(block('stylesheet', 'https://zhaopin.jd.com/a.css'))
+        self.assertTrue(block('script', 'https://hm.baidu.com/hm.js'))
+        self.assertTrue(block('other', 'https://tracker.example.net/beacon'))
+        self.assertFalse(block('script', 'https://cdn.example.net/jquery.js'))
+        self.assertFalse(block('script', 'https://static.jd.com/app.js'))
+        self.assertFalse(block('other', 'https://zhaopin.jd.com/manifest'))
+        self.assertFalse(block('fetch', DATASOURCE['request_params']['api_url']))
+
+    def test_allowed_domains(self):
+        datasource = {**DATASOURCE, 'request_params': {**DATASOURCE['request_params'], 'allowed_domains': ['example.net']}}
+        blocker = ResourceBlocker.from_config(datasource, DEFAULT_HEADER_CAPTURE)
+        self.assertFalse(blocker.should_block('other', 'https://tracker.example.net/beacon'))
+
+    def test_open_for_capture(self):
+        api = FakeRequest(DATASOURCE['request_params']['api_url'], 'xhr')
+        page = FakePage([
+            FakeRequest(DATASOURCE['url'], 'document'),
+            FakeRequest('https://img10.360buyimg.com/a.png', 'image'),
+            FakeRequest('https://static.jd.com/app.js', 'script'),
+            api,
+        ])
+
+        request = asyncio.run(open_for_capture(page, DATASOURCE, DEFAULT_HEADER_CAPTURE))
+
+        self.assertIs(request, api)
+        self.assertEqual(page.goto_kwargs['wait_until'], 'commit')
+        self.assertEqual([route.result for route in page.routes], ['continue', 'abort', 'continue', 'continue'])
+
+    def test_full_mode(self):
+        api = FakeRequest(DATASOURCE['request_params']['api_url'], 'xhr')
+        page = FakePage([FakeRequest('https://img10.360buyimg.com/a.png', 'image'), api])
+
+        request = asyncio.run(open_for_capture(page, {**DATASOURCE, 'capture_mode': 'full'}, DEFAULT_HEADER_CAPTURE))
+
+        self.assertIs(request, api)
+        self.assertIsNone(page.handler)
+        self.assertEqual(page.goto_kwargs['wait_until'], 'load')
+
+    def test_page_timeout(self):
+        page = FakePage([], delay=1)
+        with self.assertRaises(asyncio.TimeoutError):
+            asyncio.run(open_for_capture(page, DATASOURCE, {**DEFAULT_HEADER_CAPTURE, 'page_timeout': 0.05}))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import os
+import tempfile
+import unittest
+
+from dspider.common.bloom_filter import BloomFilter, ScalableBloomFilter
+
+
+class TestBloomFilter(unittest.TestCase):
+    def test_add_and_contains(self):
+        bloom = BloomFilter(1000, 0.01)
+
+        self.assertFalse(bloom.add('https://careers.tencent.com/jobdesc.html?postId=1'))
+        self.assertTrue(bloom.add('https://careers.tencent.com/jobdesc.html?postId=1'))
+        self.assertIn('https://careers.tencent.com/jobdesc.html?postId=1', bloom)
+        self.assertEqual(len(bloom), 1)
+
+    def test_no_false_negative_and_bounded_false_positive(self):
+        bloom = BloomFilter(10000, 0.01)
+        bloom.add_many(f"seen-{i}" for i in range(10000))
+
+        self.assertTrue(all(bloom.contains_many(f"seen-{i}" for i in range(10000))))
+        false_positive = sum(bloom.contains_many(f"unseen-{i}" for i in range(10000)))
+        self.assertLess(false_positive / 10000, 0.02)
+
+
+class TestScalableBloomFilter(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.path = os.path.join(self.tmpdir.name, 'fingerprints.bf')
+
+    def test_grows_beyond_initial_capacity(self):
+        bloom = ScalableBloomFilter(initial_capacity=1000, error_rate=0.01)
+        bloom.add_many(f"seen-{i}" for i in range(10000))
+
+        self.assertEqual(len(bloom.filters), 4)
+        self.assertTrue(all(bloom.contains_many(f"seen-{i}" for i in range(10000))))
+        false_positive = sum(bloom.contains_many(f"unseen-{i}" for i in range(10000)))
+        self.assertLess(false_positive / 10000, 0.03)
+
+    def test_merge(self):
+        worker_a = ScalableBloomFilter(initial_capacity=100, error_rate=0.01)
+        worker_b = ScalableBloomFilter(initial_capacity=100, error_rate=0.01)
+        worker_a.add_many(f"a-{i}" for i in range(50))
+        worker_b.add_many(f"b-{i}" for i in range(300))
+
+        worker_a.merge(worker_b)
+
+        self.assertTrue(all(worker_a.contains_many([f"a-{i}" for i in range(50)] + [f"b-{i}" for i in range(300)])))
+        self.assertEqual(len(worker_a.filters), len(worker_b.filters))
+        with self.assertRaises(ValueError):
+            worker_a.merge(ScalableBloomFilter(initial_capacity=200, error_rate=0.01))
+
+    def test_snapshot_roundtrip(self):
+        bloom = ScalableBloomFilter(initial_capacity=500, error_rate=0.01)
+        bloom.add_many(f"seen-{i}" for i in range(1200))
+        bloom.save(self.path)
+
+        for use_mmap in (True, False):
+            loaded = ScalableBloomFilter.load(self.path, use_mmap=use_mmap)
+            self.assertEqual(len(loaded), len(bloom))
+            self.assertTrue(all(loaded.contains_many(f"seen-{i}" for i in range(1200))))
+            # 加载后继续写入不影响快照文件
+            self.assertFalse(loaded.add('new-key'))
+            self.assertIn('new-key', loaded)
+        self.assertNotIn('new-key', ScalableBloomFilter.load(self.path))
+
+    def test_load_invalid_snapshot(self):
+        with open(self.path, 'wb') as f:
+            f.write(b'not a snapshot')
+        with self.assertRaises(ValueError):
+            ScalableBloomFilter.load(self.path)
+
+
+if __name__ == '__main__':
+    unittest.main()
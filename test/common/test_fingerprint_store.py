@@ -0,0 +1,64 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import Mock
+
+from dspider.common.fingerprint_store import FingerprintStore, canonicalize_url, request_fingerprint
+
+
+class TestFingerprint(unittest.TestCase):
+    def test_canonicalize_url(self):
+        self.assertEqual(canonicalize_url('HTTPS://Careers.Tencent.com:443/jobdesc.html?postId=1&a=2#top'),
+                         'https://careers.tencent.com/jobdesc.html?a=2&postId=1')
+        self.assertEqual(canonicalize_url('http://example.com:8080'), 'http://example.com:8080/')
+
+    def test_request_fingerprint(self):
+        self.assertEqual(request_fingerprint('https://a.com/list?b=1&a=2'),
+                         request_fingerprint('https://A.com/list?a=2&b=1', 'get'))
+        self.assertEqual(request_fingerprint('https://a.com/api', 'POST', {'page': 1, 'size': 10}),
+                         request_fingerprint('https://a.com/api', 'POST', {'size': 10, 'page': 1}))
+        self.assertNotEqual(request_fingerprint('https://a.com/api', 'POST', {'page': 1}),
+                            request_fingerprint('https://a.com/api', 'POST', {'page': 2}))
+
+
+class TestFingerprintStore(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.store = FingerprintStore(initial_capacity=100, error_rate=1e-6, growth=2)
+        self.requests = [f"https://a.com/job?id={i}" for i in range(150)] + [('POST', 'https://a.com/api', {'id': 1})]
+
+    def test_add_and_contains_many(self):
+        self.assertEqual(self.store.add_many(self.requests), [False] * len(self.requests))
+        self.assertTrue(all(self.store.contains_many(self.requests)))
+        self.assertEqual(self.store.contains_many(['https://a.com/job?id=999', ('POST', 'https://a.com/api', {'id': 2})]),
+                         [False, False])
+
+    def test_add_fingerprints(self):
+        self.assertEqual(self.store.add_fingerprints(['jd:1', 'jd:2', 'jd:1']), [False, False, True])
+        self.assertEqual(self.store.contains_fingerprints(['jd:2', 'jd:3']), [True, False])
+
+    def test_minio_snapshot_and_merge(self):
+        uploaded = {}
+        minio_client = Mock()
+        minio_client.upload_file.side_effect = lambda bucket, name, path, content_type: \
+            uploaded.setdefault(name, shutil.copy(path, os.path.join(self.tmpdir, 'uploaded'))) and True
+        minio_client.download_file.side_effect = lambda bucket, name, path: \
+            bool(shutil.copy(uploaded[name], path)) if name in uploaded else False
+
+        self.store.add_many(self.requests)
+        self.assertTrue(self.store.save_to_minio(minio_client, 'fingerprints', 'worker-1.bf',
+                                                 os.path.join(self.tmpdir, 'local.bf')))
+
+        other = FingerprintStore(initial_capacity=100, error_rate=1e-6, growth=2)
+        other.add_many(['https://a.com/job?id=999'])
+        self.assertTrue(other.merge_from_minio(minio_client, 'fingerprints', 'worker-1.bf',
+                                               os.path.join(self.tmpdir, 'download.bf')))
+        self.assertTrue(all(other.contains_many(self.requests + ['https://a.com/job?id=999'])))
+        self.assertFalse(other.merge_from_minio(minio_client, 'fingerprints', 'missing.bf',
+                                                os.path.join(self.tmpdir, 'missing.bf')))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from dspider.common.minio_service import IteratorReader, MinIOService
+
+from test.common.test_page_archive import InMemoryMinio, build_page
+
+
+class TestMinIOStream(unittest.TestCase):
+    def setUp(self):
+        with patch.object(MinIOService, 'initialize_client'):
+            self.service = MinIOService('minio.test:9000', 'ak', 'sk')
+        self.service.client = InMemoryMinio()
+
+    def test_upload_iterator_in_parts(self):
+        chunks = (bytes([i % 256]) * 1000 for i in range(100))
+
+        self.assertTrue(self.service.upload_stream('bucket', 'big.bin', chunks, part_size=8192))
+
+        content = self.service.client.objects['big.bin']
+        self.assertEqual(len(content), 100000)
+        self.assertEqual(content[5000:5001], bytes([5]))
+        # 每次只读取一个分片
+        self.assertEqual(self.service.client.max_read, 8192)
+
+    def test_upload_file_object(self):
+        with tempfile.TemporaryFile() as f:
+            f.write(b'x' * 3000)
+            f.seek(0)
+            self.assertTrue(self.service.upload_stream('bucket', 'file.bin', f, part_size=1024))
+        self.assertEqual(self.service.client.objects['file.bin'], b'x' * 3000)
+
+    def test_iterator_reader(self):
+        reader = IteratorReader([b'ab', b'cde', b'', b'f'])
+        self.assertEqual(reader.read(4), b'abcd')
+        self.assertEqual(reader.read(), b'ef')
+        self.assertEqual(reader.read(1), b'')
+
+    def test_iter_object(self):
+        self.service.client.objects['page'] = b'0123456789'
+        self.assertEqual(list(self.service.iter_object('bucket', 'page', chunk_size=4)), [b'0123', b'4567', b'89'])
+        self.assertEqual(b''.join(self.service.iter_object('bucket', 'page', chunk_size=4, offset=2, length=5)), b'23456')
+        # 提前结束迭代也会释放连接
+        chunks = self.service.iter_object('bucket', 'page', chunk_size=4)
+        next(chunks)
+        chunks.close()
+        self.assertTrue(self.service.client.responses[-1].closed)
+
+    def test_download_mmap(self):
+        self.service.client.objects['page'] = b'list page content'
+        with tempfile.TemporaryDirectory() as tmpdir:
+            mapped = self.service.download_mmap('bucket', 'page', os.path.join(tmpdir, 'page'))
+            self.assertEqual(mapped[5:9], b'page')
+            mapped.close()
+
+    def test_iter_archived_pages(self):
+        pages = [build_page(page) for page in range(20)]
+        writer = self.service.archive_writer('bucket', 'task')
+        entries = [writer.add(f"page{i}", page.encode('utf-8')) for i, page in enumerate(pages)]
+        writer.flush()
+
+        # 块远小于单个页面的压缩帧，也能逐页还原
+        result = list(self.service.iter_archived_pages('bucket', entries[0]['segment'], chunk_size=64))
+        self.assertEqual([page['key'] for page in result], [f"page{i}" for i in range(20)])
+        self.assertEqual([page['text'] for page in result], pages)
+
+
+if __name__ == '__main__':
+    unittest.main()
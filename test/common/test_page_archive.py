@@ -0,0 +1,166 @@
+import gzip
+import json
+import unittest
+from collections import OrderedDict
+from unittest.mock import Mock, patch
+
+from minio.error import S3Error
+
+from dspider.common import minio_service, page_archive
+from dspider.common.minio_service import MinIOService
+from dspider.common.page_archive import PageArchiveWriter
+
+
+class FakeResponse:
+    def __init__(self, content):
+        self.content = content
+        self.closed = False
+
+    def read(self):
+        return self.content
+
+    def stream(self, chunk_size):
+        for i in range(0, len(self.content), chunk_size):
+            yield self.content[i:i + chunk_size]
+
+    def close(self):
+        self.closed = True
+
+    def release_conn(self):
+        pass
+
+
+class InMemoryMinio:
+    """模拟minio.Minio，支持按范围读取与分片上传"""
+    def __init__(self):
+        self.objects = {}
+        self.put_count = 0
+        self.max_read = 0 # 上传时单次读取的最大字节数
+        self.responses = []
+
+    def bucket_exists(self, bucket_name):
+        return True
+
+    def put_object(self, bucket_name, object_name, data, length, content_type=None, part_size=0):
+        if length >= 0 and not part_size:
+            content = data.read(length)
+        else:
+            parts = []
+            while True:
+                part = data.read(part_size)
+                self.max_read = max(self.max_read, len(part))
+                if not part:
+                    break
+                parts.append(part)
+            content = b''.join(parts)
+        self.objects[object_name] = content
+        self.put_count += 1
+
+    def get_object(self, bucket_name, object_name, offset=0, length=0):
+        content = self.objects[object_name]
+        response = FakeResponse(content[offset:offset + length] if length else content[offset:])
+        self.responses.append(response)
+        return response
+
+    def fget_object(self, bucket_name, object_name, file_path):
+        with open(file_path, 'wb') as f:
+            f.write(self.objects[object_name])
+
+    def stat_object(self, bucket_name, object_name):
+        if object_name not in self.objects:
+            raise S3Error(Mock(), 'NoSuchKey', 'Object does not exist', object_name, '', '', bucket_name, object_name)
+        return Mock(size=len(self.objects[object_name]))
+
+
+def build_page(page):
+    return json.dumps({'Data': {'Posts': [{'PostId': f"{page}-{i}", 'RecruitPostName': '后端开发工程师',
+                                           'Responsibility': '负责服务端开发与性能优化' * 5} for i in range(10)]}},
+                      ensure_ascii=False)
+
+
+class TestPageArchive(unittest.TestCase):
+    def setUp(self):
+        with patch.object(MinIOService, 'initialize_client'):
+            self.service = MinIOService('minio.test:9000', 'ak', 'sk')
+        self.service.client = InMemoryMinio()
+        self.pages = [build_page(page) for page in range(50)]
+
+    def test_write_and_read_by_range(self):
+        writer = self.service.archive_writer('bucket', '2025/01/01/1/task')
+        entries = [writer.add(f"page{i}", page.encode('utf-8')) for i, page in enumerate(self.pages)]
+        self.assertTrue(writer.flush())
+
+        # 50页只产生1次PUT
+        self.assertEqual(self.service.client.put_count, 1)
+        segment = entries[0]['segment']
+        self.assertTrue(segment.startswith('2025/01/01/1/task_') and segment.endswith('_00000.gz'))
+        self.assertEqual(self.service.read_archived_page('bucket', entries[17]), self.pages[17])
+        # 压缩后体积远小于原始页面
+        raw_size = sum(len(page.encode('utf-8')) for page in self.pages)
+        self.assertLess(len(self.service.client.objects[segment]) * 4, raw_size)
+
+    def test_read_index(self):
+        writer = self.service.archive_writer('bucket', 'task')
+        entries = [writer.add(f"page{i}", page.encode('utf-8')) for i, page in enumerate(self.pages[:3])]
+        writer.flush()
+
+        index = self.service.read_archive_index('bucket', entries[0]['segment'])
+        self.assertEqual(index['codec'], 'gzip')
+        self.assertEqual([p['key'] for p in index['pages']], ['page0', 'page1', 'page2'])
+        self.assertEqual(index['pages'][2]['offset'], entries[2]['offset'])
+        # 分段内的页面帧拼接起来是合法的gzip流
+        content = self.service.client.objects[entries[0]['segment']]
+        self.assertEqual(gzip.decompress(content[:entries[2]['offset'] + entries[2]['length']]).decode('utf-8'),
+                         ''.join(self.pages[:3]))
+
+    def test_seal_rolls_segment(self):
+        writer = PageArchiveWriter(self.service, 'bucket', 'task', segment_size=1)
+        first = writer.add('a', b'aaa')
+        self.assertTrue(writer.is_full)
+        writer.flush()
+        second = writer.add('b', b'bbb')
+        self.assertNotEqual(first['segment'], second['segment'])
+        self.assertEqual(second['offset'], 0)
+        self.assertIsNone(PageArchiveWriter(self.service, 'bucket', 'empty').seal())
+
+    def test_unsupported_codec(self):
+        with self.assertRaises(ValueError):
+            PageArchiveWriter(self.service, 'bucket', 'task', codec='lz4')
+        with patch.object(page_archive, 'zstandard', None):
+            with self.assertRaises(ValueError):
+                page_archive.compress(b'x', 'zstd')
+
+
+class TestContentAddressed(unittest.TestCase):
+    def setUp(self):
+        patcher = patch.object(minio_service, '_known_objects', OrderedDict())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        with patch.object(MinIOService, 'initialize_client'):
+            self.service = MinIOService('minio.test:9000', 'ak', 'sk')
+        self.service.client = InMemoryMinio()
+
+    def test_upload_if_absent(self):
+        self.assertFalse(self.service.object_exists('bucket', 'cas/ab/abc.txt'))
+        self.assertTrue(self.service.upload_bytes_if_absent('bucket', 'cas/ab/abc.txt', b'page'))
+        self.assertTrue(self.service.upload_bytes_if_absent('bucket', 'cas/ab/abc.txt', b'page'))
+        self.assertEqual(self.service.client.put_count, 1)
+        self.assertTrue(self.service.is_known_object('bucket', 'cas/ab/abc.txt'))
+
+    def test_remote_check_after_restart(self):
+        self.service.client.objects['cas/ab/abc.txt'] = b'page' # 其他进程上传过
+        self.assertFalse(self.service.is_known_object('bucket', 'cas/ab/abc.txt'))
+        self.assertTrue(self.service.upload_bytes_if_absent('bucket', 'cas/ab/abc.txt', b'page'))
+        self.assertEqual(self.service.client.put_count, 0)
+        self.assertTrue(self.service.is_known_object('bucket', 'cas/ab/abc.txt'))
+
+    def test_known_objects_lru(self):
+        with patch.object(minio_service, 'KNOWN_OBJECTS_MAXSIZE', 2):
+            for name in ('a', 'b', 'c'):
+                self.service.remember_object('bucket', name)
+        self.assertFalse(self.service.is_known_object('bucket', 'a'))
+        self.assertTrue(self.service.is_known_object('bucket', 'c'))
+
+
+if __name__ == '__main__':
+    unittest.main()
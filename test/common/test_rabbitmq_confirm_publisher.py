@@ -0,0 +1,109 @@
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+from pika import spec
+
+from dspider.common.rabbitmq_service import RabbitMQService, RabbitMQConfirmPublisher
+
+
+class FakeBroker:
+    """模拟broker：每次process_data_events时批量确认所有已发布消息"""
+
+    def __init__(self, nack_tags=()):
+        self.nack_tags = set(nack_tags)
+        self.published = []
+        self.confirmed = 0
+        self.ack_nack_callback = None
+        self.select_ok_callback = None
+
+        self.channel = MagicMock()
+        self.channel._impl.confirm_delivery.side_effect = self._confirm_delivery
+        self.channel.basic_publish.side_effect = lambda **kwargs: self.published.append(kwargs)
+
+        self.connection = MagicMock()
+        self.connection.is_open = True
+        self.connection.channel.return_value = self.channel
+        self.connection.process_data_events.side_effect = self._process_data_events
+
+    def _confirm_delivery(self, ack_nack_callback, callback):
+        self.ack_nack_callback = ack_nack_callback
+        self.select_ok_callback = callback
+
+    def _process_data_events(self, time_limit=None):
+        if self.select_ok_callback:
+            self.select_ok_callback(SimpleNamespace(method=spec.Confirm.SelectOk()))
+            self.select_ok_callback = None
+            return
+        tags = range(self.confirmed + 1, len(self.published) + 1)
+        acked = [tag for tag in tags if tag not in self.nack_tags]
+        for tag in tags:
+            if tag in self.nack_tags:
+                self.ack_nack_callback(SimpleNamespace(method=spec.Basic.Nack(delivery_tag=tag)))
+        if acked:
+            # 只回一个multiple ack，覆盖到最大的tag
+            self.ack_nack_callback(SimpleNamespace(method=spec.Basic.Ack(delivery_tag=acked[-1], multiple=True)))
+        self.confirmed = len(self.published)
+
+
+class TestRabbitMQConfirmPublisher(unittest.TestCase):
+    def setUp(self):
+        self.service = RabbitMQService('localhost', 5672, 'guest', 'guest', '/')
+
+    def create_publisher(self, broker, max_in_flight=4):
+        self.service.connection = broker.connection
+        publisher = self.service.create_confirm_publisher(max_in_flight=max_in_flight, confirm_timeout=1)
+        self.assertTrue(publisher.open())
+        return publisher
+
+    def test_open_without_connection(self):
+        publisher = RabbitMQConfirmPublisher(self.service)
+        self.assertFalse(publisher.open())
+
+    def test_publish_batch_all_acked(self):
+        broker = FakeBroker()
+        publisher = self.create_publisher(broker)
+
+        messages = [{'id': i} for i in range(10)]
+        result = publisher.publish_batch(messages, 'list', message_keys=[f'k{i}' for i in range(10)])
+
+        self.assertEqual(result['acked'], [f'k{i}' for i in range(10)])
+        self.assertEqual(result['nacked'], [])
+        self.assertEqual(result['unconfirmed'], [])
+        self.assertEqual(len(broker.published), 10)
+        self.assertEqual(broker.published[0]['properties'].delivery_mode, 2)
+        self.assertEqual(publisher.in_flight, 0)
+
+    def test_window_limits_in_flight(self):
+        broker = FakeBroker()
+        publisher = self.create_publisher(broker, max_in_flight=3)
+
+        for i in range(3):
+            publisher.publish({'id': i}, 'list')
+        self.assertEqual(publisher.in_flight, 3)
+        broker.connection.process_data_events.assert_called_once()  # 只有SelectOk
+
+        publisher.publish({'id': 3}, 'list')
+        self.assertEqual(publisher.in_flight, 1)
+
+    def test_publish_batch_reports_nack(self):
+        broker = FakeBroker(nack_tags={2})
+        publisher = self.create_publisher(broker)
+
+        result = publisher.publish_batch(['a', 'b', 'c'], 'list')
+
+        self.assertEqual(result['acked'], [0, 2])
+        self.assertEqual(result['nacked'], [1])
+
+    def test_publish_batch_reports_unsent(self):
+        broker = FakeBroker()
+        publisher = self.create_publisher(broker)
+
+        result = publisher.publish_batch(['a', 'b', 123], 'list')
+
+        self.assertEqual(result['acked'], [0, 1])
+        self.assertEqual(result['unconfirmed'], [2])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,154 @@
+import json
+import queue
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+from dspider.common.rabbitmq_service import RabbitMQService
+
+
+class FakeConsumerConnection:
+    """模拟BlockingConnection的消费循环：投递消息后在“连接线程”执行线程安全回调"""
+
+    def __init__(self, bodies, fire_timers=False):
+        self.bodies = bodies
+        self.fire_timers = fire_timers
+        self.callbacks = queue.Queue()
+        self.timers = []
+        self.acked = []
+        self.nacked = []
+        self.connection_thread = None
+        self.settle_threads = set()
+
+        self.channel = MagicMock()
+        self.channel.is_open = True
+        self.channel.basic_consume.side_effect = self._basic_consume
+        self.channel.start_consuming.side_effect = self._start_consuming
+        self.channel.basic_ack.side_effect = self._ack
+        self.channel.basic_nack.side_effect = self._nack
+
+    def add_callback_threadsafe(self, callback):
+        self.callbacks.put(callback)
+
+    def call_later(self, delay, callback):
+        self.timers.append(callback)
+        return callback
+
+    def remove_timeout(self, timer):
+        self.timers.remove(timer)
+
+    def _ack(self, delivery_tag):
+        self.settle_threads.add(threading.get_ident())
+        self.acked.append(delivery_tag)
+
+    def _nack(self, delivery_tag, requeue):
+        self.settle_threads.add(threading.get_ident())
+        self.nacked.append(delivery_tag)
+
+    def _basic_consume(self, queue, on_message_callback, auto_ack):
+        self.on_message = on_message_callback
+
+    def _start_consuming(self):
+        self.connection_thread = threading.get_ident()
+        for tag, body in enumerate(self.bodies, start=1):
+            method = SimpleNamespace(delivery_tag=tag, redelivered=False, routing_key='list')
+            self.on_message(self.channel, method, None, json.dumps(body).encode('utf-8'))
+        if self.fire_timers:
+            for timer in list(self.timers):
+                timer()
+        while len(self.acked) + len(self.nacked) < len(self.bodies):
+            self.callbacks.get(timeout=5)()
+        # 处理超时后才完成的回调
+        while not self.callbacks.empty():
+            self.callbacks.get()()
+
+
+class TestConsumeMessagesPool(unittest.TestCase):
+    def setUp(self):
+        self.service = RabbitMQService('localhost', 5672, 'guest', 'guest', '/')
+
+    def attach(self, fake):
+        self.service.connection = fake
+        self.service.channel = fake.channel
+
+    def test_concurrent_consume(self):
+        fake = FakeConsumerConnection([{'id': i} for i in range(6)])
+        self.attach(fake)
+        barrier = threading.Barrier(3, timeout=5)
+
+        def callback(message, properties):
+            barrier.wait()  # 只有3条消息同时处理时才能通过
+            return message['id'] % 2 == 0
+
+        self.service.consume_messages('list', callback, prefetch_count=1, concurrency=3)
+
+        fake.channel.basic_qos.assert_called_once_with(prefetch_count=3)
+        self.assertEqual(sorted(fake.acked), [1, 3, 5])
+        self.assertEqual(sorted(fake.nacked), [2, 4, 6])
+        # ack/nack都在连接线程执行
+        self.assertEqual(fake.settle_threads, {fake.connection_thread})
+
+    def test_message_timeout_waits_for_handler(self):
+        fake = FakeConsumerConnection([{'id': 1}], fire_timers=True)
+        self.attach(fake)
+        release = threading.Event()
+
+        def callback(message, properties):
+            release.wait(5)
+            return True
+
+        threading.Timer(0.2, release.set).start()
+        with self.assertLogs('dspider.common.rabbitmq_service', level='ERROR'):
+            self.service.consume_messages('list', callback, concurrency=2, message_timeout=1)
+
+        # 超时只记录错误，处理结束后按结果确认，不会在处理中重回队列
+        self.assertEqual(fake.acked, [1])
+        self.assertEqual(fake.nacked, [])
+
+    def test_in_flight_bounded_by_concurrency(self):
+        fake = FakeConsumerConnection([{'id': i} for i in range(6)])
+        self.attach(fake)
+        in_flight = []
+
+        def callback(message, properties):
+            in_flight.append(len(fake.timers)) # 每条已提交到线程池的消息有一个定时器
+            time.sleep(0.02)
+            return True
+
+        self.service.consume_messages('list', callback, prefetch_count=10, concurrency=2, message_timeout=60)
+
+        self.assertEqual(sorted(fake.acked), [1, 2, 3, 4, 5, 6])
+        self.assertLessEqual(max(in_flight), 2)
+
+    def test_timeout_removed_after_settle(self):
+        fake = FakeConsumerConnection([{'id': i} for i in range(4)])
+        self.attach(fake)
+
+        self.service.consume_messages('list', lambda message, properties: True, concurrency=2, message_timeout=60)
+
+        self.assertEqual(sorted(fake.acked), [1, 2, 3, 4])
+        # 按时处理完的消息的定时器都已取消
+        self.assertEqual(fake.timers, [])
+
+    def test_inline_consume(self):
+        fake = FakeConsumerConnection([{'id': 1}, 'plain'])
+        self.attach(fake)
+        received = []
+
+        def callback(message, properties):
+            received.append(message)
+            if message == 'plain':
+                raise ValueError('bad message')
+            return True
+
+        self.service.consume_messages('list', callback)
+
+        self.assertEqual(received, [{'id': 1}, 'plain'])
+        self.assertEqual(fake.acked, [1])
+        self.assertEqual(fake.nacked, [2])
+
+
+if __name__ == '__main__':
+    unittest.main()
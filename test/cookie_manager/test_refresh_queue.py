@@ -0,0 +1,103 @@
+import unittest
+
+from dspider.common.cookie_state import cookie_expiry
+from dspider.cookie_manager.refresh_queue import RefreshQueue
+
+NOW = 1_000_000.0
+
+
+class TestCookieExpiry(unittest.TestCase):
+    def test_cookie_expiry(self):
+        cookies = [{'name': 'a', 'expires': -1}, {'name': 'b', 'expires': NOW + 7200}, {'name': 'c', 'expires': NOW + 3600}]
+        self.assertEqual(cookie_expiry(cookies), NOW + 3600)
+        self.assertIsNone(cookie_expiry([{'name': 'a', 'expires': -1}]))
+        self.assertIsNone(cookie_expiry([]))
+
+
+class TestRefreshQueue(unittest.TestCase):
+    def setUp(self):
+        self.queue = RefreshQueue(refresh_margin=600, default_ttl=3600, retry_interval=300)
+
+    def test_never_captured_is_due(self):
+        self.queue.update('a', None, NOW)
+        self.assertEqual(self.queue.pop_due(NOW), ['a'])
+
+    def test_ordered_by_expiry(self):
+        self.queue.update('session', {'captured_at': NOW, 'updated_at': NOW}, NOW)
+        self.queue.update('soon', {'captured_at': NOW, 'expires_at': NOW + 1200, 'updated_at': NOW}, NOW)
+        self.queue.update('later', {'captured_at': NOW, 'expires_at': NOW + 86400, 'updated_at': NOW}, NOW)
+
+        self.assertEqual(self.queue.next_due(), NOW + 600)
+        self.assertEqual(self.queue.pop_due(NOW + 599), [])
+        self.assertEqual(self.queue.pop_due(NOW + 600), ['soon'])
+        # 已提交的soon在retry_interval后重新到期，排在session之前
+        self.assertEqual(self.queue.pop_due(NOW + 3600), ['soon', 'session'])
+        self.assertEqual(len(self.queue), 3)
+
+    def test_short_lived_cookie(self):
+        # 有效期短于refresh_margin时在有效期过半时刷新，而不是捕获后立即到期
+        self.queue.update('a', {'captured_at': NOW, 'expires_at': NOW + 300, 'updated_at': NOW}, NOW)
+        self.assertEqual(self.queue.pop_due(NOW + 5), [])
+        self.assertEqual(self.queue.next_due(), NOW + 150)
+        # 有效期极短时两次捕获至少间隔min_interval
+        self.queue.update('b', {'captured_at': NOW, 'expires_at': NOW + 10, 'updated_at': NOW}, NOW)
+        self.assertEqual(self.queue.pop_due(NOW + 59), [])
+        self.assertEqual(self.queue.pop_due(NOW + 60), ['b'])
+
+    def test_rejected_is_due_immediately(self):
+        state = {'captured_at': NOW, 'expires_at': NOW + 86400, 'updated_at': NOW}
+        self.queue.update('a', state, NOW)
+        self.assertEqual(self.queue.pop_due(NOW + 10), [])
+
+        self.queue.update('a', dict(state, rejected_at=NOW + 20, rejected_status=401, updated_at=NOW + 20), NOW + 20)
+        self.assertEqual(self.queue.pop_due(NOW + 20), ['a'])
+
+    def test_retry_after_submit(self):
+        self.queue.update('a', None, NOW)
+        self.assertEqual(self.queue.pop_due(NOW), ['a'])
+        # 状态未变化的同步不会让已提交的数据源再次立即到期
+        self.queue.update('a', None, NOW + 30)
+        self.assertEqual(self.queue.pop_due(NOW + 30), [])
+        self.assertEqual(self.queue.pop_due(NOW + 300), ['a'])
+
+    def test_captured_reschedules(self):
+        self.queue.update('a', None, NOW)
+        self.queue.pop_due(NOW)
+        self.queue.update('a', {'captured_at': NOW + 10, 'expires_at': NOW + 7200, 'updated_at': NOW + 10}, NOW + 10)
+        self.assertEqual(self.queue.pop_due(NOW + 300), [])
+        self.assertEqual(self.queue.next_due(), NOW + 6600)
+
+    def test_remove_and_limit(self):
+        for url in 'abc':
+            self.queue.update(url, None, NOW)
+        self.queue.remove('b')
+        self.assertEqual(self.queue.pop_due(NOW, limit=1), ['a'])
+        self.assertEqual(self.queue.pop_due(NOW), ['c'])
+        self.assertEqual(len(self.queue), 2)
+
+    def test_single_flight(self):
+        state = {'captured_at': NOW, 'expires_at': NOW + 86400, 'updated_at': NOW}
+        self.queue.update('a', dict(state, rejected_at=NOW + 1, updated_at=NOW + 1), NOW + 1)
+        self.assertEqual(self.queue.pop_due(NOW + 1), ['a'])
+
+        # 捕获进行中，其他Worker的刷新信号合并到进行中的捕获
+        for t in (NOW + 2, NOW + 3):
+            self.queue.update('a', dict(state, rejected_at=t, updated_at=t), t)
+            self.assertEqual(self.queue.pop_due(t), [])
+        self.assertEqual(self.queue.coalesced, 2)
+
+        # 捕获完成后按新的过期时间计划
+        self.queue.update('a', {'captured_at': NOW + 5, 'expires_at': NOW + 7200, 'updated_at': NOW + 5}, NOW + 5)
+        self.assertNotIn('a', self.queue.in_flight)
+        self.assertEqual(self.queue.next_due(), NOW + 6600)
+
+    def test_single_flight_retry_after_timeout(self):
+        self.queue.update('a', None, NOW)
+        self.assertEqual(self.queue.pop_due(NOW), ['a'])
+        self.queue.update('a', {'rejected_at': NOW + 10, 'updated_at': NOW + 10}, NOW + 10)
+        self.assertEqual(self.queue.pop_due(NOW + 10), [])
+        self.assertEqual(self.queue.pop_due(NOW + 300), ['a'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,348 @@
+import time
+import unittest
+from unittest.mock import ANY, MagicMock, Mock, patch
+
+from bson import ObjectId
+from pymongo.errors import AutoReconnect, OperationFailure
+
+# master模块在导入时引用全局连接实例，这里用mock代替
+with patch('dspider.common.mongodb_service.mongodb_conn', MagicMock(), create=True), \
+        patch('dspider.common.rabbitmq_service.rabbitmq_client', MagicMock(), create=True):
+    from dspider.master.master import MasterNode
+
+
+def match(document, query):
+    """简化的MongoDB查询匹配，支持等值、$in、$lt、$exists"""
+    for key, cond in query.items():
+        value = document.get(key)
+        if isinstance(cond, dict):
+            if '$in' in cond and value not in cond['$in']:
+                return False
+            if '$lt' in cond and not (value is not None and value < cond['$lt']):
+                return False
+            if '$exists' in cond and (key in document) != cond['$exists']:
+                return False
+        elif value != cond:
+            return False
+    return True
+
+
+class FakeMongoService:
+    """内存版MongoDBService，只实现Master用到的方法"""
+
+    def __init__(self, documents):
+        self.documents = documents
+
+    def find(self, collection_name, query, projection=None, limit=0, skip=0):
+        result = [dict(d) for d in self.documents if match(d, query)]
+        return result[:limit] if limit > 0 else result
+
+    def update_many(self, collection_name, query, update):
+        modified = 0
+        for document in self.documents:
+            if match(document, query):
+                document.update(update.get('$set', {}))
+                for key in update.get('$unset', {}):
+                    document.pop(key, None)
+                modified += 1
+        return modified
+
+
+class ReplayChangeStream:
+    """本地change stream替身：按顺序回放插入事件，回放完后空等idle_rounds次再结束"""
+
+    def __init__(self, master, documents, inserts, idle_rounds=2):
+        self.master = master
+        self.documents = documents
+        self.inserts = list(inserts)
+        self.idle_rounds = idle_rounds
+        self.resume_token = None
+        self.alive = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.alive = False
+
+    def try_next(self):
+        if self.inserts:
+            document = self.inserts.pop(0)
+            self.documents.append(document)
+            self.resume_token = {'_data': str(document['_id'])}
+            return {'operationType': 'insert', 'fullDocument': document}
+        self.idle_rounds -= 1
+        if self.idle_rounds <= 0:
+            self.master.stop()
+        return None
+
+
+class ClosingChangeStream(ReplayChangeStream):
+    """回放完插入事件后游标被服务端关闭（如invalidate）"""
+
+    def try_next(self):
+        change = super().try_next()
+        self.alive = bool(self.inserts)
+        return change
+
+
+class TestMasterNodeDistribute(unittest.TestCase):
+    def setUp(self):
+        self.master = MasterNode()
+        self.master.mongo_client = Mock()
+        self.master.rabbitmq_client = Mock()
+        self.master.distribute_batch_size = 2
+        self.master.claim_mode = False
+
+        self.publisher = Mock()
+        self.publisher.open.return_value = True
+        self.master.rabbitmq_client.create_confirm_publisher.return_value = self.publisher
+
+        self.ds_configs = [{'_id': ObjectId(), 'state': 0} for _ in range(3)]
+
+    def test_distribute_tasks_batch(self):
+        ids = [ds_config['_id'] for ds_config in self.ds_configs]
+        self.publisher.publish_batch.side_effect = [
+            {'acked': ids[:2], 'nacked': [], 'unconfirmed': []},
+            {'acked': [], 'nacked': ids[2:], 'unconfirmed': []},
+        ]
+
+        success_count = self.master.distribute_tasks_batch(self.ds_configs)
+
+        self.assertEqual(success_count, 2)
+        self.assertEqual(self.publisher.publish_batch.call_count, 2)
+        messages = self.publisher.publish_batch.call_args_list[0].args[0]
+        self.assertEqual(messages[0]['_id'], str(ids[0]))
+        self.assertEqual(self.publisher.publish_batch.call_args_list[0].kwargs['message_keys'], ids[:2])
+
+        # 只有ack的批次更新状态，且过滤条件使用原生ObjectId
+        self.master.mongo_client.update_many.assert_called_once()
+        query = self.master.mongo_client.update_many.call_args.args[1]
+        self.assertEqual(query, {'_id': {'$in': ids[:2]}})
+        self.master.mongo_client.update_one.assert_not_called()
+        # 原始配置不被修改
+        self.assertIsInstance(self.ds_configs[0]['_id'], ObjectId)
+
+    def test_distribute_tasks_batch_fallback(self):
+        self.publisher.open.return_value = False
+        self.master.rabbitmq_client.publish_message.return_value = True
+        _id = self.ds_configs[0]['_id']
+
+        success_count = self.master.distribute_tasks_batch(self.ds_configs)
+
+        self.assertEqual(success_count, 3)
+        self.assertEqual(self.master.mongo_client.update_one.call_args_list[0].args[1], {'_id': _id})
+
+
+class TestMasterNodeShard(unittest.TestCase):
+    def setUp(self):
+        self.master = MasterNode()
+        self.master.mongo_client = Mock()
+        self.master.rabbitmq_client = Mock()
+        self.master.claim_mode = False
+        self.publisher = Mock()
+        self.publisher.open.return_value = True
+        self.master.rabbitmq_client.create_confirm_publisher.return_value = self.publisher
+
+    def test_build_shard_messages(self):
+        ds_config = {'_id': ObjectId(), 'pagination': [1, 1], 'shard_size': 50, 'max_page': 120}
+
+        messages = self.master.build_task_messages(ds_config, 0)
+
+        self.assertEqual([m['pagination'] for m in messages], [[1, 1], [51, 1], [101, 1]])
+        self.assertEqual([m['shard']['end'] for m in messages], [50, 100, 120])
+        self.assertEqual(len({m['shard']['listing_id'] for m in messages}), 1)
+        self.assertTrue(all(m['_id'] == str(ds_config['_id']) for m in messages))
+        # 未配置分片时保持一条消息
+        self.assertEqual(len(self.master.build_task_messages({'_id': ObjectId(), 'pagination': [1, 1]}, 0)), 1)
+
+    def test_config_distributed_only_when_all_shards_acked(self):
+        sharded = {'_id': ObjectId(), 'pagination': [1, 1], 'shard_size': 10, 'max_page': 30}
+        plain = {'_id': ObjectId(), 'pagination': [1, 1]}
+        self.publisher.publish_batch.return_value = {
+            'acked': [sharded['_id'], sharded['_id'], plain['_id']], 'nacked': [sharded['_id']], 'unconfirmed': []
+        }
+
+        success_count = self.master.distribute_tasks_batch([sharded, plain])
+
+        self.assertEqual(success_count, 1)
+        self.assertEqual(self.publisher.publish_batch.call_args.kwargs['message_keys'],
+                         [sharded['_id']] * 3 + [plain['_id']])
+        query = self.master.mongo_client.update_many.call_args.args[1]
+        self.assertEqual(query, {'_id': {'$in': [plain['_id']]}})
+
+
+class TestMasterNodeClaim(unittest.TestCase):
+    def setUp(self):
+        self.documents = [{'_id': ObjectId(), 'state': 0} for _ in range(5)]
+        self.mongo_service = FakeMongoService(self.documents)
+
+    def create_master(self):
+        master = MasterNode()
+        master.mongo_client = self.mongo_service
+        master.rabbitmq_client = Mock()
+        return master
+
+    def test_concurrent_masters_do_not_double_claim(self):
+        master_a, master_b = self.create_master(), self.create_master()
+
+        claimed_a = master_a.claim_ds_configs()
+        claimed_b = master_b.claim_ds_configs()
+
+        self.assertEqual(len(claimed_a), 5)
+        self.assertEqual(claimed_b, [])
+        self.assertTrue(all(d['state'] == 1 for d in self.documents))
+
+    def test_late_ack_keeps_reclaimed_config(self):
+        master_a, master_b = self.create_master(), self.create_master()
+        publisher = Mock()
+        publisher.open.return_value = True
+        publisher.publish_batch.side_effect = lambda messages, *args, **kwargs: {
+            'acked': kwargs['message_keys'], 'nacked': [], 'unconfirmed': []}
+        master_a.rabbitmq_client.create_confirm_publisher.return_value = publisher
+        claimed_a = master_a.claim_ds_configs()
+        # A的租约过期后被B重新认领
+        for document in self.documents:
+            document['lease_expire_at'] = time.time() - 1
+        claimed_b = master_b.claim_ds_configs()
+
+        success_count = master_a.distribute_tasks_batch(claimed_a)
+
+        self.assertEqual(success_count, 5)
+        self.assertEqual(len(claimed_b), 5)
+        # A的迟到确认不改写B持有的配置
+        self.assertTrue(all('distributed_at' not in d and 'lease_expire_at' in d for d in self.documents))
+
+    def test_reclaim_expired_leases(self):
+        master = self.create_master()
+        master.claim_ds_configs()
+        # 两条租约已过期，其余已确认分发
+        for document in self.documents[:2]:
+            document['lease_expire_at'] = time.time() - 1
+        for document in self.documents[2:]:
+            document.pop('lease_expire_at')
+            document['distributed_at'] = time.time()
+
+        reclaimed = master.reclaim_expired_leases()
+
+        self.assertEqual(reclaimed, 2)
+        self.assertEqual([d['state'] for d in self.documents], [0, 0, 1, 1, 1])
+        self.assertNotIn('claim_token', self.documents[0])
+        self.assertEqual(len(self.create_master().claim_ds_configs()), 2)
+
+    def test_release_failed_configs(self):
+        master = self.create_master()
+        publisher = Mock()
+        publisher.open.return_value = True
+        master.rabbitmq_client.create_confirm_publisher.return_value = publisher
+        ids = [d['_id'] for d in self.documents]
+        publisher.publish_batch.return_value = {'acked': ids[:3], 'nacked': ids[3:4], 'unconfirmed': ids[4:]}
+        master.distribute_batch_size = 5
+
+        success_count = master.distribute_tasks_batch(master.claim_ds_configs())
+
+        self.assertEqual(success_count, 3)
+        self.assertEqual([d['state'] for d in self.documents], [1, 1, 1, 0, 0])
+        self.assertNotIn('lease_expire_at', self.documents[0])
+        self.assertIn('distributed_at', self.documents[0])
+
+
+
+class TestMasterNodeChangeStream(unittest.TestCase):
+    def setUp(self):
+        self.documents = []
+        self.master = MasterNode()
+        self.collection = Mock()
+        self.master.mongo_client = FakeMongoService(self.documents)
+        self.master.mongo_client.get_collection = Mock(return_value=self.collection)
+        self.master.mongo_client.find_one = Mock(return_value={'token': {'_data': 'saved'}})
+        self.master.mongo_client.update_one = Mock(return_value=True)
+        self.master.rabbitmq_client = Mock()
+        self.master.claim_mode = False
+        self.master.distribute_tasks_batch = Mock(side_effect=lambda ds_configs: len(ds_configs))
+
+    def test_dispatch_on_insert_events(self):
+        inserts = [{'_id': ObjectId(), 'state': 0} for _ in range(3)]
+        self.collection.watch.return_value = ReplayChangeStream(self.master, self.documents, inserts)
+
+        self.master.run()
+
+        # 从持久化的resume token继续监听
+        self.assertEqual(self.collection.watch.call_args.kwargs['resume_after'], {'_data': 'saved'})
+        # 启动时一次积压分发，随后连续到达的3个插入事件合并为一次分发
+        dispatched = [c.args[0] for c in self.master.distribute_tasks_batch.call_args_list]
+        self.assertEqual(dispatched, [[], inserts])
+        self.master.mongo_client.update_one.assert_called_with(
+            'master_resume_token', {'_id': 'recruitment_datasource_config'},
+            {'$set': {'token': {'_data': str(inserts[-1]['_id'])}, 'updated_at': ANY}},
+            upsert=True
+        )
+
+    @patch('dspider.master.master.time.sleep')
+    def test_reopen_after_stream_closed(self, mock_sleep):
+        self.master.distribute_batch_size = 1
+        first, second = [{'_id': ObjectId(), 'state': 0}], [{'_id': ObjectId(), 'state': 0}]
+        self.collection.watch.side_effect = [ClosingChangeStream(self.master, self.documents, first),
+                                             ReplayChangeStream(self.master, self.documents, second)]
+
+        self.master.run()
+
+        # 游标关闭后从已保存的resume token重新监听，而不是结束运行
+        self.assertEqual(self.collection.watch.call_count, 2)
+        self.assertEqual(self.collection.watch.call_args.kwargs['resume_after'], {'_data': str(first[0]['_id'])})
+        mock_sleep.assert_called_once_with(self.master.change_stream_retry_interval)
+
+    @patch('dspider.master.master.time.sleep')
+    def test_retry_after_transient_error(self, mock_sleep):
+        inserts = [{'_id': ObjectId(), 'state': 0}]
+        self.collection.watch.side_effect = [AutoReconnect('primary stepped down'),
+                                             ReplayChangeStream(self.master, self.documents, inserts)]
+
+        self.master.run()
+
+        # 临时错误后重新监听，不回退到轮询
+        self.assertEqual(self.collection.watch.call_count, 2)
+        self.assertEqual(self.collection.watch.call_args.kwargs['resume_after'], {'_data': 'saved'})
+        mock_sleep.assert_called_once_with(self.master.change_stream_retry_interval)
+        self.assertIn(inserts, [c.args[0] for c in self.master.distribute_tasks_batch.call_args_list])
+
+    @patch('dspider.master.master.time.sleep')
+    def test_resume_token_invalid(self, mock_sleep):
+        self.collection.watch.side_effect = [OperationFailure('resume point may no longer be in the oplog', code=286),
+                                             ReplayChangeStream(self.master, self.documents, [])]
+
+        self.master.run()
+
+        self.assertIsNone(self.collection.watch.call_args.kwargs['resume_after'])
+        mock_sleep.assert_not_called()
+
+    @patch.dict('dspider.master.master.master_config', {'sql_select_count': 2})
+    def test_drain_backlog_on_start(self):
+        self.documents.extend({'_id': ObjectId(), 'state': 0} for _ in range(5))
+        def distribute(ds_configs):
+            for ds_config in ds_configs:
+                next(d for d in self.documents if d['_id'] == ds_config['_id'])['state'] = 1
+            return len(ds_configs)
+        self.master.distribute_tasks_batch = Mock(side_effect=distribute)
+        self.collection.watch.return_value = ReplayChangeStream(self.master, self.documents, [])
+
+        self.master.run()
+
+        # 积压超过一批时连续分发，直到一批不满
+        dispatched = [len(c.args[0]) for c in self.master.distribute_tasks_batch.call_args_list]
+        self.assertEqual(dispatched[:3], [2, 2, 1])
+        self.assertTrue(all(d['state'] == 1 for d in self.documents))
+
+    @patch('dspider.master.master.time.sleep')
+    def test_fallback_to_polling(self, mock_sleep):
+        self.collection.watch.side_effect = OperationFailure('not a replica set', code=40573)
+        mock_sleep.side_effect = lambda interval: self.master.stop()
+
+        self.master.run()
+
+        self.master.distribute_tasks_batch.assert_called_once()
+        mock_sleep.assert_called_once_with(self.master.send_interval)
+
+
+if __name__ == '__main__':
+    unittest.main()
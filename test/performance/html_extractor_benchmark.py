@@ -0,0 +1,64 @@
+'''
+# 列表页HTML解析与JSON解析性能对比
+
+同一批列表数据分别以JSON与HTML返回，比较ListSpiderExtractorJson、ListSpiderExtractorHTML整树解析、
+ListSpiderExtractorHTML流式解析提取详情页URL的耗时，用于评估HTML站点走requests路径（而非浏览器路径）的开销。
+
+运行: python test/performance/html_extractor_benchmark.py
+'''
+import json
+import statistics
+import time
+
+from dspider.worker.spider.list_spider import ListSpiderExtractorHTML, ListSpiderExtractorJson
+
+ITEMS_PER_PAGE = 2000 # 模拟大列表页
+PAGES = 20
+TEST_RUNS = 5
+
+JSON_RULE = {
+    'list_data': 'data.list',
+    'url_rule': {'url_path': 'https://example.com/jobs/detail', 'params': {'code': 'code'}, 'postdata': {}},
+    'fields': {'title': 'title', 'city': 'city'},
+}
+HTML_RULE = {
+    'type': 'html',
+    'list_data': 'css:li.job',
+    'url_rule': {'url_path': 'https://example.com/jobs/', 'link': 'css:a::attr(href)'},
+    'fields': {'title': 'css:a::text', 'city': 'css:span.city::text'},
+}
+
+
+def build_json_page(page: int) -> str:
+    items = [{'code': f"{page}-{i}", 'title': f"职位{i}", 'city': '上海', 'desc': 'x' * 200} for i in range(ITEMS_PER_PAGE)]
+    return json.dumps({'data': {'list': items}}, ensure_ascii=False)
+
+
+def build_html_page(page: int) -> str:
+    rows = ''.join(
+        f'<li class="job"><a href="detail?code={page}-{i}">职位{i}</a><span class="city">上海</span><p>{"x" * 200}</p></li>'
+        for i in range(ITEMS_PER_PAGE))
+    return f'<html><head><meta charset="utf-8"></head><body><ul class="jobs">{rows}</ul></body></html>'
+
+
+def run(name, extractor, pages):
+    durations = []
+    for _ in range(TEST_RUNS):
+        start = time.perf_counter()
+        for page in pages:
+            items = extractor.extract_url(page)
+        durations.append(time.perf_counter() - start)
+    assert len(items) == ITEMS_PER_PAGE
+    print(f"{name}: 平均 {statistics.mean(durations):.3f}s, 最小 {min(durations):.3f}s ({PAGES}页 x {ITEMS_PER_PAGE}条)")
+    return statistics.mean(durations)
+
+
+if __name__ == '__main__':
+    json_pages = [build_json_page(page) for page in range(PAGES)]
+    html_pages = [build_html_page(page) for page in range(PAGES)]
+    print(f"单页大小: JSON {len(json_pages[0].encode('utf-8')) // 1024}KB, HTML {len(html_pages[0].encode('utf-8')) // 1024}KB")
+
+    json_time = run("JSON", ListSpiderExtractorJson(JSON_RULE), json_pages)
+    tree_time = run("HTML整树解析", ListSpiderExtractorHTML({**HTML_RULE, 'stream_threshold': float('inf')}), html_pages)
+    stream_time = run("HTML流式解析", ListSpiderExtractorHTML({**HTML_RULE, 'stream_threshold': 0}), html_pages)
+    print(f"HTML整树/JSON: {tree_time / json_time:.2f}x, HTML流式/JSON: {stream_time / json_time:.2f}x")
@@ -0,0 +1,85 @@
+'''
+# 列表页JSON解析性能对比
+
+原实现每页对响应做两次json.loads（extract_url一次，get_urls一次），每次调用都重新拆分list_data路径，
+并多次访问resp.text（requests每次访问都会重新解码）。新实现每页只解码、解析一次，路径在构造解析器时编译。
+
+运行: python test/performance/list_extractor_benchmark.py
+'''
+import json
+import statistics
+import time
+
+from dspider.worker.spider.list_spider import ListSpiderExtractorJson, json_loads
+
+PARSE_RULE = {
+    'list_data': 'data.result.list',
+    'url_rule': {'url_path': 'https://example.com/job/detail', 'params': {'id': 'jobId', 'type': 'jobType'}, 'postdata': {}}
+}
+ITEMS_PER_PAGE = 2000 # 模拟大列表页
+PAGES = 50
+TEST_RUNS = 5
+
+
+class FakeResponse:
+    """模拟requests.Response：每次访问text都从content重新解码"""
+    def __init__(self, content: bytes):
+        self.content = content
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8')
+
+
+def build_page(page: int) -> bytes:
+    items = [{'id': f"{page}-{i}", 'type': i % 5, 'title': f"职位{i}" * 5, 'desc': 'x' * 200} for i in range(ITEMS_PER_PAGE)]
+    return json.dumps({'code': 0, 'data': {'result': {'list': items, 'page': page}}}, ensure_ascii=False).encode('utf-8')
+
+
+def legacy_extract(resp, parse_rule):
+    """原实现：每次调用重新构造解析器、拆分路径、解析JSON"""
+    def extract_list_data(resp_text):
+        list_items = json.loads(resp_text)
+        for p in parse_rule['list_data'].split('.'):
+            list_items = list_items.get(p)
+        return list_items
+
+    if resp.text == '': # check_response中的重复页比较
+        return None
+    list_items = extract_list_data(resp.text)
+    url_rule = parse_rule['url_rule']
+    for item in list_items:
+        target_url = url_rule['url_path'] + '?'
+        for list_data_key, url_key in url_rule['params'].items():
+            target_url += f"{url_key}={item.get(list_data_key)}&"
+        item['url'] = target_url[:-1]
+    extract_list_data(resp.text) # get_urls再次解析
+    return resp.text, list_items
+
+
+def current_extract(resp, extractor):
+    resp_text = resp.text
+    if resp_text == '':
+        return None
+    return resp_text, extractor.extract_url(extractor.parse(resp_text))
+
+
+def run(name, func):
+    durations = []
+    for _ in range(TEST_RUNS):
+        responses = [FakeResponse(page) for page in PAGES_CONTENT]
+        start = time.perf_counter()
+        for resp in responses:
+            func(resp)
+        durations.append(time.perf_counter() - start)
+    print(f"{name}: 平均 {statistics.mean(durations):.3f}s, 最小 {min(durations):.3f}s ({PAGES}页 x {ITEMS_PER_PAGE}条)")
+    return statistics.mean(durations)
+
+
+if __name__ == '__main__':
+    PAGES_CONTENT = [build_page(page) for page in range(PAGES)]
+    print(f"JSON后端: {json_loads.__module__}")
+    legacy = run("原实现", lambda resp: legacy_extract(resp, PARSE_RULE))
+    extractor = ListSpiderExtractorJson(PARSE_RULE)
+    current = run("新实现", lambda resp: current_extract(resp, extractor))
+    print(f"加速比: {legacy / current:.2f}x")
@@ -11,6 +11,10 @@ task_config = { # TODO: 转为yaml
             "p_num": 3, # 必须
             "queue_name": "list", # 必须。消费external_datasource_config的队列
             "prefetch_count": 1,
+            "concurrency": 1, # 可选。单个Executor内并发处理的任务数
+            # "mode": "async", # 可选。async时使用AsyncExecutor，在一个事件循环中并发运行concurrency个任务
+            # "http_pool_maxsize": 10, # 可选。每个host保持的keep-alive连接数，默认max(10, concurrency)
+            # "http_timeout": 30, # 可选。请求读取超时（秒），连接超时由http_connect_timeout指定，默认5
             # round: 1, # 
         },
         # "DetailSpider": {
@@ -0,0 +1,135 @@
+import asyncio
+import copy
+import json
+import os
+import sys
+import unittest
+from unittest.mock import AsyncMock, Mock, patch
+
+from dspider.common.datasource_manager import DataSourceManager
+from dspider.worker.spider.async_list_spider import AsyncListSpider
+from dspider.worker.worker import AsyncExecutor
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from test.test_data.data import jd_config_tencent, jd_result_tencent, task_config
+
+real_sleep = asyncio.sleep
+
+
+class FakeResponse:
+    def __init__(self, status, text):
+        self.status = status
+        self.headers = {}
+        self._text = text
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        return False
+
+    async def text(self):
+        return self._text
+
+
+class FakeSession:
+    """按页码返回预设响应的aiohttp.ClientSession替身"""
+
+    def __init__(self, pages, gate=None):
+        self.pages = pages
+        self.gate = gate
+        self.requests = []
+        self.active = 0
+        self.max_active = 0
+
+    def request(self, method, url, headers=None, data=None):
+        self.requests.append((method, url, data))
+        return self._respond(url)
+
+    async def _enter(self):
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        if self.gate is not None:
+            await self.gate.wait()
+        self.active -= 1
+
+    def _respond(self, url):
+        session = self
+
+        class _Ctx:
+            async def __aenter__(self):
+                await session._enter()
+                page = int(url.split('pageIndex=')[1].split('&')[0])
+                status, text = session.pages.get(page, (200, session.pages.get('default')))
+                return FakeResponse(status, text)
+
+            async def __aexit__(self, *args):
+                return False
+
+        return _Ctx()
+
+
+def page_text(post_id):
+    result = copy.deepcopy(jd_result_tencent)
+    result['Data']['Posts'][0]['PostId'] = post_id
+    return json.dumps(result, ensure_ascii=False)
+
+
+@patch('dspider.worker.spider.async_list_spider.asyncio.sleep', new=AsyncMock())
+class TestAsyncListSpider(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        patcher = patch.object(DataSourceManager, 'get_data_source_with_config', side_effect=lambda *args: Mock())
+        patcher.start()
+        self.addCleanup(patch.stopall)
+        self.executor = AsyncExecutor('ListSpider', task_config)
+        self.executor.mongodb_service.insert_one = AsyncMock(return_value='id')
+        self.executor.mongodb_service.find = AsyncMock(return_value=[])
+        self.executor.mongodb_service.create_index = AsyncMock(return_value='ds_1')
+        self.executor.mongodb_service.insert_many = AsyncMock(side_effect=lambda name, docs, ordered: [d['_id'] for d in docs])
+        self.executor.minio_client.upload_text.return_value = True
+
+    async def test_start_stops_on_duplicate_page(self):
+        self.executor.http_session = FakeSession({1: (200, page_text('1')), 2: (500, ''), 3: (200, page_text('3')),
+                                                  4: (200, page_text('3'))})
+
+        statistic = await self.executor.spider.start(jd_config_tencent)
+
+        self.assertIsInstance(self.executor.spider, AsyncListSpider)
+        self.assertEqual(statistic['total'], 4)
+        self.assertEqual(statistic['success'], 3)
+        self.assertEqual(statistic['fail'], [2])
+        self.assertEqual(statistic['stop_reason'], "重复页响应内容，最后成功页：4")
+        # 每页的URL都由模板格式化，而不是沿用上一页的URL
+        self.assertIn('pageIndex=3&', self.executor.http_session.requests[2][1])
+        self.assertEqual(self.executor.mongodb_service.insert_one.await_count, 2)
+        self.assertEqual(self.executor.minio_client.upload_text.call_count, 2)
+
+    async def test_shard_failures_keep_listing_open(self):
+        self.executor.http_session = FakeSession({1: (200, page_text('1')), 2: (503, ''), 3: (429, '')})
+        self.executor.mongodb_service.update_one = AsyncMock(return_value=True)
+        self.executor.mongodb_service.find_one = AsyncMock(return_value=None)
+        task = dict(jd_config_tencent, shard={'listing_id': 'jd:1', 'index': 0, 'end': 10})
+
+        statistic = await self.executor.spider.start(task)
+
+        self.assertEqual(statistic['stop_reason'], "连续页请求失败，最后失败页：3")
+        # 连续请求失败不记录列表结束，后续分片照常抓取
+        self.executor.mongodb_service.update_one.assert_not_awaited()
+
+    async def test_tasks_run_concurrently(self):
+        gate = asyncio.Event()
+        session = FakeSession({2: (404, ''), 3: (404, ''), 'default': page_text('1')}, gate=gate)
+        self.executor.http_session = session
+
+        tasks = [asyncio.create_task(self.executor.process_task(jd_config_tencent, {})) for _ in range(5)]
+        while session.active < 5:
+            await real_sleep(0)
+        gate.set()
+        results = await asyncio.gather(*tasks)
+
+        self.assertEqual(results, [True] * 5)
+        self.assertEqual(session.max_active, 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import threading
+import time
+import unittest
+from unittest.mock import Mock
+
+from dspider.worker.cookie_refresh import CookieRefreshClient
+
+URL = 'https://careers.tencent.com/search.html'
+
+
+class FakeDatasourceCollection:
+    """模拟数据源配置：收到刷新信号后delay秒写回新的请求头"""
+
+    def __init__(self, captured_at=100.0, delay=0.05):
+        self.document = {'url': URL, 'request_params': {'headers': {'cookie': 'old'}},
+                         'cookie_state': {'captured_at': captured_at}}
+        self.delay = delay
+        self.signals = []
+        self.lock = threading.Lock()
+
+    def find_one(self, collection_name, query, projection=None):
+        with self.lock:
+            if self.document['cookie_state']['captured_at'] > query['cookie_state.captured_at']['$gt']:
+                return self.document
+        return None
+
+    def update_one(self, collection_name, query, update, upsert=False):
+        self.signals.append(update['$set']['cookie_state.rejected_status'])
+        threading.Timer(self.delay, self.capture).start()
+        return True
+
+    def capture(self):
+        with self.lock:
+            self.document = {'url': URL, 'request_params': {'headers': {'cookie': 'new'}},
+                             'cookie_state': {'captured_at': time.time()}}
+
+
+class TestCookieRefreshClient(unittest.TestCase):
+    def setUp(self):
+        self.collection = FakeDatasourceCollection()
+        self.client = CookieRefreshClient(self.collection, wait_timeout=2, poll_interval=0.01)
+
+    def test_refresh(self):
+        task = {'url': URL, 'cookie_state': {'captured_at': 100.0}}
+
+        headers = self.client.refresh(task, 401)
+
+        self.assertEqual(headers, {'cookie': 'new'})
+        self.assertEqual(self.collection.signals, [401])
+        self.assertGreater(task['cookie_state']['captured_at'], 100.0)
+
+    def test_already_refreshed(self):
+        # 本任务的请求头早于库中的请求头，直接使用库中的，不再发刷新信号
+        headers = self.client.refresh({'url': URL, 'cookie_state': {'captured_at': 50.0}}, 403)
+
+        self.assertEqual(headers, {'cookie': 'old'})
+        self.assertEqual(self.collection.signals, [])
+
+    def test_concurrent_refresh_coalesced(self):
+        results = []
+        tasks = [{'url': URL, 'cookie_state': {'captured_at': 100.0}} for _ in range(5)]
+        threads = [threading.Thread(target=lambda t=task: results.append(self.client.refresh(t, 401))) for task in tasks]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results, [{'cookie': 'new'}] * 5)
+        self.assertEqual(self.collection.signals, [401])
+
+    def test_timeout(self):
+        mongodb_service = Mock()
+        mongodb_service.find_one.return_value = None
+        client = CookieRefreshClient(mongodb_service, wait_timeout=0.05, poll_interval=0.01)
+
+        self.assertIsNone(client.refresh({'url': URL}, 401))
+        mongodb_service.update_one.assert_called_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
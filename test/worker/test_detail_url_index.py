@@ -0,0 +1,167 @@
+import copy
+import json
+import os
+import sys
+import unittest
+from unittest.mock import Mock
+
+from dspider.common.fingerprint_store import FingerprintStore
+from dspider.worker.detail_url_index import DetailUrlIndex
+from dspider.worker.rate_limiter import RateLimiterRegistry
+from dspider.worker.spider.list_spider import ListSpider, TaskIncompleteError
+from dspider.worker.upload_queue import UploadQueue
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from test.test_data.data import jd_config_tencent, jd_result_tencent, task_config
+
+
+class FakeMongoService:
+    """内存版MongoDBService，只实现去重索引用到的方法"""
+
+    def __init__(self):
+        self.documents = {}
+        self.find_calls = 0
+        self.indexes = []
+
+    def create_index(self, collection_name, keys, **kwargs):
+        self.indexes.append((collection_name, keys))
+        return '_'.join(f"{key}_{direction}" for key, direction in keys)
+
+    def find(self, collection_name, query, projection=None, limit=0, skip=0):
+        self.find_calls += 1
+        if 'ds' in query:
+            return [{'_id': _id} for _id, d in self.documents.items() if d['ds'] == query['ds']]
+        return [{'_id': _id} for _id in query['_id']['$in'] if _id in self.documents]
+
+    def insert_many(self, collection_name, documents, ordered=True):
+        inserted = []
+        for document in documents:
+            if document['_id'] not in self.documents:
+                self.documents[document['_id']] = document
+                inserted.append(document['_id'])
+        return inserted
+
+
+class TestDetailUrlIndex(unittest.TestCase):
+    def setUp(self):
+        self.mongo_service = FakeMongoService()
+        self.index = DetailUrlIndex(self.mongo_service, capacity=1000)
+
+    def test_filter_new_and_commit(self):
+        self.assertEqual(self.index.filter_new('jd', ['a', 'b', 'a']), ['a', 'b'])
+        self.assertTrue(self.index.commit('jd', ['a', 'b']))
+        self.assertEqual(self.index.filter_new('jd', ['b', 'c']), ['c'])
+        self.assertTrue(self.index.commit('jd', ['c']))
+        self.assertEqual(self.index.filter_new('jd', ['a', 'c']), [])
+        # 不同数据源互不影响
+        self.assertEqual(self.index.filter_new('tencent', ['a']), ['a'])
+
+    def test_creates_ds_index(self):
+        self.index.filter_new('jd', ['a'])
+        self.index.filter_new('tencent', ['a'])
+        self.assertEqual(self.mongo_service.indexes, [('detail_url_seen', [('ds', 1)])])
+
+    def test_bloom_skips_lookup_for_unseen(self):
+        self.index.commit('jd', ['a'])
+        find_calls = self.mongo_service.find_calls
+
+        self.index.filter_new('jd', ['x', 'y'])
+
+        self.assertEqual(self.mongo_service.find_calls, find_calls)
+        self.assertIsInstance(self.index.filters['jd'], FingerprintStore)
+
+    def test_seen_by_other_executor(self):
+        other = DetailUrlIndex(self.mongo_service, capacity=1000)
+        self.index.get_filter('jd')
+        other.commit('jd', ['a'])
+
+        # 本地过滤器未记录，到MongoDB确认后同样视为已见过
+        self.assertTrue(self.index.commit('jd', ['a', 'b']))
+        self.assertEqual(self.index.filter_new('jd', ['a', 'b', 'c']), ['c'])
+        # 重启后从MongoDB加载
+        restarted = DetailUrlIndex(self.mongo_service, capacity=1000)
+        self.assertEqual(restarted.filter_new('jd', ['a', 'b', 'c']), ['c'])
+
+    def test_filter_new_is_read_only(self):
+        self.assertEqual(self.index.filter_new('jd', ['a', 'b', 'a']), ['a', 'b'])
+        self.assertEqual(self.index.filter_new('jd', ['a', 'b']), ['a', 'b'])
+        self.assertEqual(self.mongo_service.documents, {})
+
+        self.assertTrue(self.index.commit('jd', ['a']))
+        self.assertEqual(self.index.filter_new('jd', ['a', 'b']), ['b'])
+
+    def test_commit_failure(self):
+        self.mongo_service.insert_many = Mock(return_value=None)
+        self.assertFalse(self.index.commit('jd', ['a']))
+        self.assertEqual(self.index.filter_new('jd', ['a']), ['a'])
+
+    def test_get_key(self):
+        self.assertEqual(DetailUrlIndex.get_key({'url': 'https://a.com/1'}), 'https://a.com/1')
+        self.assertEqual(DetailUrlIndex.get_key({'url': {'b': 2, 'a': 1}}), '{"a": 1, "b": 2}')
+
+
+class TestListSpiderDedup(unittest.TestCase):
+    def setUp(self):
+        self.executor_mock = Mock()
+        self.executor_mock.task_config = task_config
+        self.executor_mock.mongodb_service = FakeMongoService()
+        self.executor_mock.mongodb_service.find_one = Mock(return_value=None)
+        self.list_spider = ListSpider(self.executor_mock)
+        self.list_spider.rate_limiters = RateLimiterRegistry()
+        self.list_spider.rate_limiters.get(jd_config_tencent['request_params']['api_url'], {'rate': 1000, 'burst': 100})
+        self.list_spider.save = Mock(return_value=True)
+        self.executor_mock.minio_client.upload_bytes.return_value = True
+        self.executor_mock.upload_queue = UploadQueue(self.executor_mock.minio_client, workers=1)
+        self.addCleanup(self.executor_mock.upload_queue.close)
+        self.executor_mock.http_pool.request.side_effect = self.fake_request
+        self.requested = []
+
+    def fake_request(self, method, url, statistic=None, headers=None, data=None):
+        page = int(url.split('pageIndex=')[1].split('&')[0])
+        self.requested.append(page)
+        result = copy.deepcopy(jd_result_tencent)
+        for post in result['Data']['Posts']:
+            post['PostId'] = f"{page}-{post['PostId']}"
+        resp = Mock()
+        resp.status_code = 200
+        resp.text = json.dumps(result, ensure_ascii=False)
+        resp.headers = {}
+        return resp
+
+    def test_incremental_round_stops_on_known_page(self):
+        task = dict(jd_config_tencent, _id='tencent', pagination=[1, 1], shard={'listing_id': 'l', 'index': 0, 'end': 3})
+        self.list_spider.start(task)
+        self.assertEqual(self.requested, [1, 2, 3])
+
+        self.requested = []
+        statistic = self.list_spider.start(dict(task, shard=None))
+
+        self.assertEqual(statistic['stop_reason'], "无新详情页，最后请求页：1")
+        self.assertEqual(self.requested, [1])
+
+    def test_failed_upload_not_recorded(self):
+        task = dict(jd_config_tencent, _id='tencent', pagination=[1, 1], shard={'listing_id': 'l', 'index': 0, 'end': 2})
+        self.executor_mock.minio_client.upload_bytes.return_value = False
+        with self.assertRaises(TaskIncompleteError):
+            self.list_spider.start(task)
+        self.assertEqual(self.executor_mock.mongodb_service.documents, {})
+
+        # 页面未保存，下一轮重新抓取而不是判定无新详情页
+        self.executor_mock.minio_client.upload_bytes.return_value = True
+        self.requested = []
+        statistic = self.list_spider.start(task)
+
+        self.assertEqual(statistic['stop_reason'], "分片结束，最后请求页：2")
+        self.assertEqual(self.requested, [1, 2])
+
+    def test_dedup_disabled(self):
+        task = dict(jd_config_tencent, _id='tencent', dedup=False, pagination=[1, 1],
+                    shard={'listing_id': 'l', 'index': 0, 'end': 2})
+        self.list_spider.start(task)
+        self.list_spider.start(task)
+
+        self.assertEqual(self.requested, [1, 2, 1, 2])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+import requests
+
+from dspider.worker.http_session_pool import HttpSessionPool
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        body = (self.headers.get('Cookie', '') if self.path == '/echo-cookie' else self.path).encode('utf-8')
+        self.send_response(200)
+        if self.path == '/login':
+            self.send_header('Set-Cookie', 'sid=task-a; Path=/')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestHttpSessionPool(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), KeepAliveHandler)
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.pool = HttpSessionPool(pool_maxsize=2, timeout=(1, 2))
+        self.addCleanup(self.pool.close)
+
+    def test_reuse_connection_across_pages(self):
+        statistic = {}
+        for page in range(1, 4):
+            resp = self.pool.request('GET', f"{self.base_url}/list?page={page}", statistic=statistic)
+            self.assertEqual(resp.text, f"/list?page={page}")
+
+        self.assertEqual(statistic['new_connections'], 1)
+        self.assertEqual(statistic['reused_connections'], 2)
+
+    def test_session_per_host(self):
+        session = self.pool.get_session(f"{self.base_url}/a")
+
+        self.assertIs(self.pool.get_session(f"{self.base_url}/b?x=1"), session)
+        self.assertIsNot(self.pool.get_session('https://example.com/a'), session)
+        self.assertEqual(len(self.pool.sessions), 2)
+
+    def test_cookies_not_shared_across_requests(self):
+        self.pool.request('GET', f"{self.base_url}/login")
+        resp = self.pool.request('GET', f"{self.base_url}/echo-cookie")
+
+        self.assertEqual(resp.text, '')
+        self.assertEqual(len(self.pool.get_session(self.base_url).cookies), 0)
+        # 请求头中显式指定的cookie照常发送
+        resp = self.pool.request('GET', f"{self.base_url}/echo-cookie", headers={'Cookie': 'sid=task-b'})
+        self.assertEqual(resp.text, 'sid=task-b')
+
+    @patch('requests.Session.request')
+    def test_default_timeout(self, mock_request):
+        self.pool.request('POST', 'https://example.com/api', data={'page': 1})
+        self.pool.request('POST', 'https://example.com/api', timeout=10)
+
+        self.assertEqual(mock_request.call_args_list[0].kwargs['timeout'], (1, 2))
+        self.assertEqual(mock_request.call_args_list[1].kwargs['timeout'], 10)
+
+    def test_connection_error_raises(self):
+        statistic = {}
+        with self.assertRaises(requests.ConnectionError):
+            self.pool.request('GET', 'http://127.0.0.1:1/', statistic=statistic)
+        self.assertEqual(statistic['new_connections'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,12 +1,25 @@
 import sys
 import os
 import unittest
+import gzip
 import json
 import datetime
+from collections import OrderedDict
+import threading
+import time
 from unittest.mock import Mock, MagicMock, patch
 
 from dspider.worker.spider.list_spider import PaginationGetterDefault
-from dspider.worker.spider.list_spider import ListSpider, ListSpiderExtractorJson
+from dspider.worker.spider.list_spider import ListSpider, ListSpiderExtractorJson, ListSpiderExtractorHTML, TaskIncompleteError, get_extractor
+from dspider.worker.http_session_pool import HttpSessionPool
+from dspider.worker.upload_queue import UploadQueue
+from dspider.common import minio_service
+from dspider.common.minio_service import MinIOService
+from dspider.common.page_archive import PageArchiveWriter
+from test.common.test_page_archive import InMemoryMinio
+from dspider.worker.rate_limiter import RateLimiterRegistry
+from dspider.worker.write_behind import WriteBehindBuffer
+from test.worker.test_write_behind import FakeMongoService
 # from dspider.worker.worker import WorkerNode, Executor
 
 # Fix the import path
@@ -34,9 +47,11 @@ class TestListSpider(unittest.TestCase):
         self.executor_mock.task_config = task_config
         self.executor_mock.mongodb_service = self.mongodb_service_mock
         self.executor_mock.minio_client = self.minio_client_mock
+        self.executor_mock.http_pool = HttpSessionPool()
         
         # Create list spider instance
         self.list_spider = ListSpider(self.executor_mock)
+        self.list_spider.rate_limiters = RateLimiterRegistry()
         
         # Sample test data
         self.sample_resp_text = json.dumps(jd_result_tencent, ensure_ascii=False)
@@ -44,7 +59,7 @@ class TestListSpider(unittest.TestCase):
         self.task = jd_config_tencent
         self.parse_rule_list = self.task['parse_rule']['list_page']
     
-    @patch('requests.request')
+    @patch('requests.Session.request')
     @patch('dspider.worker.spider.list_spider.ListSpiderExtractorJson.extract_url')
     def test_single_request_success(self, mock_extract_url, mock_request):
         """Test successful single request"""
@@ -65,7 +80,7 @@ class TestListSpider(unittest.TestCase):
         self.assertEqual(statistic["success"], 1)
         self.assertEqual(statistic["last_resp_text"], self.sample_resp_text)
 
-    @patch('requests.request')
+    @patch('requests.Session.request')
     def test_single_request_failure(self, mock_request):
         """Test failed single request"""
         mock_resp = Mock()
@@ -84,7 +99,7 @@ class TestListSpider(unittest.TestCase):
         self.assertEqual(statistic["fail"], [1])
         self.assertEqual(statistic["last_fail"], 1)
 
-    @patch('requests.request')
+    @patch('requests.Session.request')
     @patch('dspider.worker.spider.list_spider.ListSpiderExtractorJson.extract_url')
     def test_single_request_duplicate_content(self, mock_extract_url, mock_request):
         """Test single request with duplicate content"""
@@ -105,7 +120,7 @@ class TestListSpider(unittest.TestCase):
         self.assertEqual(statistic["success"], 1)
         self.assertEqual(statistic["stop_reason"], "重复页响应内容，最后成功页：2")
 
-    @patch('requests.request')
+    @patch('requests.Session.request')
     def test_single_request_consecutive_failure(self, mock_request):
         """Test consecutive failed requests"""
         mock_resp = Mock()
@@ -157,6 +172,12 @@ class TestListSpider(unittest.TestCase):
         self.assertEqual(statistic["total"], 1)
         self.assertEqual(statistic["success"], 1)
     
+    def test_save_uses_write_buffer(self):
+        save_info = {'page': 1, 'filepath': 'a.txt'}
+        self.assertTrue(self.list_spider.save(save_info))
+        self.executor_mock.write_buffer.add.assert_called_once_with(task_config['datasource']['list_page'], save_info, None)
+        self.mongodb_service_mock.get_collection.assert_not_called()
+    
     # @patch('dspider.worker.spider.list_spider.time.sleep')
     # @patch.object(ListSpider, 'save')
     # @patch.object(ListSpider, 'has_new_detail_url')
@@ -223,5 +244,333 @@ class TestListSpider(unittest.TestCase):
     #         self.assertEqual(result_statistic['success'], 1)
     #         self.assertEqual(result_statistic['stop_reason'], "无新详情页，最后请求页：1")
 
+class TestListSpiderExtractorJson(unittest.TestCase):
+    def setUp(self):
+        self.parse_rule = {
+            'list_data': 'data.list',
+            'url_rule': {'url_path': 'https://example.com/detail', 'params': {'id': 'id', 'type': 't'}, 'postdata': {}}
+        }
+        self.resp = {'data': {'list': [{'id': 1, 'type': 'a'}, {'id': 2, 'type': 'b'}]}}
+        self.expected = ['https://example.com/detail?id=1&t=a', 'https://example.com/detail?id=2&t=b']
+
+    def test_extract_url_from_text_bytes_and_parsed(self):
+        extractor = ListSpiderExtractorJson(self.parse_rule)
+        text = json.dumps(self.resp)
+        for content in (text, text.encode('utf-8'), extractor.parse(text)):
+            urls = extractor.extract_url(content)
+            self.assertEqual([item['url'] for item in urls], self.expected)
+
+    def test_parse_once(self):
+        extractor = ListSpiderExtractorJson(self.parse_rule)
+        with patch('dspider.worker.spider.list_spider.json_loads', wraps=json.loads) as mock_loads:
+            data = extractor.parse(json.dumps(self.resp))
+            extractor.extract_list_data(data)
+            extractor.extract_url(data)
+        mock_loads.assert_called_once()
+        self.assertIs(ListSpiderExtractorJson(dict(self.parse_rule)).rule, extractor.rule)
+
+    def test_extract_url_postdata(self):
+        self.parse_rule['url_rule']['postdata'] = {'id': 'jobId'}
+        urls = ListSpiderExtractorJson(self.parse_rule).extract_url(self.resp)
+        self.assertEqual([item['url'] for item in urls], [{'jobId': 1}, {'jobId': 2}])
+
+
+class TestListSpiderExtractorHTML(unittest.TestCase):
+    def setUp(self):
+        self.parse_rule = {
+            'type': 'html',
+            'list_data': 'css:li.job',
+            'url_rule': {'url_path': 'https://example.com/jobs/', 'link': 'css:a::attr(href)'},
+            'fields': {'title': 'css:a::text', 'city': 'xpath:.//span[@class="city"]'},
+        }
+        rows = ''.join(f'<li class="job"><a href="detail/{i}">职位{i}</a><span class="city">上海</span></li>' for i in range(50))
+        self.html = f'<html><head><meta charset="utf-8"></head><body><ul><li class="ad">广告</li>{rows}</ul></body></html>'
+
+    def check_items(self, items):
+        self.assertEqual(len(items), 50)
+        self.assertEqual(items[0], {'title': '职位0', 'city': '上海', 'url': 'https://example.com/jobs/detail/0'})
+        self.assertEqual(items[49]['url'], 'https://example.com/jobs/detail/49')
+
+    def test_extract_url(self):
+        extractor = get_extractor(self.parse_rule)
+        self.assertIsInstance(extractor, ListSpiderExtractorHTML)
+        self.check_items(extractor.extract_url(self.html))
+        self.check_items(extractor.extract_url(self.html.encode('utf-8')))
+        self.assertEqual(len(extractor.extract_list_data(self.html)), 50)
+
+    def test_extract_url_streaming(self):
+        self.parse_rule['stream_threshold'] = 0
+        extractor = ListSpiderExtractorHTML(self.parse_rule)
+        with patch.object(extractor, 'extract_list_data') as mock_extract_list_data:
+            self.check_items(extractor.extract_url(self.html))
+            self.check_items(extractor.extract_url(self.html.encode('utf-8')))
+        mock_extract_list_data.assert_not_called()
+
+    def test_params_url_rule(self):
+        self.parse_rule['list_data'] = 'css:ul > li.job'
+        self.parse_rule['stream_threshold'] = 0
+        self.parse_rule['url_rule'] = {'url_path': 'https://example.com/detail', 'params': {'css:a::attr(href)': 'path'}}
+        extractor = ListSpiderExtractorHTML(self.parse_rule)
+        self.assertIsNone(extractor.item_matcher) # 含层级关系的选择器不能流式解析
+        items = extractor.extract_url(self.html)
+        self.assertEqual(items[1]['url'], 'https://example.com/detail?path=detail/1')
+
+
+class TestListSpiderPageWindow(unittest.TestCase):
+    def setUp(self):
+        self.executor_mock = Mock()
+        self.executor_mock.task_config = task_config
+        self.list_spider = ListSpider(self.executor_mock)
+        self.list_spider.rate_limiters = RateLimiterRegistry()
+        self.list_spider.rate_limiters.get(jd_config_tencent['request_params']['api_url'], {'rate': 1000, 'burst': 100})
+        self.list_spider.save = Mock(return_value=True)
+        self.executor_mock.minio_client.upload_bytes.return_value = True
+        self.executor_mock.upload_queue = UploadQueue(self.executor_mock.minio_client, workers=1)
+        self.addCleanup(self.executor_mock.upload_queue.close)
+
+        self.executor_mock.mongodb_service.find_one.return_value = None
+        self.executor_mock.mongodb_service.find.return_value = []
+        self.executor_mock.mongodb_service.insert_many.side_effect = lambda name, docs, ordered: [d['_id'] for d in docs]
+
+        self.requested = []
+        self.lock = threading.Lock()
+        self.executor_mock.http_pool.request.side_effect = self.fake_request
+        self.executor_mock.cookie_refresh.refresh.return_value = None
+
+    def page_text(self, page):
+        result = json.loads(json.dumps(jd_result_tencent))
+        result['Data']['Posts'][0]['PostId'] = str(min(page, 4)) # 第4页之后内容重复
+        return json.dumps(result, ensure_ascii=False)
+
+    def fake_request(self, method, url, statistic=None, headers=None, data=None):
+        page = int(url.split('pageIndex=')[1].split('&')[0])
+        with self.lock:
+            self.requested.append(page)
+        if page == 1:
+            time.sleep(0.2) # 第1页最慢返回，后续页需等待其按序处理
+        resp = Mock()
+        resp.status_code = 200
+        resp.text = self.page_text(page)
+        resp.headers = {}
+        return resp
+
+    def test_concurrent_pages_in_order(self):
+        task = dict(jd_config_tencent, page_window=3)
+
+        statistic = self.list_spider.start(task)
+
+        self.assertEqual(statistic['stop_reason'], "重复页响应内容，最后成功页：5")
+        self.assertEqual(statistic['success'], 5)
+        self.assertEqual([c.args[0]['page'] for c in self.list_spider.save.call_args_list], [1, 2, 3, 4])
+        # 最多预取窗口内的页
+        self.assertLessEqual(max(self.requested), 5 + 3)
+
+    def test_archive_pages(self):
+        writers = []
+        def archive_writer(bucket_name, prefix, codec, segment_size):
+            writers.append(PageArchiveWriter(self.executor_mock.minio_client, bucket_name, prefix, codec, segment_size))
+            return writers[-1]
+        self.executor_mock.minio_client.archive_writer.side_effect = archive_writer
+        task = dict(jd_config_tencent, archive={'codec': 'gzip', 'segment_size': 1024 * 1024})
+
+        self.list_spider.start(task)
+
+        # 4个新页面打包为1个分段对象，记录保存在上传之后
+        self.executor_mock.minio_client.upload_bytes.assert_called_once()
+        segment = self.executor_mock.minio_client.upload_bytes.call_args.args[1]
+        records = [c.args[0] for c in self.list_spider.save.call_args_list]
+        self.assertEqual([r['page'] for r in records], [1, 2, 3, 4])
+        self.assertTrue(all(r['filepath'] == segment and r['archive']['segment'] == segment for r in records))
+        payload = self.executor_mock.minio_client.upload_bytes.call_args.args[2]
+        entry = records[1]['archive']
+        self.assertEqual(gzip.decompress(payload[entry['offset']:entry['offset'] + entry['length']]).decode('utf-8'),
+                         self.page_text(2))
+
+    def test_content_addressed(self):
+        with patch.object(MinIOService, 'initialize_client'):
+            service = MinIOService('minio.test:9000', 'ak', 'sk')
+        service.client = InMemoryMinio()
+        self.executor_mock.minio_client = self.executor_mock.upload_queue.minio_client = service
+        self.list_spider.minio_client = service
+        task = dict(jd_config_tencent, content_addressed=True)
+
+        with patch.object(minio_service, '_known_objects', OrderedDict()):
+            self.list_spider.start(task)
+            first_round = [c.args[0] for c in self.list_spider.save.call_args_list]
+            self.requested.clear()
+            statistic = self.list_spider.start(dict(task, schedule={'round': 2}))
+
+        # 第二轮内容未变，不再上传，记录引用同一哈希
+        self.assertEqual(service.client.put_count, 4)
+        self.assertEqual(statistic['unchanged_pages'], 4)
+        second_round = [c.args[0] for c in self.list_spider.save.call_args_list[4:]]
+        self.assertEqual([r['filepath'] for r in second_round], [r['filepath'] for r in first_round])
+        self.assertEqual([r['round'] for r in second_round], [2, 2, 2, 2])
+        self.assertTrue(first_round[0]['filepath'].startswith(f"cas/{first_round[0]['content_hash'][:2]}/"))
+
+    def test_upload_failure_fails_task(self):
+        self.executor_mock.minio_client.upload_bytes.side_effect = lambda bucket, name, data, content_type: '_2_' not in name
+        self.list_spider.get_save_info = Mock(side_effect=lambda task, content, cur: {
+            'page': cur, 'filepath': f"2023/08/25/1/task_{cur}_.txt"})
+
+        with self.assertRaises(TaskIncompleteError):
+            self.list_spider.start(jd_config_tencent)
+        # 上传成功的页面照常保存记录
+        self.assertEqual([c.args[0]['page'] for c in self.list_spider.save.call_args_list], [1, 3, 4])
+
+    def test_decode_once(self):
+        responses = []
+        page_text = self.page_text
+        class CountingResponse:
+            status_code = 200
+            headers = {}
+            def __init__(self, page):
+                self.page = page
+                self.decoded = 0
+            @property
+            def text(self):
+                self.decoded += 1
+                return page_text(self.page)
+        def fake_request(method, url, statistic=None, headers=None, data=None):
+            responses.append(CountingResponse(int(url.split('pageIndex=')[1].split('&')[0])))
+            return responses[-1]
+        self.executor_mock.http_pool.request.side_effect = fake_request
+
+        self.list_spider.start(jd_config_tencent)
+
+        self.assertEqual([resp.decoded for resp in responses], [1] * len(responses))
+
+    def test_write_failure_fails_task(self):
+        buffer = WriteBehindBuffer(FakeMongoService(fail_times=100), batch_size=100, flush_interval=60)
+        self.addCleanup(buffer.close)
+        self.executor_mock.write_buffer = buffer
+        del self.list_spider.save # 使用真实的save写入缓冲
+
+        with self.assertRaises(TaskIncompleteError):
+            self.list_spider.start(jd_config_tencent)
+        # 未写入的记录已撤回，不会在消息重回队列后重复写入，也不会因积压被丢弃
+        self.assertEqual(buffer.buffers[task_config['datasource']['list_page']], [])
+        self.assertEqual(buffer.stats()['dropped'], 0)
+
+    def test_sequential_by_default(self):
+        statistic = self.list_spider.start(jd_config_tencent)
+
+        self.assertEqual(statistic['stop_reason'], "重复页响应内容，最后成功页：5")
+        self.assertEqual(self.requested, [1, 2, 3, 4, 5])
+
+    def test_shard_stops_at_shard_end(self):
+        task = dict(jd_config_tencent, pagination=[1, 1], page_window=3,
+                    shard={'listing_id': 'jd:1', 'index': 0, 'end': 2})
+
+        statistic = self.list_spider.start(task)
+
+        self.assertEqual(statistic['stop_reason'], "分片结束，最后请求页：2")
+        self.assertEqual(sorted(self.requested), [1, 2])
+        self.executor_mock.mongodb_service.update_one.assert_not_called()
+
+    def test_shard_marks_listing_end(self):
+        task = dict(jd_config_tencent, pagination=[3, 1], shard={'listing_id': 'jd:1', 'index': 1, 'end': 10})
+
+        statistic = self.list_spider.start(task)
+
+        self.assertEqual(statistic['stop_reason'], "重复页响应内容，最后成功页：5")
+        update = self.executor_mock.mongodb_service.update_one.call_args
+        self.assertEqual(update.args[1], {'_id': 'jd:1'})
+        self.assertEqual(update.args[2]['$min'], {'end_page': 5})
+        self.assertTrue(update.kwargs['upsert'])
+
+    def test_shard_failures_keep_listing_open(self):
+        def unavailable(method, url, statistic=None, headers=None, data=None):
+            resp = Mock()
+            resp.status_code = 503
+            resp.headers = {}
+            return resp
+        self.executor_mock.http_pool.request.side_effect = unavailable
+        task = dict(jd_config_tencent, pagination=[3, 1], shard={'listing_id': 'jd:1', 'index': 1, 'end': 10})
+
+        self.list_spider.start(task)
+
+        # 请求失败不代表列表结束，后续分片照常抓取
+        self.executor_mock.mongodb_service.update_one.assert_not_called()
+
+    def test_shard_cancelled_after_listing_end(self):
+        self.executor_mock.mongodb_service.find_one.return_value = {'_id': 'jd:1', 'end_page': 5}
+        task = dict(jd_config_tencent, pagination=[11, 1], shard={'listing_id': 'jd:1', 'index': 2, 'end': 20})
+
+        statistic = self.list_spider.start(task)
+
+        self.assertEqual(statistic['stop_reason'], "列表已在第5页结束，取消分片剩余页：11")
+        self.assertEqual(self.requested, [])
+
+    def test_report_auth_rejected(self):
+        def rejected(method, url, statistic=None, headers=None, data=None):
+            resp = Mock()
+            resp.status_code = 403
+            resp.headers = {}
+            return resp
+        self.executor_mock.http_pool.request.side_effect = rejected
+
+        task = dict(jd_config_tencent, url='https://careers.tencent.com/search.html')
+
+        statistic = self.list_spider.start(task)
+
+        self.assertEqual(statistic['auth_rejected'], 403)
+        update = self.executor_mock.mongodb_service.update_one.call_args
+        self.assertEqual(update.args[0], 'recruitment_datasource_config')
+        self.assertEqual(update.args[1], {'url': task['url']})
+        self.assertEqual(update.args[2]['$set']['cookie_state.rejected_status'], 403)
+
+    def test_refresh_headers_and_retry(self):
+        seen_headers = []
+        def expiring(method, url, statistic=None, headers=None, data=None):
+            seen_headers.append(dict(headers))
+            if headers.get('cookie') != 'fresh':
+                resp = Mock()
+                resp.status_code = 401
+                resp.headers = {}
+                return resp
+            return self.fake_request(method, url, statistic, headers, data)
+        self.executor_mock.http_pool.request.side_effect = expiring
+        self.executor_mock.cookie_refresh.refresh.return_value = {'cookie': 'fresh'}
+        task = json.loads(json.dumps(dict(jd_config_tencent, url='https://careers.tencent.com/search.html', page_window=3)))
+
+        statistic = self.list_spider.start(task)
+
+        self.assertEqual(statistic['stop_reason'], "重复页响应内容，最后成功页：5")
+        self.assertNotIn('auth_rejected', statistic)
+        self.assertGreaterEqual(statistic['headers_refreshed'], 1)
+        self.assertEqual(task['request_params']['headers'], {'cookie': 'fresh'})
+        self.assertEqual(seen_headers[-1], {'cookie': 'fresh'})
+        self.assertEqual([c.args[0]['page'] for c in self.list_spider.save.call_args_list], [1, 2, 3, 4])
+
+    def test_refresh_replaces_headers_atomically(self):
+        sent = []
+        def expiring(method, url, statistic=None, headers=None, data=None):
+            sent.append(headers)
+            if headers.get('cookie') != 'fresh':
+                resp = Mock()
+                resp.status_code = 401
+                resp.headers = {}
+                return resp
+            return self.fake_request(method, url, statistic, headers, data)
+        self.executor_mock.http_pool.request.side_effect = expiring
+        self.executor_mock.cookie_refresh.refresh.return_value = {'cookie': 'fresh'}
+        task = json.loads(json.dumps(dict(jd_config_tencent, url='https://careers.tencent.com/search.html', page_window=3)))
+        task['request_params']['headers'] = {'cookie': 'old', 'x-token': 'old'}
+
+        self.list_spider.start(task)
+
+        # 每个请求使用自己的请求头副本，要么全是旧请求头，要么全是新请求头
+        self.assertEqual(len({id(headers) for headers in sent}), len(sent))
+        for headers in sent:
+            self.assertIn(headers, [{'cookie': 'old', 'x-token': 'old'}, {'cookie': 'fresh'}])
+
+    def test_no_report_on_success(self):
+        statistic = self.list_spider.start(jd_config_tencent)
+
+        self.assertNotIn('auth_rejected', statistic)
+        self.executor_mock.mongodb_service.update_one.assert_not_called()
+
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,79 @@
+import unittest
+
+from lxml import html
+
+from dspider.worker.spider.parse_rule import compile_field, compile_fields, compile_list_rule, compile_rule, rule_hash
+
+
+class TestCompileRule(unittest.TestCase):
+    def setUp(self):
+        self.data = {'result': {'list': [{'code': 'A1', 'loc': {'city': '上海'}}, {'code': 'B2', 'loc': {'city': '北京'}}]}}
+
+    def test_dotted_and_jsonpath(self):
+        self.assertEqual(len(compile_rule('result.list')(self.data)), 2)
+        self.assertEqual(compile_rule('$.result.list')(self.data), self.data['result']['list'])
+        self.assertEqual(compile_rule('$.result.list[1].code')(self.data), 'B2')
+        self.assertEqual(compile_rule("$['result'].list[-1].loc.city")(self.data), '北京')
+        self.assertEqual(compile_rule('$.result.list[*].loc.city')(self.data), ['上海', '北京'])
+        self.assertIsNone(compile_rule('$.result.list[5].code')(self.data))
+        self.assertIsNone(compile_rule('result.missing.list')(self.data))
+
+    def test_cached(self):
+        self.assertIs(compile_rule('$.result.list'), compile_rule('$.result.list'))
+        self.assertEqual(rule_hash({'a': 1, 'b': 2}), rule_hash({'b': 2, 'a': 1}))
+
+    def test_invalid_jsonpath(self):
+        with self.assertRaises(ValueError):
+            compile_rule('$.result[')
+
+    def test_css_and_xpath(self):
+        document = html.fromstring(
+            '<ul><li class="job"><a href="/job/1"> 算法工程师 </a></li><li class="job"><a href="/job/2">后端</a></li></ul>')
+        self.assertEqual(len(compile_rule('css:li.job')(document)), 2)
+        self.assertEqual(compile_rule('css:li.job a::attr(href)')(document), ['/job/1', '/job/2'])
+        self.assertEqual(compile_field('css:li.job a::text')(document), '算法工程师')
+        self.assertEqual(compile_field('xpath://li[2]/a')(document), '后端')
+        self.assertIsNone(compile_field('css:div.none')(document))
+
+    def test_compile_fields(self):
+        extract = compile_fields({'first': '$.result.list[0].code', 'cities': '$.result.list[*].loc.city'})
+        self.assertEqual(extract(self.data), {'first': 'A1', 'cities': ['上海', '北京']})
+
+
+class TestCompiledListRule(unittest.TestCase):
+    def setUp(self):
+        self.parse_rule = {
+            'list_data': 'result.list',
+            'url_rule': {'url_path': 'https://example.com/jobs/detail', 'params': {'code': 'code', 'loc.city': 'city'}, 'postdata': {}},
+        }
+
+    def test_get_urls(self):
+        items = [{'code': i, 'loc': {'city': 'sh'}} for i in range(1000)]
+        compile_list_rule(self.parse_rule).apply(items)
+        self.assertEqual(items[0]['url'], 'https://example.com/jobs/detail?code=0&city=sh')
+        self.assertEqual(items[999]['url'], 'https://example.com/jobs/detail?code=999&city=sh')
+
+    def test_url_path_with_braces(self):
+        self.parse_rule['url_rule']['url_path'] = 'https://example.com/{x}'
+        items = compile_list_rule(self.parse_rule).apply([{'code': 1, 'loc': {}}])
+        self.assertEqual(items[0]['url'], 'https://example.com/{x}?code=1&city=None')
+
+    def test_postdata_and_fields(self):
+        self.parse_rule['url_rule']['postdata'] = {'code': 'jobCode'}
+        self.parse_rule['fields'] = {'city': 'loc.city'}
+        items = compile_list_rule(self.parse_rule).apply([{'code': 'A1', 'loc': {'city': 'sh'}}])
+        self.assertEqual(items[0]['url'], {'jobCode': 'A1'})
+        self.assertEqual(items[0]['city'], 'sh')
+
+    def test_no_params_and_empty_list(self):
+        self.parse_rule['url_rule']['params'] = {}
+        rule = compile_list_rule(self.parse_rule)
+        self.assertEqual(rule.apply([{'code': 1}])[0]['url'], 'https://example.com/jobs/detail')
+        self.assertEqual(rule.apply(None), [])
+
+    def test_cached_by_hash(self):
+        self.assertIs(compile_list_rule(self.parse_rule), compile_list_rule(dict(reversed(list(self.parse_rule.items())))))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+import threading
+import unittest
+from unittest.mock import patch
+
+from dspider.worker.rate_limiter import DEFAULT_RATE_LIMIT, RateLimiterRegistry, parse_retry_after
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+class TestDomainRateLimiter(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = patch('dspider.worker.rate_limiter.time.monotonic', side_effect=self.clock.monotonic)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.registry = RateLimiterRegistry()
+        self.limiter = self.registry.get('https://zhaopin.jd.com/web/job/job_list',
+                                         {'rate': 1, 'max_rate': 2, 'increase': 0.5})
+
+    def test_token_bucket(self):
+        self.assertEqual(self.limiter.reserve(), 0)
+        self.assertAlmostEqual(self.limiter.reserve(), 1)
+        self.assertAlmostEqual(self.limiter.reserve(), 2)
+        self.clock.now += 3
+        self.assertEqual(self.limiter.reserve(), 0)
+
+    def test_additive_increase(self):
+        for _ in range(5):
+            self.limiter.feedback(200, 0.1)
+        self.assertEqual(self.limiter.rate, 2)
+        # 响应变慢视为过载
+        self.limiter.feedback(200, 10)
+        self.assertEqual(self.limiter.rate, 1)
+
+    def test_multiplicative_decrease_once_per_cooldown(self):
+        self.limiter.feedback(429, 0.1)
+        self.limiter.feedback(503, 0.1)
+        self.assertEqual(self.limiter.rate, 0.5)
+
+        self.clock.now += 2
+        self.limiter.feedback(None, 0.1)
+        self.assertEqual(self.limiter.rate, 0.25)
+        for _ in range(10):
+            self.clock.now += 100
+            self.limiter.feedback(500, 0.1)
+        self.assertEqual(self.limiter.rate, DEFAULT_RATE_LIMIT['min_rate'])
+
+    def test_retry_after(self):
+        self.limiter.reserve()
+        self.limiter.feedback(429, 0.1, retry_after=30)
+        self.clock.now += 10
+        self.assertAlmostEqual(self.limiter.reserve(), 20)
+
+    def test_shared_per_domain(self):
+        limiter = self.registry.get('https://zhaopin.jd.com/web/job/job_info_list/3', {'rate': 9})
+
+        self.assertIs(limiter, self.limiter)
+        self.assertEqual(limiter.rate, 1)
+        self.assertIsNot(self.registry.get('https://careers.tencent.com/'), self.limiter)
+
+    def test_invalid_options_ignored(self):
+        limiter = self.registry.get('https://careers.tencent.com/', {'rate': 2, 'qps': 10, 'burst': 'x', 'backoff': -1})
+
+        self.assertEqual(limiter.rate, 2)
+        self.assertEqual(limiter.burst, DEFAULT_RATE_LIMIT['burst'])
+        self.assertEqual(limiter.backoff, DEFAULT_RATE_LIMIT['backoff'])
+
+    def test_reconfigure(self):
+        limiter = self.registry.get('https://zhaopin.jd.com/', {'rate': 1, 'max_rate': 0.5, 'burst': 3})
+
+        self.assertIs(limiter, self.limiter)
+        # 新的上下限立即生效，当前速率收敛到上限内
+        self.assertEqual(limiter.max_rate, 0.5)
+        self.assertEqual(limiter.rate, 0.5)
+        self.assertEqual(limiter.burst, 3)
+        # 不传参数时保留已有参数
+        self.registry.get('https://zhaopin.jd.com/')
+        self.assertEqual(limiter.max_rate, 0.5)
+
+    def test_merge_datasources(self):
+        url = 'https://careers.tencent.com/'
+        limiter = self.registry.get(url, {'max_rate': 4, 'burst': 2}, 'ds1')
+        self.registry.get(url, {'max_rate': 1, 'burst': 5}, 'ds2')
+        # 共用域名的数据源各参数取最小值，与调用先后无关
+        self.registry.get(url, {'max_rate': 4, 'burst': 2}, 'ds1')
+        self.assertEqual(limiter.max_rate, 1)
+        self.assertEqual(limiter.burst, 2)
+        # 数据源修改配置只替换自己的参数
+        self.registry.get(url, {'max_rate': 3, 'burst': 5}, 'ds2')
+        self.assertEqual(limiter.max_rate, 3)
+
+    def test_scale_by_processes(self):
+        self.registry.set_processes(2)
+        # 已有限速器按进程数重新均分
+        self.assertEqual(self.limiter.max_rate, 1)
+        self.assertEqual(self.limiter.rate, 1)
+        limiter = self.registry.get('https://careers.tencent.com/', {'rate': 2, 'max_rate': 4, 'burst': 3})
+        self.assertEqual(limiter.rate, 1)
+        self.assertEqual(limiter.max_rate, 2)
+        self.assertEqual(limiter.burst, 2)
+
+    def test_concurrent_reserve(self):
+        waits = []
+        threads = [threading.Thread(target=lambda: waits.append(self.limiter.reserve())) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # 多个Executor线程共享令牌桶，等待时间依次错开
+        self.assertEqual(sorted(round(w) for w in waits), [0, 1, 2, 3, 4])
+
+
+class TestParseRetryAfter(unittest.TestCase):
+    def test_parse(self):
+        self.assertEqual(parse_retry_after('5'), 5)
+        self.assertIsNone(parse_retry_after(None))
+        self.assertIsNone(parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import threading
+import time
+import unittest
+from unittest.mock import Mock, patch
+
+from dspider.common import minio_service
+from dspider.common.minio_service import MinIOService
+from dspider.worker.upload_queue import UploadQueue
+
+
+class SlowMinIO:
+    def __init__(self, delay=0.05, fail=()):
+        self.delay = delay
+        self.fail = fail
+        self.uploaded = {}
+        self.lock = threading.Lock()
+
+    def upload_bytes(self, bucket_name, object_name, data, content_type='text/plain'):
+        time.sleep(self.delay)
+        with self.lock:
+            self.uploaded[object_name] = data
+        return object_name not in self.fail
+
+
+class TestUploadQueue(unittest.TestCase):
+    def test_submit_does_not_block(self):
+        queue = UploadQueue(SlowMinIO(delay=0.1), workers=4, max_pending=10)
+        start = time.monotonic()
+        futures = [queue.submit('bucket', f"page{i}", f"内容{i}") for i in range(8)]
+        self.assertLess(time.monotonic() - start, 0.05)
+        self.assertTrue(queue.wait(futures))
+        self.assertEqual(queue.minio_client.uploaded['page3'], '内容3'.encode('utf-8'))
+        queue.close()
+
+    def test_backpressure(self):
+        queue = UploadQueue(SlowMinIO(delay=0.1), workers=1, max_pending=2)
+        statistic = {}
+        start = time.monotonic()
+        for i in range(4):
+            queue.submit('bucket', f"page{i}", b'x', statistic=statistic)
+        # 队列满时第3、4个提交需等待前面的上传完成
+        self.assertGreaterEqual(time.monotonic() - start, 0.15)
+        self.assertGreater(statistic['upload_wait'], 0.1)
+        self.assertTrue(queue.flush())
+        queue.close()
+
+    def test_callback_and_failure(self):
+        queue = UploadQueue(SlowMinIO(delay=0, fail=('bad',)), workers=2)
+        results = {}
+        futures = [queue.submit('bucket', name, b'x', callback=lambda ok, name=name: results.__setitem__(name, ok))
+                   for name in ('good', 'bad')]
+        self.assertFalse(queue.wait(futures))
+        self.assertEqual(results, {'good': True, 'bad': False})
+        queue.close()
+
+
+class TestMinIOBucketCache(unittest.TestCase):
+    def setUp(self):
+        patcher = patch.object(minio_service, '_known_buckets', set())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        with patch.object(MinIOService, 'initialize_client'):
+            self.service = MinIOService('minio.test:9000', 'ak', 'sk')
+        self.service.client = Mock()
+        self.service.client.bucket_exists.return_value = True
+
+    def test_bucket_checked_once(self):
+        for i in range(3):
+            self.assertTrue(self.service.upload_text('bucket', f"page{i}", '职位'))
+        self.service.client.bucket_exists.assert_called_once_with('bucket')
+        kwargs = self.service.client.put_object.call_args.kwargs
+        self.assertEqual(kwargs['length'], len('职位'.encode('utf-8')))
+        self.assertEqual(kwargs['data'].read(), '职位'.encode('utf-8'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,3 +1,4 @@
+import threading
 import unittest
 from unittest.mock import Mock
 from unittest.mock import patch
@@ -242,7 +243,9 @@ class TestExecutor(unittest.TestCase):
             executor.queue_name,
             callback=executor.process_task,
             auto_ack=False,
-            prefetch_count=executor.prefetch_count
+            prefetch_count=executor.prefetch_count,
+            concurrency=executor.concurrency,
+            message_timeout=executor.message_timeout
         )
     
     def test_run_keyboard_interrupt(self):
@@ -288,6 +291,25 @@ class TestExecutor(unittest.TestCase):
         # 验证返回值
         self.assertTrue(result)
     
+    def test_spider_per_thread(self):
+        """测试并发处理任务时每个线程使用自己的爬虫实例"""
+        self.mock_spider_class.side_effect = lambda executor: Mock()
+        executor = Executor(self.spider_name, self.task_config)
+        
+        spiders = []
+        def process():
+            executor.process_task({"_id": "test-task"}, {})
+            spiders.append(executor.get_spider())
+        thread = threading.Thread(target=process)
+        thread.start()
+        thread.join()
+        executor.process_task({"_id": "test-task"}, {})
+        
+        self.assertIsNot(spiders[0], executor.spider)
+        spiders[0].start.assert_called_once()
+        executor.spider.start.assert_called_once()
+        self.assertIs(spiders[0].detail_url_index, executor.spider.detail_url_index)
+    
     def test_process_task_failure(self):
         """测试process_task方法处理任务失败"""
         # 创建Executor实例
@@ -0,0 +1,131 @@
+import threading
+import time
+import unittest
+
+from dspider.worker.write_behind import WriteBehindBuffer, WriteTicket
+
+
+class FakeMongoService:
+    def __init__(self, fail_times=0):
+        self.batches = []
+        self.fail_times = fail_times
+        self.lock = threading.Lock()
+
+    def insert_many(self, collection_name, documents, ordered=True):
+        with self.lock:
+            if self.fail_times:
+                self.fail_times -= 1
+                return None
+            self.batches.append((collection_name, list(documents), ordered))
+            return [str(i) for i in range(len(documents))]
+
+
+class TestWriteBehindBuffer(unittest.TestCase):
+    def setUp(self):
+        self.mongo = FakeMongoService()
+
+    def make_buffer(self, **kwargs):
+        buffer = WriteBehindBuffer(self.mongo, **kwargs)
+        self.addCleanup(buffer.close)
+        return buffer
+
+    def test_flush_on_batch_size(self):
+        buffer = self.make_buffer(batch_size=3, flush_interval=60)
+        for i in range(7):
+            buffer.add('list_page', {'page': i})
+
+        self.assertEqual([len(docs) for _, docs, _ in self.mongo.batches], [3, 3])
+        self.assertFalse(self.mongo.batches[0][2]) # 无序写入
+        buffer.flush()
+        self.assertEqual([docs[0]['page'] for _, docs, _ in self.mongo.batches], [0, 3, 6])
+
+        stats = buffer.stats()
+        self.assertEqual(stats['batches'], 3)
+        self.assertEqual(stats['documents'], 7)
+        self.assertEqual(stats['max_batch_size'], 3)
+        self.assertAlmostEqual(stats['avg_batch_size'], 7 / 3)
+
+    def test_flush_on_interval(self):
+        buffer = self.make_buffer(batch_size=100, flush_interval=0.05)
+        buffer.add('list_page', {'page': 1})
+        buffer.add('detail_page', {'page': 2})
+        time.sleep(0.3)
+        self.assertEqual(sorted(name for name, _, _ in self.mongo.batches), ['detail_page', 'list_page'])
+
+    def test_flush_on_close(self):
+        buffer = WriteBehindBuffer(self.mongo, batch_size=100, flush_interval=60)
+        buffer.add('list_page', {'page': 1})
+        buffer.close()
+        self.assertEqual(len(self.mongo.batches), 1)
+
+    def test_retry_after_failure(self):
+        self.mongo.fail_times = 1
+        buffer = self.make_buffer(batch_size=100, flush_interval=60)
+        buffer.add('list_page', {'page': 1})
+
+        self.assertFalse(buffer.flush())
+        buffer.add('list_page', {'page': 2})
+        self.assertTrue(buffer.flush())
+        self.assertEqual([d['page'] for d in self.mongo.batches[0][1]], [1, 2])
+        self.assertEqual(buffer.stats()['failed_batches'], 1)
+
+    def test_drop_when_backlog_exceeds_limit(self):
+        self.mongo.fail_times = 10
+        buffer = self.make_buffer(batch_size=100, flush_interval=60, max_pending=2)
+        for i in range(3):
+            buffer.add('list_page', {'page': i})
+        buffer.flush()
+        self.assertEqual(buffer.stats()['dropped'], 1)
+        self.assertEqual([d['page'] for d, _ in buffer.buffers['list_page']], [1, 2])
+
+    def test_ticket_written(self):
+        buffer = self.make_buffer(batch_size=2, flush_interval=60)
+        ticket = WriteTicket()
+        for i in range(3):
+            buffer.add('list_page', {'page': i}, ticket)
+        self.assertFalse(ticket.done)
+        buffer.flush('list_page')
+        self.assertTrue(ticket.done)
+
+    def test_ticket_dropped(self):
+        self.mongo.fail_times = 10
+        buffer = self.make_buffer(batch_size=100, flush_interval=60, max_pending=2)
+        first, second = WriteTicket(), WriteTicket()
+        buffer.add('list_page', {'page': 0}, first)
+        buffer.add('list_page', {'page': 1}, second)
+        buffer.add('list_page', {'page': 2}, second)
+        buffer.flush()
+        # 被丢弃文档所属的任务不会视为写入完成
+        self.assertEqual(first.failed, 1)
+        self.assertFalse(first.done)
+        self.assertEqual(second.pending, 2)
+
+    def test_discard(self):
+        self.mongo.fail_times = 1
+        buffer = self.make_buffer(batch_size=100, flush_interval=60)
+        ticket, other = WriteTicket(), WriteTicket()
+        buffer.add('list_page', {'page': 1}, ticket)
+        buffer.add('list_page', {'page': 2}, other)
+        self.assertFalse(buffer.flush())
+
+        self.assertEqual(buffer.discard(ticket), 1)
+        self.assertEqual(ticket.pending, 0)
+        self.assertFalse(ticket.done)
+        self.assertTrue(buffer.flush())
+        self.assertEqual([d['page'] for d in self.mongo.batches[0][1]], [2])
+        self.assertTrue(other.done)
+
+    def test_concurrent_add(self):
+        buffer = self.make_buffer(batch_size=10, flush_interval=60)
+        threads = [threading.Thread(target=lambda t=t: [buffer.add('list_page', {'t': t, 'i': i}) for i in range(50)])
+                   for t in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        buffer.flush()
+        self.assertEqual(sum(len(docs) for _, docs, _ in self.mongo.batches), 200)
+
+
+if __name__ == '__main__':
+    unittest.main()